@@ -80,16 +80,42 @@ SYSTEM_PROMPT2 ="""
         请确保评分客观公正，用中文回复。
         """
 
+# 多份作业合并到一次请求时附加在 SYSTEM_PROMPT 之后的说明
+PACKED_PROMPT_SUFFIX = """
+        ## 本次请求包含多份作业
+        - 每份作业以“===作业 [编号]===”开始，以“===作业 [编号] 结束===”结束，各份作业互不相关，请分别独立评分
+        - 对每份作业，先输出一行“===评分 [编号]===”，再按上述markdown格式输出评分结果，最后输出一行“===评分 [编号] 结束===”
+        - 必须为每一个编号都输出评分结果，编号与作业中的编号完全一致
+"""
+
+# 评分结果无法解析时，让大模型把原评分结果整理为严格的JSON
+SCORE_REASK_PROMPT = """你是评分结果整理助手。请把用户给出的评分结果整理为以下JSON格式，不要修改任何分数：
+        {"完成题目数量":[题目数量],
+        "总分":[分数],
+        "详细评分":{"正确性":"[分数]",
+                    "知识点使用":"[分数]",
+                    "可读性":"[分数]",
+                    "健壮性":"[分数]"},
+        "优点":"[原评分中的优点]",
+        "缺点":"[原评分中的缺点]",
+        "建议":"[原评分中的建议]"}
+
+        ### 注意：除了上述JSON格式外，不要输出任何其他文字、解释或代码块。
+        """
+
+def build_question_prompt(knowledge_point):
+    """按单道题的知识点要求生成系统提示词（输出JSON格式评分）"""
+    return SYSTEM_PROMPT1 + knowledge_point + SYSTEM_PROMPT2
+
 def get_system_prompt(homework_id, question_id):
     """获取系统提示词"""
     try:
         knowledge_point = KNOWLEDGE_POINTS[homework_id][question_id-1]
-        # 确保 SYSTEM_PROMPT 中有正确的格式化逻辑
-        return SYSTEM_PROMPT1+KNOWLEDGE_POINTS+SYSTEM_PROMPT2
+        return build_question_prompt(knowledge_point)
     except (KeyError, IndexError):
         # 处理键不存在或索引越界的逻辑
         print("获取系统提示词时出错")
-        #return SYSTEM_PROMPT  # 返回默认提示词或适当处理
+        return SYSTEM_PROMPT  # 返回默认提示词
 
 def main():
     """主函数"""
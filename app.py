@@ -1,24 +1,40 @@
-from flask import Flask, render_template, request, redirect, url_for, session
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
-from sqlalchemy.orm import relationship
-from sqlalchemy import inspect, text, or_
-from flask import flash, send_file
+from datetime import datetime, timedelta
+from sqlalchemy.orm import relationship, aliased
+from sqlalchemy import inspect, text, or_, and_
+from sqlalchemy.exc import IntegrityError
+from flask import flash, send_file, Response, stream_with_context
 import os
-import re
+import hashlib
 import secrets
 import string
 from werkzeug.utils import secure_filename
-from docx import Document
 
 from config import Config
-from homework_LLM_grader import PythonCodeGrader
-from python_speaking import VoiceAssistant
+from homework_LLM_grader import PythonCodeGrader, is_error_result, static_evaluation
+from code_sandbox import parse_test_cases
+from similarity_index import fingerprint, encode_signature, decode_signature, estimate_similarity
+from llm_client import LLMError
+from homework_segmenter import segment_homework, preflight_check
+from extractors import ExtractionError, ExtractionRetryable, get_shared_extractor_pool, is_supported, file_type_of
+from static_grader import code_spans
+from score_parser import SCORE_COLUMNS, parse_evaluation
+from feedback_audio import get_shared_feedback_audio, audio_key, audio_mimetype
+from grading_jobs import (GradingWorkerPool, JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED,
+                          JOB_CANCELLED, ACTIVE_JOB_STATUSES, JOB_KIND_EVALUATE, JOB_KIND_STUDY_PLAN,
+                          JOB_KIND_EXTRACT, RUN_RUNNING, RUN_DONE)
+from grading_stream import GradingStreamHub
+from grading_scheduler import PRIORITY_INTERACTIVE, PRIORITY_DEADLINE, PRIORITY_BACKFILL, higher_priority
+from provider_pool import get_shared_pool
 import threading
+import json
+import time
+import click
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///homework.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('HOMEWORK_DATABASE_URI', 'sqlite:///homework.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 # 文件上传配置
@@ -103,6 +119,7 @@ class Assignment(db.Model):
     course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=True)
     status = db.Column(db.String(20), default='published')
     withdrawn_at = db.Column(db.DateTime, nullable=True)
+    eager_grading = db.Column(db.Boolean, default=False)  # 学生提交后立即在后台评分
 
     teacher = relationship('User', backref=db.backref('assignments', lazy=True))
     course = relationship('Course', backref=db.backref('assignments', lazy=True))
@@ -113,6 +130,9 @@ class AssignmentQuestion(db.Model):
     assignment_id = db.Column(db.Integer, db.ForeignKey('assignment.id'), nullable=False)
     prompt = db.Column(db.Text, nullable=False)
     knowledge_point = db.Column(db.String(255), nullable=False)
+    # 运行测试用的标准输入和期望输出，多组之间用单独一行的 --- 分隔
+    test_input = db.Column(db.Text, nullable=True)
+    expected_output = db.Column(db.Text, nullable=True)
 
     assignment = relationship('Assignment', backref=db.backref('questions', lazy=True, cascade='all, delete-orphan'))
 
@@ -129,11 +149,146 @@ class Submission(db.Model):
     ai_score = db.Column(db.Float, nullable=True)
     evaluation_result = db.Column(db.Text, nullable=True)
     teacher_comment = db.Column(db.Text, nullable=True)
+    # 从评分结果解析出的各维度分，用于班级统计
+    score_correctness = db.Column(db.Float, nullable=True)
+    score_knowledge = db.Column(db.Float, nullable=True)
+    score_readability = db.Column(db.Float, nullable=True)
+    score_robustness = db.Column(db.Float, nullable=True)
+    question_count = db.Column(db.Integer, nullable=True)
+    evaluation_hash = db.Column(db.String(64), nullable=True)  # 产生评分结果的作业内容的哈希
+    file_hash = db.Column(db.String(64), nullable=True)  # 提交文件的哈希，对应 SubmissionText
 
     assignment = relationship('Assignment', backref=db.backref('submissions', lazy=True))
     student = relationship('User', backref=db.backref('submissions', lazy=True))
 
 
+class GradingJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    submission_id = db.Column(db.Integer, db.ForeignKey('submission.id'), nullable=False, index=True)
+    kind = db.Column(db.String(20), nullable=False, default=JOB_KIND_EVALUATE)  # evaluate, study_plan
+    status = db.Column(db.String(20), nullable=False, default=JOB_QUEUED)  # queued, running, done, failed
+    attempts = db.Column(db.Integer, default=0)
+    result = db.Column(db.Text, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    priority = db.Column(db.String(20), nullable=False, default=PRIORITY_INTERACTIVE)  # interactive, deadline, backfill
+    course_id = db.Column(db.Integer, nullable=True)  # 用于调度时在课程之间轮转
+    run_id = db.Column(db.Integer, nullable=True, index=True)  # 所属的批量评分
+    not_before = db.Column(db.DateTime, nullable=True)  # 在此之前不执行，用于合并短时间内的重复提交
+
+    submission = relationship('Submission', backref=db.backref('grading_jobs', lazy=True, cascade='all, delete-orphan'))
+
+
+class GradingRun(db.Model):
+    """一键评分：为一份作业的所有未评分提交创建的一批评分任务，进度由其任务状态汇总得出"""
+    id = db.Column(db.Integer, primary_key=True)
+    assignment_id = db.Column(db.Integer, db.ForeignKey('assignment.id'), nullable=False, index=True)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=RUN_RUNNING)  # running, done
+    priority = db.Column(db.String(20), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)  # 最近一次开始或继续的时间，用于估算剩余时间
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    assignment = relationship('Assignment', backref=db.backref('grading_runs', lazy=True, cascade='all, delete-orphan'))
+
+
+class GradingLease(db.Model):
+    """评分租约：同一提交、同一内容的评分在所有进程中同时只有一个任务在调用大模型"""
+    lease_key = db.Column(db.String(100), primary_key=True)  # 提交ID:任务类型:内容哈希
+    job_id = db.Column(db.Integer, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+
+class StudyPlan(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    submission_id = db.Column(db.Integer, db.ForeignKey('submission.id'), nullable=False, unique=True)
+    evaluation_hash = db.Column(db.String(64), nullable=False)  # 生成计划时所依据的评分结果的哈希
+    content = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    submission = relationship('Submission', backref=db.backref('study_plan', uselist=False, cascade='all, delete-orphan'))
+
+
+class SubmissionText(db.Model):
+    """上传时从提交文件中提取的文本，按文件哈希保存，预览和评分直接读取，不再重复解析文件"""
+    file_hash = db.Column(db.String(64), primary_key=True)
+    text = db.Column(db.Text, nullable=False)
+    paragraph_count = db.Column(db.Integer, nullable=False, default=0)
+    table_count = db.Column(db.Integer, nullable=False, default=0)
+    code_spans = db.Column(db.Text, nullable=True)  # 代码块所在行号区间（JSON）
+    error = db.Column(db.Text, nullable=True)  # 无法提取时的原因，此时 text 为空
+    extracted_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class QuestionGrade(db.Model):
+    """单题评分结果，作业重新提交后作答未变化的题目直接沿用"""
+    id = db.Column(db.Integer, primary_key=True)
+    submission_id = db.Column(db.Integer, db.ForeignKey('submission.id'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False)  # 题号，从0开始
+    answer_hash = db.Column(db.String(64), nullable=False)  # 作答与题目要求的哈希
+    result = db.Column(db.Text, nullable=False)  # 单题评分结果（JSON）
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    submission = relationship('Submission', backref=db.backref('question_grades', lazy=True, cascade='all, delete-orphan'))
+
+    __table_args__ = (
+        db.UniqueConstraint('submission_id', 'position', name='uq_question_grade_position'),
+    )
+
+
+class QuestionSegment(db.Model):
+    """作业按题拆分的结构：题目内容、源代码、运行结果和小结，后续步骤可只读取需要的那道题"""
+    id = db.Column(db.Integer, primary_key=True)
+    submission_id = db.Column(db.Integer, db.ForeignKey('submission.id'), nullable=False)
+    question_id = db.Column(db.Integer, db.ForeignKey('assignment_question.id'), nullable=True)  # 按题号对应的作业题目
+    position = db.Column(db.Integer, nullable=False)  # 题号，从0开始
+    content_hash = db.Column(db.String(64), nullable=False)  # 拆分时的作业内容哈希
+    title = db.Column(db.Text, nullable=True)
+    prompt = db.Column(db.Text, nullable=True)
+    code = db.Column(db.Text, nullable=True)
+    output = db.Column(db.Text, nullable=True)
+    summary = db.Column(db.Text, nullable=True)
+    text = db.Column(db.Text, nullable=False)  # 整道题的作答，按题评分时使用
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    submission = relationship('Submission', backref=db.backref('question_segments', lazy=True, cascade='all, delete-orphan'))
+    question = relationship('AssignmentQuestion')
+
+    __table_args__ = (
+        db.UniqueConstraint('submission_id', 'position', name='uq_question_segment_position'),
+    )
+
+
+class SubmissionFingerprint(db.Model):
+    """作业代码的 MinHash 签名，用于相似度检测；代码过短时 signature 为空"""
+    submission_id = db.Column(db.Integer, db.ForeignKey('submission.id'), primary_key=True)
+    assignment_id = db.Column(db.Integer, nullable=False, index=True)
+    content_hash = db.Column(db.String(64), nullable=False)  # 计算签名时的作业内容哈希
+    token_count = db.Column(db.Integer, nullable=False, default=0)
+    signature = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    submission = relationship('Submission', backref=db.backref('fingerprint', uselist=False, cascade='all, delete-orphan'))
+
+
+class SimilarityBucket(db.Model):
+    """LSH 桶：同一分段落入同一个桶的两份作业是相似候选"""
+    id = db.Column(db.Integer, primary_key=True)
+    submission_id = db.Column(db.Integer, db.ForeignKey('submission.id'), nullable=False, index=True)
+    assignment_id = db.Column(db.Integer, nullable=False, index=True)
+    band = db.Column(db.Integer, nullable=False)
+    bucket = db.Column(db.String(16), nullable=False)
+
+    submission = relationship('Submission', backref=db.backref('similarity_buckets', lazy=True, cascade='all, delete-orphan'))
+
+    __table_args__ = (
+        db.Index('ix_similarity_bucket_band_bucket', 'band', 'bucket'),
+    )
+
+
 class CourseMaterial(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
@@ -150,6 +305,16 @@ class CourseMaterial(db.Model):
     course = relationship('Course', backref=db.backref('materials', lazy=True, cascade='all, delete-orphan'))
     teacher = relationship('User', backref=db.backref('materials', lazy=True))
 
+def apply_scores(submission, scores):
+    """把解析出的总分和各维度分写入提交记录，scores 为 None 时清空"""
+    scores = scores or {}
+    sub_scores = scores.get('sub_scores') or {}
+    submission.ai_score = scores.get('total')
+    for name, column in SCORE_COLUMNS.items():
+        setattr(submission, column, sub_scores.get(name))
+    submission.question_count = scores.get('question_count')
+
+
 # 创建数据库表
 with app.app_context():
     # 仅测试用
@@ -159,9 +324,22 @@ with app.app_context():
     ensure_column_exists('assignment', 'course_id', 'course_id INTEGER')
     ensure_column_exists('assignment', 'status', "status TEXT DEFAULT 'published'")
     ensure_column_exists('assignment', 'withdrawn_at', 'withdrawn_at DATETIME')
+    ensure_column_exists('assignment', 'eager_grading', 'eager_grading BOOLEAN DEFAULT 0')
+    ensure_column_exists('assignment_question', 'test_input', 'test_input TEXT')
+    ensure_column_exists('assignment_question', 'expected_output', 'expected_output TEXT')
     ensure_column_exists('submission', 'ai_score', 'ai_score REAL')
     ensure_column_exists('submission', 'evaluation_result', 'evaluation_result TEXT')
     ensure_column_exists('submission', 'teacher_comment', 'teacher_comment TEXT')
+    for column in list(SCORE_COLUMNS.values()):
+        ensure_column_exists('submission', column, f'{column} REAL')
+    ensure_column_exists('submission', 'question_count', 'question_count INTEGER')
+    ensure_column_exists('submission', 'evaluation_hash', 'evaluation_hash VARCHAR(64)')
+    ensure_column_exists('submission', 'file_hash', 'file_hash VARCHAR(64)')
+    ensure_column_exists('submission_text', 'error', 'error TEXT')
+    ensure_column_exists('grading_job', 'priority', f"priority VARCHAR(20) DEFAULT '{PRIORITY_INTERACTIVE}'")
+    ensure_column_exists('grading_job', 'course_id', 'course_id INTEGER')
+    ensure_column_exists('grading_job', 'run_id', 'run_id INTEGER')
+    ensure_column_exists('grading_job', 'not_before', 'not_before DATETIME')
 
     # 创建课程材料表
     db.create_all()
@@ -170,6 +348,24 @@ with app.app_context():
     db.session.execute(text("UPDATE assignment SET status='published' WHERE status IS NULL"))
     db.session.commit()
 
+    # 旧的评分结果补充解析各维度分（之前只按正则猜测了总分）
+    for submission in Submission.query.filter(
+        Submission.evaluation_result.isnot(None),
+        Submission.score_correctness.is_(None)
+    ).all():
+        scores = parse_evaluation(submission.evaluation_result)
+        if scores:
+            apply_scores(submission, scores)
+    db.session.commit()
+
+    # 进程异常退出后遗留的“运行中”任务重新排队
+    stale_before = datetime.utcnow() - timedelta(seconds=Config.GRADING_JOB_STALE_SECONDS)
+    GradingJob.query.filter(
+        GradingJob.status == JOB_RUNNING,
+        GradingJob.started_at < stale_before
+    ).update({'status': JOB_QUEUED, 'started_at': None}, synchronize_session=False)
+    db.session.commit()
+
     # 添加初始测试用户（在实际使用中应该删除这部分）
     if not User.query.filter_by(username='t1').first():
         teacher = User(username='t1', password='123', role='teacher', name='张老师')
@@ -186,6 +382,910 @@ with app.app_context():
     db.session.commit()
 
 
+# 预览页显示的文件类型
+FILE_TYPE_NAMES = {'docx': 'Word文档', 'doc': 'Word文档', 'pdf': 'PDF文档', 'txt': '文本文件'}
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def extract_submission_text(submission):
+    """
+    在提取进程池中提取提交文件的文本，按文件哈希保存（由调用方提交事务），相同文件只提取一次
+
+    Returns:
+        SubmissionText 记录（文件无法提取时 error 为原因），没有文件或文件类型不支持时返回 None；
+        超时等暂时性失败时抛出 ExtractionRetryable，不保存记录
+    """
+    if not submission.file_path or not is_supported(submission.file_path):
+        submission.file_hash = None
+        return None
+    file_hash = file_sha256(submission.file_path)
+    submission.file_hash = file_hash
+    record = db.session.get(SubmissionText, file_hash)
+    if record is not None:
+        return record
+    try:
+        extracted = get_shared_extractor_pool().extract(submission.file_path)
+    except ExtractionRetryable:
+        # 超时或进程池被其他文件的超时终止，与文件本身无关，不保存，下次读取时重试
+        raise
+    except ExtractionError as e:
+        record = SubmissionText(file_hash=file_hash, text='', error=str(e))
+    else:
+        record = SubmissionText(
+            file_hash=file_hash,
+            text=extracted['text'],
+            paragraph_count=extracted['paragraph_count'],
+            table_count=extracted['table_count'],
+            code_spans=json.dumps(code_spans(extracted['text']))
+        )
+    db.session.add(record)
+    return record
+
+
+def stored_submission_text(submission):
+    """返回已保存的提交文本记录，尚未提取时返回 None"""
+    if not submission.file_hash:
+        return None
+    return db.session.get(SubmissionText, submission.file_hash)
+
+
+def discard_submission_text(file_hash):
+    """文件被替换后，没有其他提交使用的旧文本一并删除"""
+    if file_hash and not Submission.query.filter_by(file_hash=file_hash).first():
+        SubmissionText.query.filter_by(file_hash=file_hash).delete(synchronize_session=False)
+
+
+def read_submission_content(submission):
+    """
+    读取提交的作业文本，优先使用上传时保存的结果；旧提交首次读取时补提取
+
+    Returns:
+        作业文本，没有文件或文件类型不支持时返回 None；文件无法提取文本时抛出 ExtractionError
+    """
+    if not submission.file_path or not is_supported(submission.file_path):
+        return None
+    record = stored_submission_text(submission)
+    if record is None:
+        record = extract_submission_text(submission)
+    if record.error:
+        raise ExtractionError(record.error)
+    return record.text
+
+
+def content_hash(text_value):
+    return hashlib.sha256((text_value or '').encode('utf-8')).hexdigest()
+
+
+def load_question_segments(submission, content):
+    """
+    返回提交按题拆分的结构（按题号排序），作业内容变化时重新拆分；作业题目编辑后会重建，每次按题号重新对应（由调用方提交事务）
+
+    Args:
+        submission: 提交记录
+        content: 作业文本
+
+    Returns:
+        QuestionSegment 列表
+    """
+    source_hash = content_hash(content)
+    segments = QuestionSegment.query.filter_by(submission_id=submission.id).order_by(QuestionSegment.position).all()
+    if not segments or segments[0].content_hash != source_hash:
+        QuestionSegment.query.filter_by(submission_id=submission.id).delete(synchronize_session=False)
+        segments = [QuestionSegment(submission_id=submission.id, content_hash=source_hash, **segment)
+                    for segment in segment_homework(content)]
+        db.session.add_all(segments)
+    questions = sorted(submission.assignment.questions, key=lambda q: q.id)
+    for segment in segments:
+        segment.question_id = questions[segment.position].id if segment.position < len(questions) else None
+    return segments
+
+
+def load_question_segment(submission, position, content=None):
+    """
+    只读取提交中一道题的拆分结构；已拆分且作业内容未变化时只查询这一道题，否则整份重新拆分（由调用方提交事务）
+
+    Args:
+        submission: 提交记录
+        position: 题号，从0开始
+        content: 作业文本，为空时读取已保存的提取结果
+
+    Returns:
+        QuestionSegment，作业中没有该题或文件无法读取时返回 None
+    """
+    if content is None:
+        content = read_submission_content(submission)
+        if content is None:
+            return None
+    source_hash = content_hash(content)
+    segment = QuestionSegment.query.filter_by(submission_id=submission.id, position=position).first()
+    if segment is None or segment.content_hash != source_hash:
+        fresh = segment is None and QuestionSegment.query.filter_by(
+            submission_id=submission.id, content_hash=source_hash).first() is not None
+        if fresh:
+            return None
+        segments = load_question_segments(submission, content)
+        return segments[position] if position < len(segments) else None
+    questions = sorted(submission.assignment.questions, key=lambda q: q.id)
+    segment.question_id = questions[position].id if position < len(questions) else None
+    return segment
+
+
+def preflight_rejection(content):
+    """预检不通过时返回以❌开头的说明（与判分器的错误信息格式一致），通过时返回 None"""
+    reason = preflight_check(content)
+    return f"❌ 作业未通过预检：{reason}" if reason else None
+
+
+def current_study_plan(submission):
+    """返回与当前评分结果对应的学习计划，评分结果变化后旧计划视为失效"""
+    plan = submission.study_plan
+    if plan and submission.evaluation_result and plan.evaluation_hash == content_hash(submission.evaluation_result):
+        return plan
+    return None
+
+
+def index_submission_similarity(submission, content=None):
+    """
+    增量更新一份提交的相似度签名和LSH桶，作业内容未变化时不重复计算（由调用方提交事务）
+
+    Returns:
+        是否参与相似度比较（文件无法读取或代码过短时为 False）
+    """
+    if content is None:
+        if not submission.file_path or not os.path.exists(submission.file_path):
+            return False
+        content = read_submission_content(submission)
+        if content is None:
+            return False
+    source_hash = content_hash(content)
+    existing = submission.fingerprint
+    if existing and existing.content_hash == source_hash:
+        return existing.signature is not None
+
+    SimilarityBucket.query.filter_by(submission_id=submission.id).delete(synchronize_session=False)
+    result = fingerprint(content)
+    if existing is None:
+        existing = SubmissionFingerprint(submission_id=submission.id)
+        db.session.add(existing)
+    existing.assignment_id = submission.assignment_id
+    existing.content_hash = source_hash
+    existing.token_count = result['tokens'] if result else 0
+    existing.signature = encode_signature(result['signature']) if result else None
+    existing.created_at = datetime.utcnow()
+    if result:
+        for band, bucket in enumerate(result['buckets']):
+            db.session.add(SimilarityBucket(submission_id=submission.id, assignment_id=submission.assignment_id,
+                                            band=band, bucket=bucket))
+    return result is not None
+
+
+def similar_submission_pairs(assignment):
+    """
+    找出一份作业中相似的提交，以及与同一老师其他作业（如往届同题作业）中相似的提交
+
+    只比较至少有一个LSH桶相同的候选对，再用签名估计相似度过滤，不做两两比较。
+
+    Returns:
+        按相似度从高到低排列的 [{'submission', 'other', 'similarity', 'cross_assignment'}]
+    """
+    # 补齐尚未建立索引的提交（功能上线前的旧提交）
+    missing = Submission.query.outerjoin(SubmissionFingerprint).filter(
+        Submission.assignment_id == assignment.id,
+        Submission.file_path.isnot(None),
+        SubmissionFingerprint.submission_id.is_(None)
+    ).all()
+    for submission in missing:
+        record = stored_submission_text(submission)
+        if record is None:
+            # 文字尚未提取的提交交给后台提取任务，提取后同时建立索引，不在请求中解析文件
+            if is_supported(submission.file_path) and os.path.exists(submission.file_path):
+                enqueue_grading_job(submission, JOB_KIND_EXTRACT, PRIORITY_BACKFILL)
+            continue
+        if record.error:
+            continue
+        try:
+            index_submission_similarity(submission, record.text)
+        except Exception as e:
+            print(f"⚠️ 提交 {submission.id} 建立相似度索引失败: {e}")
+    if missing:
+        db.session.commit()
+
+    own = aliased(SimilarityBucket)
+    other = aliased(SimilarityBucket)
+    teacher_assignments = db.session.query(Assignment.id).filter(Assignment.teacher_id == assignment.teacher_id)
+    candidates = db.session.query(own.submission_id, other.submission_id, other.assignment_id).join(
+        other, and_(own.band == other.band, own.bucket == other.bucket, own.submission_id != other.submission_id)
+    ).filter(
+        own.assignment_id == assignment.id,
+        other.assignment_id.in_(teacher_assignments)
+    ).distinct().all()
+
+    pairs = set()
+    for submission_id, other_id, other_assignment_id in candidates:
+        cross_assignment = other_assignment_id != assignment.id
+        if not cross_assignment and other_id < submission_id:
+            continue
+        pairs.add((submission_id, other_id, cross_assignment))
+    if not pairs:
+        return []
+
+    ids = {submission_id for pair in pairs for submission_id in pair[:2]}
+    signatures = {
+        row.submission_id: decode_signature(row.signature)
+        for row in SubmissionFingerprint.query.filter(SubmissionFingerprint.submission_id.in_(ids))
+    }
+    results = []
+    for submission_id, other_id, cross_assignment in pairs:
+        similarity = estimate_similarity(signatures.get(submission_id), signatures.get(other_id, []))
+        if similarity >= Config.SIMILARITY_THRESHOLD:
+            results.append({'submission_id': submission_id, 'other_id': other_id,
+                            'similarity': similarity, 'cross_assignment': cross_assignment})
+    submissions = {submission.id: submission for submission in Submission.query.filter(
+        Submission.id.in_({result['submission_id'] for result in results} |
+                          {result['other_id'] for result in results})
+    )} if results else {}
+    for result in results:
+        result['submission'] = submissions[result.pop('submission_id')]
+        result['other'] = submissions[result.pop('other_id')]
+    results.sort(key=lambda result: result['similarity'], reverse=True)
+    return results
+
+
+def grading_source_hash(job):
+    """任务输入内容的哈希：评分任务为作业文本，学习计划任务为评分结果"""
+    submission = job.submission
+    if job.kind == JOB_KIND_STUDY_PLAN:
+        return content_hash(submission.evaluation_result)
+    return content_hash(read_submission_content(submission))
+
+
+def acquire_grading_lease(lease_key, job_id):
+    """获取评分租约，已被其他未过期的任务持有时返回 False"""
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=Config.GRADING_JOB_STALE_SECONDS)
+    try:
+        db.session.add(GradingLease(lease_key=lease_key, job_id=job_id, expires_at=expires_at))
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+
+    # 持有者进程异常退出时租约会过期，由后来者接管
+    taken = GradingLease.query.filter(
+        GradingLease.lease_key == lease_key,
+        GradingLease.expires_at < now
+    ).update({'job_id': job_id, 'expires_at': expires_at}, synchronize_session=False)
+    db.session.commit()
+    return taken == 1
+
+
+def release_grading_lease(lease_key, job_id):
+    GradingLease.query.filter_by(lease_key=lease_key, job_id=job_id).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def attach_existing_result(job, source_hash):
+    """同一内容已有结果（通常由并发的同类任务刚刚产出）时直接复用，返回是否复用成功"""
+    submission = job.submission
+    db.session.refresh(submission)
+    if job.kind == JOB_KIND_EVALUATE:
+        if submission.evaluation_result and submission.evaluation_hash == source_hash:
+            job.result = submission.evaluation_result
+            return True
+    elif job.kind == JOB_KIND_STUDY_PLAN:
+        plan = current_study_plan(submission)
+        if plan:
+            job.result = plan.content
+            return True
+    return False
+
+
+def latest_grading_job(submission_id, kind):
+    return GradingJob.query.filter_by(submission_id=submission_id, kind=kind) \
+        .order_by(GradingJob.id.desc()).first()
+
+
+def extraction_pending(submission_id):
+    """提交的文件文字是否正由后台任务提取（评分任务需等其完成后再读取作业内容）"""
+    return GradingJob.query.filter(
+        GradingJob.submission_id == submission_id,
+        GradingJob.kind == JOB_KIND_EXTRACT,
+        GradingJob.status.in_(ACTIVE_JOB_STATUSES)
+    ).first() is not None
+
+
+def enqueue_grading_job(submission, kind=JOB_KIND_EVALUATE, priority=PRIORITY_INTERACTIVE, run_id=None, delay=0):
+    """
+    为提交创建后台评分任务，已有排队或运行中的同类任务时直接返回该任务
+
+    Args:
+        submission: 提交记录
+        kind: 任务类型
+        priority: 优先级类别，已有排队中的任务时只会提升、不会降低其优先级
+        run_id: 所属的批量评分，已有的任务尚未归属批量评分时也计入该批次
+        delay: 延迟执行的秒数；已有排队中的任务时重新计时（合并连续的重复提交），为0时立即执行
+    """
+    course_id = submission.assignment.course_id
+    not_before = datetime.utcnow() + timedelta(seconds=delay) if delay else None
+    job = GradingJob.query.filter(
+        GradingJob.submission_id == submission.id,
+        GradingJob.kind == kind,
+        GradingJob.status.in_(ACTIVE_JOB_STATUSES)
+    ).first()
+    if job:
+        if run_id and not job.run_id:
+            job.run_id = run_id
+        if job.status == JOB_QUEUED:
+            job.not_before = not_before
+            if higher_priority(priority, job.priority):
+                job.priority = priority
+        db.session.commit()
+        if job.status == JOB_QUEUED:
+            # 重复加入不会产生重复任务；任务由其他进程创建时本进程也能拾取
+            grading_pool.submit(job.id, job.priority, course_id, delay)
+        return job
+
+    job = GradingJob(submission_id=submission.id, kind=kind, status=JOB_QUEUED,
+                     priority=priority, course_id=course_id, run_id=run_id, not_before=not_before)
+    db.session.add(job)
+    db.session.commit()
+    grading_pool.submit(job.id, priority, course_id, delay)
+    return job
+
+
+def cancel_grading_jobs(submission):
+    """
+    作业重新提交后作废依据旧内容的任务：运行中的任务结果不再入库，排队中的学习计划任务取消
+
+    排队中的评分任务执行时才读取作业内容，无需取消。
+
+    Returns:
+        被取消的评分任务所属的批量评分ID（没有时为 None）
+    """
+    jobs = GradingJob.query.filter(
+        GradingJob.submission_id == submission.id,
+        or_(GradingJob.status == JOB_RUNNING,
+            (GradingJob.status == JOB_QUEUED) & (GradingJob.kind == JOB_KIND_STUDY_PLAN))
+    ).all()
+    run_id = None
+    for job in jobs:
+        job.status = JOB_CANCELLED
+        job.error = "作业已重新提交，该任务已作废"
+        job.finished_at = datetime.utcnow()
+        if job.kind == JOB_KIND_EVALUATE:
+            run_id = job.run_id or run_id
+        print(f"🚫 作业{submission.id}已重新提交，作废评分任务 {job.id}")
+    return run_id
+
+
+def ensure_grading_job(submission, kind, outdated=False, priority=PRIORITY_INTERACTIVE):
+    """
+    返回提交最近的同类任务，必要时重新排队
+
+    Args:
+        submission: 提交记录
+        kind: 任务类型
+        outdated: 已完成任务的产出是否已失效（如评分结果变化后的学习计划）
+        priority: 重新排队时的优先级类别
+    """
+    job = latest_grading_job(submission.id, kind)
+    # 失败后间隔一段时间才允许重新排队，避免页面反复刷新触发大模型调用
+    retry_failed = job and job.status == JOB_FAILED and \
+        job.finished_at < datetime.utcnow() - timedelta(seconds=Config.GRADING_RETRY_COOLDOWN)
+    rerun_done = outdated and job and job.status == JOB_DONE
+    if not job or retry_failed or rerun_done or job.status in (JOB_QUEUED, JOB_CANCELLED):
+        job = enqueue_grading_job(submission, kind, priority)
+    return job
+
+
+def scheduled_grader(job):
+    """按任务的优先级类别限制大模型并发的判分器；不使用大模型时判分器只做本地静态评分"""
+    if not Config.IS_LLM_RUN:
+        return PythonCodeGrader()
+    return PythonCodeGrader(client=grading_pool.scheduler.client_for(job.priority, get_shared_pool()))
+
+
+def _stream_to_hub(job, chunks, failure_prefix):
+    """把大模型的流式输出转发给订阅该任务的 SSE 连接，返回完整文本"""
+    key = (job.submission_id, job.kind)
+    grading_stream_hub.start(key)
+    parts = []
+    try:
+        for delta in chunks:
+            parts.append(delta)
+            grading_stream_hub.publish(key, delta)
+    except LLMError as e:
+        return f"{failure_prefix}{str(e)}"
+    return ''.join(parts)
+
+
+def question_specs(questions):
+    """判分器使用的题目信息：题目、知识点和运行测试数据"""
+    return [{'prompt': q.prompt, 'knowledge_point': q.knowledge_point,
+             'test_cases': parse_test_cases(q.test_input, q.expected_output)} for q in questions]
+
+
+def _grade_by_questions(job, grader, segments, questions):
+    """按已拆分的各题作答并发评分，每完成一题就推送给预览页"""
+    key = (job.submission_id, job.kind)
+    grading_stream_hub.start(key)
+    answers = [segment.text for segment in segments]
+    stored = {grade.position: grade for grade in QuestionGrade.query.filter_by(submission_id=job.submission_id)}
+    previous = {position: {'answer_hash': grade.answer_hash, 'result': json.loads(grade.result)}
+                for position, grade in stored.items()}
+
+    results = []
+    for result in grader.iter_evaluate_by_questions(answers, question_specs(questions), previous=previous):
+        results.append(result)
+        score = f"{result['total']:.1f}分" if result['total'] is not None else "评分失败"
+        note = "（作答未变化，沿用上次评分）" if result['reused'] else ""
+        grading_stream_hub.publish(key, f"题目{result['index'] + 1}（知识点：{result['knowledge_point']}）：{score}{note}\n")
+    results.sort(key=lambda r: r['index'])
+
+    # 评分成功的题目逐题保存，即使其他题失败，重试时也只需评失败的题
+    for result in results:
+        if result['reused'] or result['total'] is None:
+            continue
+        grade = stored.get(result['index'])
+        if grade is None:
+            grade = QuestionGrade(submission_id=job.submission_id, position=result['index'])
+            db.session.add(grade)
+        grade.answer_hash = result['answer_hash']
+        grade.result = json.dumps({name: value for name, value in result.items()
+                                   if name not in ('index', 'answer_hash', 'reused')}, ensure_ascii=False)
+        grade.created_at = datetime.utcnow()
+    db.session.commit()
+    return grader.combine_question_results(results)
+
+
+def _run_evaluate_job(job, source_hash):
+    submission = job.submission
+    content = read_submission_content(submission)
+    if content is None:
+        raise ValueError("此文件类型不支持自动评分")
+    # 预检不通过的作业不调用大模型
+    rejection = preflight_rejection(content)
+    if rejection:
+        raise ValueError(rejection)
+    segments = load_question_segments(submission, content)
+    db.session.commit()
+
+    grader = scheduled_grader(job)
+    questions = sorted(submission.assignment.questions, key=lambda q: q.id)
+    if Config.PER_QUESTION_GRADING and questions:
+        grader_result = _grade_by_questions(job, grader, segments, questions)
+    elif Config.LLM_STREAMING:
+        grader_result = _stream_to_hub(job, grader.evaluate_code_2_stream(content), "❌ 评分失败：")
+    else:
+        grader_result = grader.evaluate_code_2(content)
+    _save_evaluation(job, grader, grader_result, source_hash)
+
+
+def _check_not_cancelled(job):
+    """评分期间作业被重新提交时任务已作废，结果不能入库"""
+    status = db.session.query(GradingJob.status).filter_by(id=job.id).scalar()
+    if status == JOB_CANCELLED:
+        raise RuntimeError("作业已重新提交，该任务已作废")
+
+
+def _save_evaluation(job, grader, grader_result, source_hash):
+    """保存评分结果和解析出的各维度分，评分失败时抛出异常"""
+    submission = job.submission
+    print(f"📊作业评估结果，来自大模型{Config.MODEL_NAME}--->\n", grader_result)
+    if is_error_result(grader_result):
+        raise RuntimeError(grader_result)
+    _check_not_cancelled(job)
+
+    scores = grader.extract_scores(grader_result)
+    if scores is None:
+        print(f"⚠️ 作业{submission.id}的评分结果无法解析出分数")
+    submission.evaluation_result = grader_result
+    submission.evaluation_hash = source_hash
+    apply_scores(submission, scores)
+    job.result = grader_result
+
+
+def _run_study_plan_job(job):
+    if not Config.IS_LLM_RUN:
+        raise ValueError("未使用大模型，不生成学习计划")
+    submission = job.submission
+    if not submission.evaluation_result:
+        raise ValueError("尚无评分结果，无法生成学习计划")
+    content = read_submission_content(submission)
+    if content is None:
+        raise ValueError("此文件类型不支持生成学习计划")
+
+    evaluation_result = submission.evaluation_result
+    grader = scheduled_grader(job)
+    if Config.LLM_STREAMING:
+        study_plan = _stream_to_hub(job, grader.generate_study_plan_stream(
+            homework_content=content,
+            evaluation_result=evaluation_result
+        ), "❌ 学习计划生成失败：")
+    else:
+        study_plan = grader.generate_study_plan(
+            homework_content=content,
+            evaluation_result=evaluation_result
+        )
+    if is_error_result(study_plan):
+        raise RuntimeError(study_plan)
+    print(f"✅ 作业{submission.id}学习计划生成完成：\n{study_plan[:100]}...")
+
+    # 保存学习计划，并记录其依据的评分结果
+    _check_not_cancelled(job)
+    plan = submission.study_plan or StudyPlan(submission_id=submission.id)
+    plan.evaluation_hash = content_hash(evaluation_result)
+    plan.content = study_plan
+    plan.created_at = datetime.utcnow()
+    db.session.add(plan)
+
+
+def _run_extract_job(job):
+    """上传后的后台处理：在提取进程池中提取文件文字，再更新相似度索引、拆分各题结构并预检"""
+    submission = job.submission
+    record = extract_submission_text(submission)
+    if record is None:
+        raise ValueError("此文件类型不支持提取文字")
+    _check_not_cancelled(job)
+    file_hash = submission.file_hash
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # 相同文件的文字刚由其他提交的任务保存，直接使用
+        db.session.rollback()
+        submission.file_hash = file_hash
+        record = db.session.get(SubmissionText, file_hash)
+    if record.error:
+        print(f"⚠️ 作业{submission.id}的文件无法提取文字：{record.error}")
+        return
+
+    index_submission_similarity(submission, record.text)
+    load_question_segments(submission, record.text)
+    rejection = preflight_check(record.text)
+    if rejection:
+        print(f"⚠️ 作业{submission.id}未通过预检：{rejection}")
+
+
+# 本进程已认领、尚未结束的任务，命令行评分被中断时据此把任务放回队列
+_claimed_jobs = set()
+_claimed_jobs_lock = threading.Lock()
+
+
+def claim_grading_job(job_id):
+    """原子地认领任务，多个进程/线程同时拾取时只有一个能成功；未到执行时间的任务不认领"""
+    claimed = GradingJob.query.filter(
+        GradingJob.id == job_id,
+        GradingJob.status == JOB_QUEUED,
+        or_(GradingJob.not_before.is_(None), GradingJob.not_before <= datetime.utcnow())
+    ).update({
+        'status': JOB_RUNNING,
+        'started_at': datetime.utcnow(),
+        'attempts': GradingJob.attempts + 1
+    }, synchronize_session=False)
+    db.session.commit()
+    if claimed:
+        with _claimed_jobs_lock:
+            _claimed_jobs.add(job_id)
+    return bool(claimed)
+
+
+def _defer_grading_job(job, delay):
+    """把已认领的任务放回队列，delay 秒后再执行；等待不计入尝试次数"""
+    job.status = JOB_QUEUED
+    job.started_at = None
+    job.attempts = max((job.attempts or 1) - 1, 0)
+    job.not_before = datetime.utcnow() + timedelta(seconds=delay)
+    db.session.commit()
+    with _claimed_jobs_lock:
+        _claimed_jobs.discard(job.id)
+    grading_pool.submit(job.id, job.priority, job.course_id, delay)
+
+
+def _fail_grading_job(job_id, error):
+    db.session.rollback()
+    job = db.session.get(GradingJob, job_id)
+    if job.status == JOB_CANCELLED:
+        print(f"🚫 评分任务 {job_id} 已作废")
+        return job
+    print(f"❌ 评分任务 {job_id} 失败：{error}")
+    job.status = JOB_FAILED
+    job.error = str(error)
+    return job
+
+
+def _finish_grading_job(job, lease_key=None):
+    """任务结束后入库、释放租约、接着生成学习计划并通知订阅方"""
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+    with _claimed_jobs_lock:
+        _claimed_jobs.discard(job.id)
+    # 结果入库后才释放租约，等待中的任务随后即可复用
+    if lease_key:
+        release_grading_lease(lease_key, job.id)
+
+    # 评分完成后接着生成学习计划（评分结果未变化时沿用已有计划），学习计划只能由大模型生成
+    if job.kind == JOB_KIND_EVALUATE and job.status == JOB_DONE and Config.IS_LLM_RUN \
+            and not current_study_plan(job.submission):
+        enqueue_grading_job(job.submission, JOB_KIND_STUDY_PLAN, job.priority)
+
+    # 结果入库后再结束流式频道，订阅方收到结束事件时可直接读取数据库；
+    # 已作废的任务不结束频道，频道此时可能属于依据新内容的任务
+    if job.status != JOB_CANCELLED:
+        grading_stream_hub.finish((job.submission_id, job.kind), job.error if job.status == JOB_FAILED else None)
+
+
+def _packable(job):
+    """批量评分中不按题评分的整份作业评分任务，可以和同批次的其他任务合并请求"""
+    if not (job.run_id and job.kind == JOB_KIND_EVALUATE and Config.GRADE_ALL_PACKED and Config.IS_LLM_RUN):
+        return False
+    return not (Config.PER_QUESTION_GRADING and job.submission.assignment.questions)
+
+
+def _claim_pack_siblings(job):
+    """认领同一批次中同优先级的其他排队任务，与当前任务合并评分"""
+    candidates = GradingJob.query.filter(
+        GradingJob.run_id == job.run_id,
+        GradingJob.kind == JOB_KIND_EVALUATE,
+        GradingJob.status == JOB_QUEUED,
+        GradingJob.priority == job.priority,
+        GradingJob.id != job.id
+    ).order_by(GradingJob.id).limit(Config.PACK_MAX_SUBMISSIONS - 1).all()
+    return [db.session.get(GradingJob, candidate.id) for candidate in candidates if claim_grading_job(candidate.id)]
+
+
+def _run_packed_evaluate_jobs(jobs):
+    """合并评分同一批次的多个任务，合并结果中缺失的作业由判分器改为单独评分"""
+    grader = scheduled_grader(jobs[0])
+    pending = []  # (任务, 内容哈希, 租约, 作业内容)
+    for job in jobs:
+        try:
+            if extraction_pending(job.submission_id):
+                _defer_grading_job(job, Config.GRADING_LEASE_POLL_INTERVAL)
+                continue
+            content = read_submission_content(job.submission)
+            if content is None:
+                raise ValueError("此文件类型不支持自动评分")
+            rejection = preflight_rejection(content)
+            if rejection:
+                raise ValueError(rejection)
+            source_hash = content_hash(content)
+            if attach_existing_result(job, source_hash):
+                job.status = JOB_DONE
+                job.error = None
+                _finish_grading_job(job)
+                continue
+            lease_key = f"{job.submission_id}:{job.kind}:{source_hash}"
+            if not acquire_grading_lease(lease_key, job.id):
+                # 同一内容正由其他任务评分，放回队列，之后按单份流程复用其结果
+                _defer_grading_job(job, Config.GRADING_LEASE_POLL_INTERVAL)
+                continue
+            pending.append((job, source_hash, lease_key, content))
+        except Exception as e:
+            _finish_grading_job(_fail_grading_job(job.id, e))
+    if not pending:
+        return
+
+    try:
+        results = grader.evaluate_packed([{'id': job.id, 'content': content} for job, _, _, content in pending])
+        error = None
+    except Exception as e:
+        results, error = {}, e
+    for job, source_hash, lease_key, _ in pending:
+        try:
+            if error:
+                raise error
+            _save_evaluation(job, grader, results[str(job.id)], source_hash)
+            job.status = JOB_DONE
+            job.error = None
+        except Exception as e:
+            job = _fail_grading_job(job.id, e)
+        _finish_grading_job(job, lease_key)
+
+
+def run_grading_job(job_id):
+    """工作线程入口：认领并执行一个评分任务"""
+    with app.app_context():
+        try:
+            if not claim_grading_job(job_id):
+                return
+
+            job = db.session.get(GradingJob, job_id)
+            if job.kind != JOB_KIND_EXTRACT and extraction_pending(job.submission_id):
+                # 文件文字仍在提取，放回队列，避免与提取任务重复解析同一文件
+                _defer_grading_job(job, Config.GRADING_LEASE_POLL_INTERVAL)
+                return
+            if _packable(job):
+                siblings = _claim_pack_siblings(job)
+                if siblings:
+                    _run_packed_evaluate_jobs([job] + siblings)
+                    return
+
+            lease_key = None
+            try:
+                if job.kind not in (JOB_KIND_EVALUATE, JOB_KIND_STUDY_PLAN, JOB_KIND_EXTRACT):
+                    raise ValueError(f"未知的任务类型：{job.kind}")
+                if job.kind == JOB_KIND_EXTRACT:
+                    # 提取任务不调用大模型，不需要单飞租约
+                    _run_extract_job(job)
+                else:
+                    # 单飞：同一提交、同一内容只允许一个任务调用大模型，其余任务稍后再执行并复用其结果
+                    source_hash = grading_source_hash(job)
+                    candidate_key = f"{job.submission_id}:{job.kind}:{source_hash}"
+                    if attach_existing_result(job, source_hash):
+                        print(f"🔗 评分任务 {job_id} 复用了同一作业已有的结果")
+                    elif acquire_grading_lease(candidate_key, job_id):
+                        lease_key = candidate_key
+                        # 上一个持有者可能恰好在检查之后保存结果并释放租约，拿到租约后再确认一次，避免重复调用大模型
+                        if attach_existing_result(job, source_hash):
+                            print(f"🔗 评分任务 {job_id} 复用了同一作业已有的结果")
+                        elif job.kind == JOB_KIND_EVALUATE:
+                            _run_evaluate_job(job, source_hash)
+                        else:
+                            _run_study_plan_job(job)
+                    else:
+                        # 不在工作线程中等待，放回队列并让出线程和调度名额；持有者异常退出时租约过期后由本任务接管
+                        _defer_grading_job(job, Config.GRADING_LEASE_POLL_INTERVAL)
+                        return
+                job.status = JOB_DONE
+                job.error = None
+            except Exception as e:
+                job = _fail_grading_job(job_id, e)
+            _finish_grading_job(job, lease_key)
+        finally:
+            db.session.remove()
+
+
+def recover_grading_jobs():
+    """返回数据库中所有已到执行时间的排队任务 (任务ID, 优先级类别, 课程ID)"""
+    with app.app_context():
+        try:
+            jobs = GradingJob.query.filter(
+                GradingJob.status == JOB_QUEUED,
+                or_(GradingJob.not_before.is_(None), GradingJob.not_before <= datetime.utcnow())
+            ).order_by(GradingJob.id).all()
+            return [(job.id, job.priority or PRIORITY_INTERACTIVE, job.course_id) for job in jobs]
+        finally:
+            db.session.remove()
+
+
+def job_status_payload(job):
+    if not job:
+        return None
+    return {
+        'id': job.id,
+        'status': job.status,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def grade_all_priority(assignment):
+    """截止时间前后一段时间内的批量评分按截止批量类别调度，其余按回填类别"""
+    window = timedelta(hours=Config.GRADE_ALL_DEADLINE_WINDOW_HOURS)
+    if assignment.due_date and abs(assignment.due_date - datetime.utcnow()) <= window:
+        return PRIORITY_DEADLINE
+    return PRIORITY_BACKFILL
+
+
+def start_grading_run(assignment, teacher_id):
+    """
+    为作业的所有未评分提交创建评分任务；该作业已有进行中的批量评分时继续该批次
+
+    已有评分结果的提交直接跳过，失败的任务重新排队，运行中断的任务超时后重新排队，
+    因此中断后再次调用只会补评尚未完成的提交。
+
+    Returns:
+        批量评分记录
+    """
+    run = GradingRun.query.filter_by(assignment_id=assignment.id, status=RUN_RUNNING) \
+        .order_by(GradingRun.id.desc()).first()
+    if run:
+        run.started_at = datetime.utcnow()
+    else:
+        run = GradingRun(assignment_id=assignment.id, teacher_id=teacher_id, status=RUN_RUNNING,
+                         priority=grade_all_priority(assignment))
+        db.session.add(run)
+    db.session.commit()
+
+    # 进程退出前未完成的任务
+    stale_before = datetime.utcnow() - timedelta(seconds=Config.GRADING_JOB_STALE_SECONDS)
+    GradingJob.query.filter(
+        GradingJob.run_id == run.id,
+        GradingJob.status == JOB_RUNNING,
+        GradingJob.started_at < stale_before
+    ).update({'status': JOB_QUEUED, 'started_at': None}, synchronize_session=False)
+    db.session.commit()
+
+    submissions = Submission.query.filter(
+        Submission.assignment_id == assignment.id,
+        Submission.evaluation_result.is_(None)
+    ).order_by(Submission.id).all()
+    gradable = [sub for sub in submissions if sub.file_path and is_supported(sub.file_path)]
+    for submission in gradable:
+        enqueue_grading_job(submission, JOB_KIND_EVALUATE, run.priority, run_id=run.id)
+    # 不使用大模型时同样由后台评分任务完成，判分器改用本地静态分析（见 scheduled_grader）
+    mode = "大模型" if Config.IS_LLM_RUN else "本地静态分析"
+    print(f"📋 作业{assignment.id}批量评分（批次{run.id}，{mode}）：{len(gradable)} 份提交待评分")
+    return run
+
+
+def grading_run_progress(run):
+    """
+    汇总批量评分的进度，全部结束时把批次标记为完成
+
+    Returns:
+        {'status', 'total', 'done', 'failed', 'running', 'queued', 'remaining', 'eta_seconds', 'failures'}
+    """
+    # 同一提交在批次中可能有多个任务（失败后重新排队），以最新的为准
+    latest = {}
+    for job in GradingJob.query.filter_by(run_id=run.id, kind=JOB_KIND_EVALUATE).order_by(GradingJob.id).all():
+        latest[job.submission_id] = job
+    # 重新提交后作废且未重新排队的提交不再计入该批次
+    jobs = [job for job in latest.values() if job.status != JOB_CANCELLED]
+    counts = {status: sum(1 for job in jobs if job.status == status)
+              for status in (JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED)}
+    remaining = counts[JOB_QUEUED] + counts[JOB_RUNNING]
+
+    # 按本次开始（或继续）以来的完成速度估算剩余时间
+    eta_seconds = None
+    finished_since = sum(1 for job in jobs if job.finished_at and job.finished_at >= run.started_at)
+    if remaining and finished_since:
+        elapsed = (datetime.utcnow() - run.started_at).total_seconds()
+        eta_seconds = round(elapsed / finished_since * remaining)
+
+    if remaining == 0 and run.status == RUN_RUNNING:
+        run.status = RUN_DONE
+        run.finished_at = datetime.utcnow()
+        db.session.commit()
+
+    return {
+        'status': run.status,
+        'total': len(jobs),
+        'done': counts[JOB_DONE],
+        'failed': counts[JOB_FAILED],
+        'running': counts[JOB_RUNNING],
+        'queued': counts[JOB_QUEUED],
+        'remaining': remaining,
+        'eta_seconds': eta_seconds,
+        'failures': [{'submission_id': job.submission_id, 'student': job.submission.student.name, 'error': job.error}
+                     for job in jobs if job.status == JOB_FAILED]
+    }
+
+
+def requeue_claimed_jobs():
+    """把本进程已认领、尚未结束的任务放回队列并释放其租约，用于命令行评分被中断时"""
+    with _claimed_jobs_lock:
+        job_ids = list(_claimed_jobs)
+        _claimed_jobs.clear()
+    if not job_ids:
+        return 0
+    GradingLease.query.filter(GradingLease.job_id.in_(job_ids)).delete(synchronize_session=False)
+    GradingJob.query.filter(
+        GradingJob.id.in_(job_ids),
+        GradingJob.status == JOB_RUNNING
+    ).update({'status': JOB_QUEUED, 'started_at': None}, synchronize_session=False)
+    db.session.commit()
+    return len(job_ids)
+
+
+grading_pool = GradingWorkerPool(run_grading_job, recover=recover_grading_jobs)
+grading_stream_hub = GradingStreamHub()
+
+
+@app.before_request
+def ensure_grading_workers():
+    # 在实际处理请求的进程中启动评分线程（已启动时直接返回）
+    grading_pool.start()
+
+
 @app.route('/', methods=['GET', 'POST'])
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -400,7 +1500,8 @@ def create_assignment():
             due_date=due_date,
             course_id=int(course_id) if course_id else None,
             status=status,
-            withdrawn_at=None
+            withdrawn_at=None,
+            eager_grading=bool(request.form.get('eager_grading'))
         )
 
         db.session.add(new_assignment)
@@ -408,13 +1509,18 @@ def create_assignment():
 
         question_texts = request.form.getlist('question_text[]')
         knowledge_points = request.form.getlist('knowledge_point[]')
+        test_inputs = request.form.getlist('test_input[]')
+        expected_outputs = request.form.getlist('expected_output[]')
 
-        for question_text, knowledge_point in zip(question_texts, knowledge_points):
+        for question_text, knowledge_point, test_input, expected_output in zip(
+                question_texts, knowledge_points, test_inputs, expected_outputs):
             if question_text.strip():
                 assignment_question = AssignmentQuestion(
                     assignment_id=new_assignment.id,
                     prompt=question_text.strip(),
-                    knowledge_point=knowledge_point.strip() or '未指定'
+                    knowledge_point=knowledge_point.strip() or '未指定',
+                    test_input=test_input.strip('\r\n') or None,
+                    expected_output=expected_output.strip('\r\n') or None
                 )
                 db.session.add(assignment_question)
 
@@ -446,6 +1552,7 @@ def edit_assignment(assignment_id):
         assignment.due_date = datetime.strptime(due_date_str, '%Y-%m-%d') if due_date_str else None
         course_id = request.form.get('course_id')
         assignment.course_id = int(course_id) if course_id else None
+        assignment.eager_grading = bool(request.form.get('eager_grading'))
 
         publish_action = request.form.get('publish_action', assignment.status)
         if publish_action == 'draft':
@@ -462,13 +1569,18 @@ def edit_assignment(assignment_id):
 
         question_texts = request.form.getlist('question_text[]')
         knowledge_points = request.form.getlist('knowledge_point[]')
+        test_inputs = request.form.getlist('test_input[]')
+        expected_outputs = request.form.getlist('expected_output[]')
 
-        for question_text, knowledge_point in zip(question_texts, knowledge_points):
+        for question_text, knowledge_point, test_input, expected_output in zip(
+                question_texts, knowledge_points, test_inputs, expected_outputs):
             if question_text.strip():
                 assignment_question = AssignmentQuestion(
                     assignment_id=assignment.id,
                     prompt=question_text.strip(),
-                    knowledge_point=knowledge_point.strip() or '未指定'
+                    knowledge_point=knowledge_point.strip() or '未指定',
+                    test_input=test_input.strip('\r\n') or None,
+                    expected_output=expected_output.strip('\r\n') or None
                 )
                 db.session.add(assignment_question)
 
@@ -561,6 +1673,14 @@ def delete_course(course_id):
         # 删除该课程下的作业及其相关内容
         assignments = Assignment.query.filter_by(course_id=course.id).all()
         for assignment in assignments:
+            submission_ids = [sub.id for sub in Submission.query.filter_by(assignment_id=assignment.id).all()]
+            if submission_ids:
+                GradingJob.query.filter(GradingJob.submission_id.in_(submission_ids)).delete(synchronize_session=False)
+                QuestionGrade.query.filter(QuestionGrade.submission_id.in_(submission_ids)).delete(synchronize_session=False)
+                QuestionSegment.query.filter(QuestionSegment.submission_id.in_(submission_ids)).delete(synchronize_session=False)
+                SimilarityBucket.query.filter(SimilarityBucket.submission_id.in_(submission_ids)).delete(synchronize_session=False)
+                SubmissionFingerprint.query.filter(SubmissionFingerprint.submission_id.in_(submission_ids)).delete(synchronize_session=False)
+                StudyPlan.query.filter(StudyPlan.submission_id.in_(submission_ids)).delete(synchronize_session=False)
             Submission.query.filter_by(assignment_id=assignment.id).delete(synchronize_session=False)
             AssignmentQuestion.query.filter_by(assignment_id=assignment.id).delete(synchronize_session=False)
             db.session.delete(assignment)
@@ -745,7 +1865,40 @@ def view_submissions(assignment_id):
     # 使用正确的关系访问
     submissions = Submission.query.filter_by(assignment_id=assignment_id).all()
 
-    return render_template('view_submissions.html', assignment=assignment, submissions=submissions)
+    # 班级统计直接用SQL聚合已解析的分数列
+    row = db.session.query(
+        db.func.count(Submission.ai_score),
+        db.func.avg(Submission.ai_score),
+        db.func.min(Submission.ai_score),
+        db.func.max(Submission.ai_score),
+        *[db.func.avg(getattr(Submission, column)) for column in SCORE_COLUMNS.values()]
+    ).filter(Submission.assignment_id == assignment_id).one()
+    score_stats = {
+        'graded': row[0],
+        'average': row[1],
+        'min': row[2],
+        'max': row[3],
+        'dimensions': dict(zip(SCORE_COLUMNS, row[4:]))
+    }
+
+    grading_run = GradingRun.query.filter_by(assignment_id=assignment_id).order_by(GradingRun.id.desc()).first()
+
+    return render_template('view_submissions.html', assignment=assignment, submissions=submissions,
+                           score_stats=score_stats, grading_run=grading_run)
+
+
+@app.route('/teacher/assignment/<int:assignment_id>/similar')
+def similar_submissions(assignment_id):
+    if 'user_id' not in session or session['role'] != 'teacher':
+        return redirect(url_for('login'))
+
+    assignment = Assignment.query.get_or_404(assignment_id)
+    if assignment.teacher_id != session['user_id']:
+        return redirect(url_for('teacher_dashboard'))
+
+    pairs = similar_submission_pairs(assignment)
+    return render_template('similar_submissions.html', assignment=assignment, pairs=pairs,
+                           threshold=Config.SIMILARITY_THRESHOLD)
 
 
 @app.route('/teacher/grade_submission/<int:submission_id>', methods=['POST'])
@@ -776,6 +1929,86 @@ def grade_submission(submission_id):
     return redirect(url_for('view_submissions', assignment_id=assignment.id))
 
 
+@app.route('/teacher/assignment/<int:assignment_id>/grade_all', methods=['POST'])
+def grade_all_submissions(assignment_id):
+    if 'user_id' not in session or session['role'] != 'teacher':
+        return redirect(url_for('login'))
+
+    assignment = Assignment.query.get_or_404(assignment_id)
+    if assignment.teacher_id != session['user_id']:
+        return redirect(url_for('teacher_dashboard'))
+
+    run = start_grading_run(assignment, session['user_id'])
+    return redirect(url_for('grading_run_page', run_id=run.id))
+
+
+def owned_grading_run(run_id):
+    """返回当前老师的批量评分记录，无权限时返回 None"""
+    run = GradingRun.query.get_or_404(run_id)
+    if run.assignment.teacher_id != session['user_id']:
+        return None
+    return run
+
+
+@app.route('/teacher/grading_run/<int:run_id>')
+def grading_run_page(run_id):
+    if 'user_id' not in session or session['role'] != 'teacher':
+        return redirect(url_for('login'))
+
+    run = owned_grading_run(run_id)
+    if not run:
+        return redirect(url_for('teacher_dashboard'))
+    return render_template('grading_run.html', run=run, assignment=run.assignment,
+                           progress=grading_run_progress(run))
+
+
+@app.route('/teacher/grading_run/<int:run_id>/status')
+def grading_run_status(run_id):
+    if 'user_id' not in session or session['role'] != 'teacher':
+        return jsonify({'error': '请先登录'}), 401
+
+    run = owned_grading_run(run_id)
+    if not run:
+        return jsonify({'error': '没有权限查看该批量评分'}), 403
+    return jsonify(grading_run_progress(run))
+
+
+@app.cli.command('grade-all')
+@click.argument('assignment_id', type=int)
+@click.option('--wait/--no-wait', default=True, help='在本进程中评分并等待完成；--no-wait 只创建任务，交给Web进程的评分线程执行')
+def grade_all_command(assignment_id, wait):
+    """为作业的所有未评分提交评分，中断后再次运行会从断点继续"""
+    assignment = db.session.get(Assignment, assignment_id)
+    if not assignment:
+        raise click.ClickException(f"作业 {assignment_id} 不存在")
+
+    run = start_grading_run(assignment, assignment.teacher_id)
+    if not wait:
+        print(f"✅ 已创建批量评分任务（批次{run.id}）")
+        return
+
+    grading_pool.start()
+    try:
+        while True:
+            db.session.expire_all()
+            progress = grading_run_progress(run)
+            eta = f"{progress['eta_seconds']}秒" if progress['eta_seconds'] is not None else "-"
+            print(f"⏳ 已完成 {progress['done']}/{progress['total']}，失败 {progress['failed']}，"
+                  f"剩余 {progress['remaining']}，预计还需 {eta}")
+            if not progress['remaining']:
+                break
+            time.sleep(Config.GRADE_ALL_PROGRESS_INTERVAL)
+    except KeyboardInterrupt:
+        grading_pool.shutdown(wait=False)
+        count = requeue_claimed_jobs()
+        print(f"⏹️ 已中断，{count} 个进行中的任务已放回队列，再次运行该命令即可继续")
+        return
+    grading_pool.shutdown(wait=False)
+    for failure in progress['failures']:
+        print(f"❌ {failure['student']}（提交{failure['submission_id']}）：{failure['error']}")
+    print(f"✅ 批量评分结束：完成 {progress['done']} 份，失败 {progress['failed']} 份")
+
+
 @app.route('/student/dashboard')
 def student_dashboard():
     # 检查会话
@@ -979,13 +2212,29 @@ def submit_assignment(assignment_id):
             if existing_submission:
                 # 更新现有提交
                 existing_submission.content = content
+                run_id = None
                 if file_path:
-                    # 如果之前有文件，删除旧文件
-                    if existing_submission.file_path and os.path.exists(existing_submission.file_path):
+                    # 如果之前有文件，删除旧文件（同一秒内重复上传时新旧文件名相同，不能删除）
+                    if existing_submission.file_path and existing_submission.file_path != file_path and \
+                            os.path.exists(existing_submission.file_path):
                         os.remove(existing_submission.file_path)
                     existing_submission.file_path = file_path
                     existing_submission.file_name = file_name
+                    old_file_hash = existing_submission.file_hash
+                    existing_submission.file_hash = file_sha256(file_path) if is_supported(file_path) else None
+                    if old_file_hash != existing_submission.file_hash:
+                        db.session.flush()
+                        discard_submission_text(old_file_hash)
+                    # 作业文件已更换，旧的评分结果、学习计划和进行中的任务都失效；
+                    # 单题评分保留，重新评分时作答未变化的题目直接沿用
+                    existing_submission.evaluation_result = None
+                    existing_submission.evaluation_hash = None
+                    apply_scores(existing_submission, None)
+                    if existing_submission.study_plan:
+                        db.session.delete(existing_submission.study_plan)
+                    run_id = cancel_grading_jobs(existing_submission)
                 existing_submission.submitted_at = datetime.utcnow()
+                submission = existing_submission
                 message = '作业提交已更新!'
             else:
                 # 创建新提交
@@ -994,12 +2243,24 @@ def submit_assignment(assignment_id):
                     student_id=session['user_id'],
                     content=content,
                     file_path=file_path,
-                    file_name=file_name
+                    file_name=file_name,
+                    file_hash=file_sha256(file_path) if file_path and is_supported(file_path) else None
                 )
                 db.session.add(new_submission)
+                submission = new_submission
+                run_id = None
                 message = '作业提交成功!'
 
             db.session.commit()
+
+            # 提取文字、增量更新相似度索引、拆分各题结构和预检都交给后台任务，不占用请求线程
+            if file_path and is_supported(file_path):
+                enqueue_grading_job(submission, JOB_KIND_EXTRACT)
+
+            # 提交后立即排队评分，短时间内重复上传只评最后一次；评分任务等提取完成后执行，预检不通过时不调用大模型
+            if file_path and assignment.eager_grading and is_supported(file_path) and Config.IS_LLM_RUN:
+                enqueue_grading_job(submission, JOB_KIND_EVALUATE, grade_all_priority(assignment), run_id=run_id,
+                                    delay=Config.EAGER_GRADING_DEBOUNCE_SECONDS)
             flash(message, 'success')
             return redirect(url_for('student_dashboard'))
 
@@ -1131,84 +2392,77 @@ def preview_file(submission_id):
     study_plan = None
     plan_status = "未生成"
 
+    # 文件文字由后台任务提取（旧提交首次预览时在这里补排队），提取完成前页面轮询任务状态
+    if is_supported(submission.file_path) and stored_submission_text(submission) is None:
+        extraction_job = ensure_grading_job(submission, JOB_KIND_EXTRACT, outdated=True)
+        if extraction_job.status == JOB_FAILED:
+            return render_template('file_preview.html',
+                                   submission=submission,
+                                   content=f"文件读取错误: {extraction_job.error}，请稍后刷新页面重试",
+                                   file_type='错误',
+                                   study_plan=None,
+                                   plan_status="生成失败")
+        if Config.IS_LLM_RUN and not submission.evaluation_result:
+            # 评分任务同时排队，提取完成前自动推迟，页面不必再次打开才开始评分
+            ensure_grading_job(submission, JOB_KIND_EVALUATE)
+        return render_template('file_preview.html',
+                               submission=submission,
+                               file_type=FILE_TYPE_NAMES.get(file_type_of(submission.file_path), 'Word文档'),
+                               study_plan=None,
+                               plan_status="等待读取文件",
+                               extraction_job=extraction_job)
+
     # 尝试读取Word文档内容
     try:
-        if submission.file_path.endswith('.docx'):
-            doc = Document(submission.file_path)
-            content = ""
-            for paragraph in doc.paragraphs:
-                content += paragraph.text + "\n"
-
-            grader_result = None
+        content = read_submission_content(submission)
+        if content is not None:
+            # 页面直接使用已保存的结果渲染，大模型调用全部交给后台评分任务
+            grader_result = submission.evaluation_result
+            evaluation_job = None
+            plan_job = None
             if Config.IS_LLM_RUN:
-                # 如果还没有AI评分结果，则生成并保存
-                if not submission.evaluation_result:
-                    try:
-                        # 创建判分器实例
-                        grader = PythonCodeGrader()
-                        grader_result = grader.evaluate_code_2(content)
-                        print(f"📊作业评估结果，来自大模型{Config.MODEL_NAME}--->\n", grader_result)
-
-                        # 保存评分结果到数据库
-                        submission.evaluation_result = grader_result
-
-                        # 尝试从评分结果中提取分数
-                        score_match = re.search(r'(\d+(?:\.\d+)?)\s*分', grader_result)
-                        if not score_match:
-                            score_match = re.search(r'分数[：:]\s*(\d+(?:\.\d+)?)', grader_result)
-                        if not score_match:
-                            score_match = re.search(r'(\d+(?:\.\d+)?)\s*/\s*100', grader_result)
-                        if not score_match:
-                            score_match = re.search(r'(\d+(?:\.\d+)?)\s*%', grader_result)
-
-                        if score_match:
-                            try:
-                                submission.ai_score = float(score_match.group(1))
-                            except:
-                                pass
-
-                        db.session.commit()
-                    except ValueError as e:
-                        print(f"❌ 初始化错误：{e}")
-                    except Exception as e:
-                        print(f"❌ 运行错误：{e}")
+                if not grader_result:
+                    evaluation_job = ensure_grading_job(submission, JOB_KIND_EVALUATE)
+                    plan_status = "等待评分完成"
                 else:
-                    grader_result = submission.evaluation_result
-
-                #同步生成学习计划
-                if grader_result:  # 有评分结果则同步生成学习计划
-                    plan_status = "生成中..."
-                    try:
-                        # 创建判分器实例
-                        grader = PythonCodeGrader()
-                        # 同步调用学习计划生成方法（无异步线程）
-                        study_plan = grader.generate_study_plan(
-                            homework_content=content,
-                            evaluation_result=grader_result
-                        )
+                    plan = current_study_plan(submission)
+                    if plan:
+                        study_plan = plan.content
                         plan_status = "生成成功"
-                        print(f"✅ 作业{submission_id}学习计划生成完成：\n{study_plan[:100]}...")
-                    except Exception as e:
-                        plan_status = f"生成失败：{str(e)[:20]}"
-                        study_plan = None
-                        print(f"❌ 学习计划生成失败：{str(e)}")
-                #
-
-            else:
-                grader_result = submission.evaluation_result
-
-            if Config.IS_SOUND_ON and grader_result:
-                assistant = VoiceAssistant()
-                assistant.speak(grader_result)
+                    else:
+                        # 学习计划尚未生成或已随评分结果变化而失效
+                        plan_job = ensure_grading_job(submission, JOB_KIND_STUDY_PLAN, outdated=True)
+                        if plan_job.status == JOB_FAILED:
+                            plan_status = f"生成失败：{(plan_job.error or '')[:20]}"
+                        elif plan_job.status == JOB_RUNNING:
+                            plan_status = "生成中..."
+                        else:
+                            plan_status = "排队中..."
+            elif not grader_result:
+                # 不调用大模型时用本地静态分析即时评分，预检不通过时只显示原因
+                questions = sorted(submission.assignment.questions, key=lambda q: q.id)
+                grader_result = preflight_rejection(content) or static_evaluation(content, question_specs(questions))
+                if not is_error_result(grader_result):
+                    submission.evaluation_result = grader_result
+                    submission.evaluation_hash = content_hash(content)
+                    apply_scores(submission, parse_evaluation(grader_result))
+                    db.session.commit()
+
+            # 评分结果在后台合成为音频文件，由浏览器播放，不阻塞本次请求
+            audio = feedback_audio_payload(submission) if Config.IS_SOUND_ON else None
+
+            pending_jobs = any(job and job.status in ACTIVE_JOB_STATUSES for job in (evaluation_job, plan_job))
 
-            #
             return render_template('file_preview.html',
                                    submission=submission,
                                    file_content=content,
                                    grader_result=grader_result,
-                                   file_type='Word文档',
+                                   file_type=FILE_TYPE_NAMES.get(file_type_of(submission.file_path), 'Word文档'),
                                    study_plan=study_plan,
-                                   plan_status=plan_status)
+                                   plan_status=plan_status,
+                                   evaluation_job=evaluation_job,
+                                   pending_jobs=pending_jobs,
+                                   audio=audio)
         else:
 
             return render_template('file_preview.html',
@@ -1228,6 +2482,153 @@ def preview_file(submission_id):
                                plan_status="生成失败")
 
 
+@app.route('/preview/<int:submission_id>/status')
+def preview_status(submission_id):
+    if 'user_id' not in session:
+        return jsonify({'error': '请先登录'}), 401
+
+    submission = Submission.query.get_or_404(submission_id)
+    if session['role'] == 'student' and submission.student_id != session['user_id']:
+        return jsonify({'error': '没有权限访问此文件'}), 403
+
+    evaluation_job = latest_grading_job(submission.id, JOB_KIND_EVALUATE)
+    plan_job = latest_grading_job(submission.id, JOB_KIND_STUDY_PLAN)
+    extraction_job = latest_grading_job(submission.id, JOB_KIND_EXTRACT)
+    return jsonify({
+        'has_evaluation': bool(submission.evaluation_result),
+        'has_study_plan': current_study_plan(submission) is not None,
+        'evaluation': job_status_payload(evaluation_job),
+        'study_plan': job_status_payload(plan_job),
+        'extraction': job_status_payload(extraction_job),
+        'pending': any(job and job.status in ACTIVE_JOB_STATUSES for job in (evaluation_job, plan_job)),
+    })
+
+
+def feedback_audio_payload(submission):
+    """评分结果音频的状态和链接，尚未合成时在后台开始合成；没有已保存的评分结果时返回 None"""
+    if not submission.evaluation_result:
+        return None
+    key, status, error = get_shared_feedback_audio().request(submission.evaluation_result)
+    return {'status': status, 'error': error,
+            'url': url_for('feedback_audio_file', submission_id=submission.id, key=key)}
+
+
+@app.route('/preview/<int:submission_id>/audio/status')
+def feedback_audio_status(submission_id):
+    if 'user_id' not in session:
+        return jsonify({'error': '请先登录'}), 401
+
+    submission = Submission.query.get_or_404(submission_id)
+    if session['role'] == 'student' and submission.student_id != session['user_id']:
+        return jsonify({'error': '没有权限访问此文件'}), 403
+
+    audio = feedback_audio_payload(submission) if Config.IS_SOUND_ON else None
+    if audio is None:
+        return jsonify({'error': '没有可朗读的评分结果'}), 404
+    return jsonify(audio)
+
+
+@app.route('/preview/<int:submission_id>/audio/<key>')
+def feedback_audio_file(submission_id, key):
+    if 'user_id' not in session:
+        return jsonify({'error': '请先登录'}), 401
+
+    submission = Submission.query.get_or_404(submission_id)
+    if session['role'] == 'student' and submission.student_id != session['user_id']:
+        return jsonify({'error': '没有权限访问此文件'}), 403
+
+    # 只提供当前评分结果对应的音频；文件名即内容哈希，可长期缓存，conditional 支持浏览器的 Range 请求
+    if not submission.evaluation_result or audio_key(submission.evaluation_result) != key:
+        return jsonify({'error': '音频已失效'}), 404
+    path = get_shared_feedback_audio().path_for(key)
+    if not os.path.exists(path):
+        return jsonify({'error': '音频尚未生成'}), 404
+    return send_file(path, mimetype=audio_mimetype(path), conditional=True, max_age=7 * 24 * 3600)
+
+
+def stored_grading_output(submission_id, kind):
+    """读取数据库中已保存的评分结果或学习计划"""
+    db.session.expire_all()
+    submission = db.session.get(Submission, submission_id)
+    if not submission:
+        return None
+    if kind == JOB_KIND_EVALUATE:
+        return submission.evaluation_result
+    plan = current_study_plan(submission)
+    return plan.content if plan else None
+
+
+def sse_event(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+@app.route('/preview/<int:submission_id>/stream')
+def preview_stream(submission_id):
+    """以 server-sent events 推送评分结果和学习计划的生成过程"""
+    if 'user_id' not in session:
+        return jsonify({'error': '请先登录'}), 401
+
+    submission = Submission.query.get_or_404(submission_id)
+    if session['role'] == 'student' and submission.student_id != session['user_id']:
+        return jsonify({'error': '没有权限访问此文件'}), 403
+
+    def generate():
+        # 立即返回首个事件，浏览器无需等待大模型
+        yield sse_event('status', {'submission_id': submission_id})
+        deadline = time.monotonic() + Config.STREAM_MAX_SECONDS
+        last_sent = last_output = time.monotonic()
+
+        for kind in (JOB_KIND_EVALUATE, JOB_KIND_STUDY_PLAN):
+            output = stored_grading_output(submission_id, kind)
+            if output:
+                yield sse_event('snapshot', {'kind': kind, 'text': output})
+                continue
+
+            streamed = False
+            for event, value in grading_stream_hub.listen((submission_id, kind)):
+                if event == 'delta':
+                    streamed = True
+                    last_sent = last_output = time.monotonic()
+                    yield sse_event('delta', {'kind': kind, 'text': value})
+                    continue
+
+                if event == 'end':
+                    if value:
+                        yield sse_event('failed', {'kind': kind, 'error': value})
+                        return
+                    if not streamed:
+                        yield sse_event('snapshot', {'kind': kind, 'text': stored_grading_output(submission_id, kind) or ''})
+                    break
+
+                # 等待期间检查数据库：任务可能在其他进程中运行，或已经结束
+                db.session.expire_all()
+                job = latest_grading_job(submission_id, kind)
+                if not job or job.status not in ACTIVE_JOB_STATUSES:
+                    output = stored_grading_output(submission_id, kind)
+                    if output:
+                        yield sse_event('snapshot', {'kind': kind, 'text': output})
+                        break
+                    if job and job.status == JOB_FAILED:
+                        yield sse_event('failed', {'kind': kind, 'error': job.error})
+                        return
+                    if not job:
+                        break
+                # 长时间没有输出（如任务仍在排队）时断开，浏览器改为轮询，不再占用服务器线程
+                if time.monotonic() > deadline or time.monotonic() - last_output > Config.STREAM_IDLE_SECONDS:
+                    yield sse_event('timeout', {'kind': kind})
+                    return
+                if time.monotonic() - last_sent > Config.STREAM_HEARTBEAT_SECONDS:
+                    last_sent = time.monotonic()
+                    yield ": keep-alive\n\n"
+
+        yield sse_event('done', {})
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
 @app.route('/student/course/<int:course_id>/materials')
 def view_course_materials(course_id):
     if 'user_id' not in session or session['role'] != 'student':
@@ -0,0 +1,159 @@
+# benchmark_docx.py
+"""
+.docx 文本提取基准测试
+
+生成一批不同大小的作业文档，分别用 python-docx（homework_parser.extract_docx）和流式提取（docx_stream.extract_docx）
+提取文本，比较耗时和峰值内存，并校验两者输出完全一致。加 --pool 时再经提取进程池（extractors.ExtractorPool）
+并发提取同一批文件，报告进程池统计的吞吐量（个/秒、MB/秒）。
+
+峰值内存由 tracemalloc 统计，只包含Python对象；python-docx 底层 lxml 的C内存不在其中，其数值偏低。
+
+用法示例：
+    python benchmark_docx.py
+    python benchmark_docx.py --files 200 --paragraphs 50 500 5000 --tables 0 20 --output bench_docx.json
+    python benchmark_docx.py --pool --workers 4
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+# 基准测试不使用真实密钥，配置校验前先提供占位值
+os.environ.setdefault('MY_LONGCAT_API_KEY', 'benchmark')
+os.environ.setdefault('MY_DEEPSEEK_API_KEY', 'benchmark')
+
+from docx import Document
+
+import docx_stream
+import homework_parser
+from benchmark_grader import sample_homework
+from extractors import ExtractorPool
+
+
+def build_document(path: str, paragraphs: int, tables: int, seed: int):
+    """按示例作业重复填充到指定段落数，并插入若干个粘贴了代码的表格"""
+    document = Document()
+    lines = sample_homework(seed).split('\n')
+    table_every = paragraphs // tables if tables else 0
+    for index in range(paragraphs):
+        document.add_paragraph(lines[index % len(lines)])
+        if table_every and index % table_every == table_every - 1:
+            table = document.add_table(rows=3, cols=2)
+            table.cell(0, 0).merge(table.cell(0, 1))
+            table.cell(0, 0).text = f"题目{index}"
+            table.cell(1, 0).text = "for i in range(10):\n    print(i)"
+            table.cell(1, 1).text = "运行结果"
+            table.cell(2, 0).text = "0 1 2 3"
+    document.save(path)
+
+
+def measure(extract: Callable[[str], Dict], paths: List[str]) -> Dict:
+    """依次提取全部文件，返回总耗时、单个文件平均耗时和提取单个文件时的最大峰值内存"""
+    results = []
+    peak = 0
+    start = time.perf_counter()
+    for path in paths:
+        tracemalloc.start()
+        results.append(extract(path))
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    elapsed = time.perf_counter() - start
+    return {
+        'elapsed': round(elapsed, 3),
+        'ms_per_file': round(elapsed / len(paths) * 1000, 2) if paths else 0.0,
+        'peak_kb': round(peak / 1024, 1),
+        'results': results
+    }
+
+
+def measure_pool(paths: List[str], workers: int) -> Dict:
+    """经提取进程池并发提取全部文件（同时提交的文件数等于工作进程数，耗时不含排队），返回进程池的吞吐量统计"""
+    pool = ExtractorPool(max_workers=workers)
+    try:
+        # 预热：启动工作进程，其耗时不计入统计
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(pool.extract, paths[:workers]))
+        warmup = pool.stats()['docx']
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(pool.extract, paths))
+        elapsed = time.perf_counter() - start
+        stats = pool.stats()['docx']
+    finally:
+        pool.shutdown()
+    seconds = stats['seconds'] - warmup['seconds']
+    size = stats['bytes'] - warmup['bytes']
+    return {
+        'elapsed': round(elapsed, 3),
+        'files_per_second': round(len(paths) / elapsed, 2) if elapsed else 0.0,
+        'worker_files_per_second': round(len(paths) / seconds, 2) if seconds else 0.0,
+        'worker_mb_per_second': round(size / 1024 / 1024 / seconds, 2) if seconds else 0.0,
+        'failed': stats['failed'] + stats['timeouts']
+    }
+
+
+def print_report(rows: List[Dict]):
+    print("\n📊 .docx 文本提取（python-docx vs 流式）")
+    print(f"{'段落':>6} {'表格':>5} {'文件KB':>8} {'python-docx(ms)':>16} {'流式(ms)':>10} "
+          f"{'python-docx峰值KB':>18} {'流式峰值KB':>11} {'一致':>5}")
+    for row in rows:
+        print(f"{row['paragraphs']:>6} {row['tables']:>5} {row['file_kb']:>8.1f} {row['python_docx']['ms_per_file']:>16.2f} "
+              f"{row['stream']['ms_per_file']:>10.2f} {row['python_docx']['peak_kb']:>18.1f} "
+              f"{row['stream']['peak_kb']:>11.1f} {'是' if row['identical'] else '否':>5}")
+
+    pooled = [row for row in rows if 'pool' in row]
+    if pooled:
+        print("\n📊 提取进程池吞吐量")
+        print(f"{'段落':>6} {'表格':>5} {'总吞吐(个/秒)':>14} {'单进程(个/秒)':>14} {'单进程(MB/秒)':>14} {'失败':>5}")
+        for row in pooled:
+            pool = row['pool']
+            print(f"{row['paragraphs']:>6} {row['tables']:>5} {pool['files_per_second']:>14.2f} "
+                  f"{pool['worker_files_per_second']:>14.2f} {pool['worker_mb_per_second']:>14.2f} {pool['failed']:>5}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=".docx 文本提取基准测试")
+    parser.add_argument('--files', type=int, default=50, help="每种文档大小生成的文件数")
+    parser.add_argument('--paragraphs', type=int, nargs='+', default=[50, 500, 5000])
+    parser.add_argument('--tables', type=int, nargs='+', default=[0, 10])
+    parser.add_argument('--output', help="把结果写入JSON文件，便于与历史结果对比")
+    parser.add_argument('--pool', action='store_true', help="同时测量提取进程池的吞吐量")
+    parser.add_argument('--workers', type=int, default=2, help="提取进程池的工作进程数")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_docx_')
+    rows = []
+    for paragraphs in args.paragraphs:
+        for tables in args.tables:
+            paths = []
+            for index in range(args.files):
+                path = os.path.join(workdir, f"p{paragraphs}_t{tables}_{index}.docx")
+                build_document(path, paragraphs, tables, index)
+                paths.append(path)
+            reference = measure(homework_parser.extract_docx, paths)
+            streamed = measure(docx_stream.extract_docx, paths)
+            row = {
+                'paragraphs': paragraphs,
+                'tables': tables,
+                'file_kb': sum(os.path.getsize(path) for path in paths) / len(paths) / 1024,
+                'identical': reference.pop('results') == streamed.pop('results'),
+                'python_docx': reference,
+                'stream': streamed
+            }
+            if args.pool:
+                row['pool'] = measure_pool(paths, args.workers)
+            rows.append(row)
+
+    print_report(rows)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 结果已写入 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+# benchmark_grader.py
+"""
+判分流程吞吐量基准测试
+
+在本地模拟大模型服务（mock_llm_server.py）上，按不同并发度驱动 PythonCodeGrader 和 /preview 路由，
+输出 p50/p95/p99 延迟和每分钟处理的提交数，便于在上线前发现判分链路的性能退化。
+
+用法示例：
+    python benchmark_grader.py --concurrency 1 4 16 --requests 32 --latency lognormal:0.5,0.5
+    python benchmark_grader.py --target preview --concurrency 4 16 --requests 40 --output bench.json
+    python benchmark_grader.py --api-url http://127.0.0.1:8765/v1/chat/completions   # 使用已启动的模拟服务
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+# 基准测试不使用真实密钥，配置校验前先提供占位值
+os.environ.setdefault('MY_LONGCAT_API_KEY', 'benchmark')
+os.environ.setdefault('MY_DEEPSEEK_API_KEY', 'benchmark')
+
+from config import Config
+from mock_llm_server import MockLLMServer
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * p / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(latencies: List[float], failures: int, elapsed: float) -> Dict:
+    completed = len(latencies)
+    return {
+        'completed': completed,
+        'failures': failures,
+        'elapsed': round(elapsed, 3),
+        'p50': round(percentile(latencies, 50), 3),
+        'p95': round(percentile(latencies, 95), 3),
+        'p99': round(percentile(latencies, 99), 3),
+        'submissions_per_minute': round(completed / elapsed * 60, 1) if elapsed > 0 else 0.0
+    }
+
+
+def print_report(title: str, rows: List[Dict]):
+    print(f"\n📊 {title}")
+    print(f"{'并发':>6} {'完成':>6} {'失败':>6} {'p50(s)':>9} {'p95(s)':>9} {'p99(s)':>9} {'提交/分钟':>10}")
+    for row in rows:
+        print(f"{row['concurrency']:>6} {row['completed']:>6} {row['failures']:>6} {row['p50']:>9.3f} "
+              f"{row['p95']:>9.3f} {row['p99']:>9.3f} {row['submissions_per_minute']:>10.1f}")
+
+
+def sample_homework(index: int) -> str:
+    """生成带 ##Begin/##End 结构的示例作业，序号不同内容不同，避免命中缓存"""
+    return (
+        "##Begin\n"
+        f"题目1 计算1到{index + 10}的和\n"
+        f"total = 0\nfor i in range(1, {index + 11}):\n    total += i\nprint(total)\n"
+        f"运行结果\n{sum(range(1, index + 11))}\n小结：使用了for循环\n"
+        "题目2 进制转换\n"
+        f"n = {index + 255}\nprint(hex(n), pow(n, 2))\n"
+        f"运行结果\n{hex(index + 255)} {(index + 255) ** 2}\n"
+        "##End\n"
+    )
+
+
+def bench_grader(levels: List[int], requests_per_level: int) -> List[Dict]:
+    """直接调用 PythonCodeGrader.evaluate_code_2"""
+    from homework_LLM_grader import PythonCodeGrader, is_error_result
+
+    grader = PythonCodeGrader()
+    rows = []
+    for level in levels:
+        latencies, failures = [], 0
+        lock = threading.Lock()
+
+        def run_one(index):
+            nonlocal failures
+            start = time.perf_counter()
+            result = grader.evaluate_code_2(sample_homework(level * 10000 + index), use_cache=False)
+            latency = time.perf_counter() - start
+            with lock:
+                if is_error_result(result):
+                    failures += 1
+                else:
+                    latencies.append(latency)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=level) as executor:
+            list(executor.map(run_one, range(requests_per_level)))
+        rows.append(dict(summarize(latencies, failures, time.perf_counter() - start), concurrency=level))
+    return rows
+
+
+def bench_preview(levels: List[int], requests_per_level: int, timeout: float) -> Tuple[List[Dict], List[Dict]]:
+    """通过 /preview 路由触发后台评分，统计页面响应延迟和评分完成的端到端延迟"""
+    from docx import Document
+
+    workdir = tempfile.mkdtemp(prefix='grader_bench_')
+    os.environ['HOMEWORK_DATABASE_URI'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    Config.IS_SOUND_ON = False
+    Config.EVALUATION_CACHE_ENABLED = False
+    import app as homework_app
+
+    flask_app, db = homework_app.app, homework_app.db
+    with flask_app.app_context():
+        teacher = homework_app.User(username='bench_t', password='123', role='teacher', name='基准测试教师')
+        student = homework_app.User(username='bench_s', password='123', role='student', name='基准测试学生')
+        db.session.add_all([teacher, student])
+        db.session.flush()
+        assignment = homework_app.Assignment(title='基准测试作业', content='基准测试', teacher_id=teacher.id)
+        db.session.add(assignment)
+        db.session.commit()
+        teacher_id, assignment_id = teacher.id, assignment.id
+
+    def create_submissions(level):
+        ids = []
+        with flask_app.app_context():
+            for index in range(requests_per_level):
+                path = os.path.join(workdir, f"sub_{level}_{index}.docx")
+                document = Document()
+                for line in sample_homework(level * 10000 + index).split('\n'):
+                    document.add_paragraph(line)
+                document.save(path)
+                student = homework_app.User(username=f'bench_s_{level}_{index}', password='123',
+                                            role='student', name='基准测试学生')
+                db.session.add(student)
+                db.session.flush()
+                submission = homework_app.Submission(assignment_id=assignment_id, student_id=student.id,
+                                                     file_path=path, file_name=os.path.basename(path))
+                db.session.add(submission)
+                db.session.flush()
+                ids.append(submission.id)
+            db.session.commit()
+        return ids
+
+    def wait_for_result(submission_id, deadline):
+        """等待后台评分完成，返回未完成的原因，完成时返回 None"""
+        with flask_app.app_context():
+            submission = db.session.get(homework_app.Submission, submission_id)
+            if not submission.evaluation_result and \
+                    homework_app.latest_grading_job(submission_id, homework_app.JOB_KIND_EVALUATE) is None:
+                # 页面请求已返回却没有评分任务，继续等待只会一直超时
+                return "页面请求后没有创建评分任务"
+        while time.perf_counter() < deadline:
+            with flask_app.app_context():
+                submission = db.session.get(homework_app.Submission, submission_id)
+                if submission.evaluation_result:
+                    return None
+                job = homework_app.latest_grading_job(submission_id, homework_app.JOB_KIND_EVALUATE)
+                if job and job.status == homework_app.JOB_FAILED:
+                    return f"评分任务失败：{(job.error or '')[:60]}"
+            time.sleep(0.05)
+        return f"超过{timeout:g}秒未完成评分"
+
+    page_rows, grading_rows = [], []
+    for level in levels:
+        submission_ids = create_submissions(level)
+        page_latencies, grading_latencies, failures = [], [], 0
+        failure_reasons = {}
+        lock = threading.Lock()
+
+        def run_one(submission_id):
+            nonlocal failures
+            client = flask_app.test_client()
+            with client.session_transaction() as sess:
+                sess['user_id'] = teacher_id
+                sess['role'] = 'teacher'
+            start = time.perf_counter()
+            response = client.get(f'/preview/{submission_id}')
+            page_latency = time.perf_counter() - start
+            if response.status_code != 200:
+                reason = f"页面返回状态码 {response.status_code}"
+            else:
+                reason = wait_for_result(submission_id, start + timeout)
+            with lock:
+                page_latencies.append(page_latency)
+                if reason is None:
+                    grading_latencies.append(time.perf_counter() - start)
+                else:
+                    failures += 1
+                    failure_reasons[reason] = failure_reasons.get(reason, 0) + 1
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=level) as executor:
+            list(executor.map(run_one, submission_ids))
+        elapsed = time.perf_counter() - start
+        page_rows.append(dict(summarize(page_latencies, 0, elapsed), concurrency=level))
+        grading_rows.append(dict(summarize(grading_latencies, failures, elapsed), concurrency=level,
+                                 failure_reasons=failure_reasons))
+        for reason, count in failure_reasons.items():
+            print(f"⚠️ 并发 {level}：{count} 份提交未完成评分，{reason}")
+    return page_rows, grading_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="判分流程吞吐量基准测试")
+    parser.add_argument('--target', choices=['grader', 'preview', 'all'], default='all')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--requests', type=int, default=32, help="每个并发度下的请求数")
+    parser.add_argument('--api-url', help="使用已启动的模拟服务，不指定时在进程内启动")
+    parser.add_argument('--latency', default='lognormal:0.5,0.5', help="进程内模拟服务的延迟分布")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--burst-every', type=float, default=0.0)
+    parser.add_argument('--burst-duration', type=float, default=0.0)
+    parser.add_argument('--backup-latency', help="同时启动备用模拟服务（用于测试故障切换和对冲请求）的延迟分布")
+    parser.add_argument('--rpm', type=int, default=100000, help="限流器每分钟请求数，默认放开以测量纯吞吐")
+    parser.add_argument('--tpm', type=int, default=100000000, help="限流器每分钟token数")
+    parser.add_argument('--timeout', type=float, default=120, help="/preview 场景下等待评分完成的超时秒数")
+    parser.add_argument('--output', help="把结果写入JSON文件，便于与历史结果对比")
+    args = parser.parse_args()
+
+    server = backup_server = None
+    if args.api_url:
+        api_url = args.api_url
+    else:
+        server = MockLLMServer(latency=args.latency, error_rate=args.error_rate,
+                               burst_every=args.burst_every, burst_duration=args.burst_duration).start()
+        api_url = server.url
+    print(f"🤖 模拟大模型服务：{api_url}")
+    backup_providers = []
+    if args.backup_latency:
+        backup_server = MockLLMServer(latency=args.backup_latency).start()
+        backup_providers.append({"name": "backup", "api_url": backup_server.url, "api_key": "benchmark",
+                                 "model": "mock-backup", "temperature": 0.1})
+        print(f"🤖 备用模拟服务：{backup_server.url}")
+
+    # 必须在导入判分器之前修改，共享的限流器和客户端在导入时按配置创建
+    Config.MY_LLM_API_URL = api_url
+    Config.BACKUP_PROVIDERS = backup_providers
+    Config.IS_LLM_RUN = True
+    Config.REQUESTS_PER_MINUTE = args.rpm
+    Config.TOKENS_PER_MINUTE = args.tpm
+
+    report = {'api_url': api_url, 'requests_per_level': args.requests}
+    try:
+        if args.target in ('grader', 'all'):
+            report['grader'] = bench_grader(args.concurrency, args.requests)
+            print_report("PythonCodeGrader.evaluate_code_2", report['grader'])
+        if args.target in ('preview', 'all'):
+            page_rows, grading_rows = bench_preview(args.concurrency, args.requests, args.timeout)
+            report['preview_page'] = page_rows
+            report['preview_grading'] = grading_rows
+            print_report("/preview 页面响应", page_rows)
+            print_report("/preview 触发到评分完成", grading_rows)
+    finally:
+        for mock in (server, backup_server):
+            if mock:
+                mock.stop()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 结果已写入 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
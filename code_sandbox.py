@@ -0,0 +1,459 @@
+# code_sandbox.py
+"""
+学生代码沙箱执行
+
+在常驻的工作进程池中运行学生代码，用老师为每道题填写的测试输入和期望输出检查程序的实际运行结果。
+每组测试由工作进程 fork 出一个子进程执行：子进程在临时目录中运行，受CPU时间、内存、输出大小限制，
+禁止联网、创建子进程、读写临时目录以外的文件（只能读取Python标准库和第三方库），超过墙钟时间直接终止。
+子进程只保留少数环境变量，看不到Web进程中的API密钥等配置；以root运行时还会切换到 SANDBOX_USER 指定的用户。
+工作进程在整个班级的评分中复用，每组测试只需一次 fork，不必重新启动解释器。
+
+不支持 fork 的平台（Windows）改为每组测试启动一个解释器子进程，只有超时、环境变量和文件访问等限制，没有资源限制。
+"""
+import atexit
+import multiprocessing
+import os
+import re
+import shutil
+import signal
+import stat
+import subprocess
+import sys
+import sysconfig
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional
+
+try:
+    import pwd
+    import resource
+except ImportError:  # Windows
+    pwd = resource = None
+
+from config import Config
+
+# 多组测试之间用单独一行的 --- 分隔
+CASE_SEPARATOR = re.compile(r'^[ \t]*-{3,}[ \t]*$', re.M)
+
+# 运行状态
+RUN_OK = 'ok'
+RUN_ERROR = 'error'         # 抛出异常或以非0状态退出
+RUN_TIMEOUT = 'timeout'     # 超过墙钟时间或CPU时间
+RUN_KILLED = 'killed'       # 超出内存、输出大小等限制被终止
+
+# 子进程保留的环境变量，其余（API密钥、数据库地址等）一律清除
+SANDBOX_ENV_KEYS = ('PATH', 'LANG', 'LC_ALL', 'LC_CTYPE', 'TZ', 'SYSTEMROOT')
+
+# 子进程中先执行的引导代码：拦截联网、创建进程和读写外部文件，input() 不回显提示语，然后运行 main.py
+_BOOTSTRAP = r'''
+import builtins, os, sys, sysconfig
+
+_workdir = os.path.realpath(os.getcwd())
+# 工作目录以外只允许读取标准库和第三方库
+_LIBRARY_ROOTS = tuple({os.path.realpath(sysconfig.get_path(name))
+                        for name in ('stdlib', 'platstdlib', 'purelib', 'platlib') if sysconfig.get_path(name)})
+_BLOCKED = ('socket.', 'subprocess.', 'os.system', 'os.exec', 'os.posix_spawn', 'os.spawn', 'os.fork',
+            'os.forkpty', 'os.kill', 'os.killpg', 'pty.', 'ctypes.', 'os.chdir', 'webbrowser.')
+_PATH_EVENTS = ('os.remove', 'os.rename', 'os.rmdir', 'os.mkdir', 'shutil.rmtree', 'shutil.move', 'os.chmod')
+_WRITE_FLAGS = os.O_WRONLY | os.O_RDWR | os.O_CREAT | os.O_APPEND | os.O_TRUNC
+
+
+def _under(path, roots):
+    try:
+        path = os.path.realpath(os.path.join(_workdir, os.fsdecode(path)))
+    except TypeError:  # 文件描述符
+        return True
+    return any(path == root or path.startswith(root + os.sep) for root in roots)
+
+
+def _inside(path):
+    return _under(path, (_workdir,))
+
+
+def _writing(mode, flags):
+    if isinstance(mode, str):
+        return any(flag in mode for flag in 'wax+')
+    return isinstance(flags, int) and bool(flags & _WRITE_FLAGS)
+
+
+def _audit(event, args):
+    if event.startswith(_BLOCKED):
+        raise PermissionError(f"沙箱中不允许该操作：{event}")
+    if event == 'open' and not _inside(args[0]):
+        if _writing(args[1], args[2]):
+            raise PermissionError("沙箱中不允许写入工作目录以外的文件")
+        if not _under(args[0], _LIBRARY_ROOTS):
+            raise PermissionError("沙箱中不允许读取工作目录以外的文件")
+    if event in _PATH_EVENTS and not _inside(args[0]):
+        raise PermissionError("沙箱中不允许修改工作目录以外的文件")
+
+
+def _input(prompt=''):
+    line = sys.stdin.readline()
+    if not line:
+        raise EOFError("测试输入已读完")
+    return line.rstrip('\n')
+
+
+builtins.input = _input
+# 不从Web应用所在目录等位置导入模块，工作进程中已经导入的也一并移除
+sys.path[:] = [_workdir] + [path for path in sys.path if path and _under(path, _LIBRARY_ROOTS)]
+for _name, _module in list(sys.modules.items()):
+    if getattr(_module, '__file__', None) and not _under(_module.__file__, _LIBRARY_ROOTS):
+        del sys.modules[_name]
+_source = open('main.py', encoding='utf-8').read()
+import traceback
+sys.addaudithook(_audit)
+try:
+    exec(compile(_source, 'main.py', 'exec'), {'__name__': '__main__', '__builtins__': builtins})
+except SystemExit:
+    raise
+except BaseException as e:
+    # 只输出学生代码中的调用栈
+    traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+    sys.exit(1)
+'''
+
+
+def parse_test_cases(test_input: Optional[str], expected_output: Optional[str]) -> List[Dict]:
+    """
+    解析老师填写的测试输入和期望输出
+
+    Args:
+        test_input: 测试输入（标准输入内容），多组之间用单独一行的 --- 分隔
+        expected_output: 期望输出，组数与测试输入对应
+
+    Returns:
+        [{'input': 标准输入, 'expected': 期望输出}]，没有填写期望输出时返回空列表
+    """
+    if not (expected_output or '').strip():
+        return []
+    expected_output = expected_output.replace('\r\n', '\n')
+    inputs = CASE_SEPARATOR.split((test_input or '').replace('\r\n', '\n'))
+    cases = []
+    for index, expected in enumerate(CASE_SEPARATOR.split(expected_output)):
+        stdin = inputs[index].strip('\n') if index < len(inputs) else ''
+        cases.append({'input': stdin + '\n' if stdin else '', 'expected': expected.strip('\n')})
+    return cases
+
+
+def _normalize(text: str) -> List[str]:
+    lines = [line.rstrip() for line in text.replace('\r\n', '\n').split('\n')]
+    while lines and not lines[0]:
+        lines.pop(0)
+    while lines and not lines[-1]:
+        lines.pop()
+    return lines
+
+
+def outputs_match(actual: str, expected: str) -> bool:
+    """
+    比较实际输出和期望输出（忽略行尾空白和首尾空行）
+
+    学生常在结果前加说明文字（如“结果是：25”），期望输出的每一行依次与实际输出中的某一行相同，
+    或是其以空格、冒号、等号、逗号分隔的末尾部分时也视为通过。
+    """
+    actual_lines, expected_lines = _normalize(actual), _normalize(expected)
+    if actual_lines == expected_lines:
+        return True
+    if not expected_lines:
+        return False
+    remaining = iter(actual_lines)
+    for expected_line in expected_lines:
+        expected_line = expected_line.strip()
+        for actual_line in remaining:
+            actual_line = actual_line.strip()
+            if actual_line == expected_line or (
+                    actual_line.endswith(expected_line) and
+                    actual_line[-len(expected_line) - 1] in ' :：=，,'):
+                break
+        else:
+            return False
+    return True
+
+
+def sandbox_env() -> Dict[str, str]:
+    """学生代码可见的环境变量"""
+    return {key: os.environ[key] for key in SANDBOX_ENV_KEYS if key in os.environ}
+
+
+def _isolate_worker():
+    """工作进程初始化：清除环境变量和配置中的API密钥，fork 出的子进程从内存中也读不到"""
+    env = sandbox_env()
+    os.environ.clear()
+    os.environ.update(env)
+    Config.MY_LLM_API_KEY = None
+    Config.BACKUP_PROVIDERS = [dict(provider, api_key=None) for provider in Config.BACKUP_PROVIDERS]
+
+
+def _readable_by_others(path: str) -> bool:
+    """其他用户能否读取该目录：目录本身可读、可进入，各级上级目录可进入"""
+    path = os.path.realpath(path)
+    if os.stat(path).st_mode & (stat.S_IROTH | stat.S_IXOTH) != stat.S_IROTH | stat.S_IXOTH:
+        return False
+    while path != os.path.dirname(path):
+        path = os.path.dirname(path)
+        if not os.stat(path).st_mode & stat.S_IXOTH:
+            return False
+    return True
+
+
+_user_checked = False
+
+
+def _sandbox_user() -> Optional[tuple]:
+    """
+    以root运行时学生代码切换到的用户
+
+    Python安装在其他用户无法访问的目录（如 /root 下的 pyenv）时，切换用户后无法导入标准库，此时不切换。
+
+    Returns:
+        (uid, gid)，不是root、没有配置 SANDBOX_USER 或无法切换时返回 None
+    """
+    global _user_checked
+    if pwd is None or os.geteuid() != 0 or not Config.SANDBOX_USER:
+        return None
+    try:
+        user = pwd.getpwnam(Config.SANDBOX_USER)
+    except KeyError:
+        raise RuntimeError(f"沙箱用户 {Config.SANDBOX_USER} 不存在，请在 config.py 中修改 SANDBOX_USER")
+    if not _readable_by_others(sysconfig.get_path('stdlib')):
+        if not _user_checked:
+            print(f"⚠️ Python安装目录 {sys.prefix} 对沙箱用户 {Config.SANDBOX_USER} 不可访问，学生代码仍以root运行")
+            _user_checked = True
+        return None
+    return user.pw_uid, user.pw_gid
+
+
+def _limit_child(limits: Dict, user: Optional[tuple]):
+    """在 fork 出的子进程中设置资源限制、尽量断开网络并切换到无特权用户"""
+    os.setpgid(0, 0)
+    cpu = limits['cpu_seconds']
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+    memory = limits['memory_mb'] * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (limits['max_output_bytes'], limits['max_output_bytes']))
+    resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    try:
+        # 有权限时进入新的网络命名空间（只有回环接口）；没有权限时由引导代码拦截联网
+        import ctypes
+        ctypes.CDLL(None, use_errno=True).unshare(0x40000000)  # CLONE_NEWNET
+    except Exception:
+        pass
+    if user:
+        uid, gid = user
+        os.setgroups([])
+        os.setgid(gid)
+        os.setuid(uid)
+
+
+def _run_forked(workdir: str, limits: Dict) -> Dict:
+    user = _sandbox_user()
+    if user:
+        # 切换用户后学生代码仍需读写工作目录
+        os.chown(workdir, *user)
+    stdin_fd = os.open(os.path.join(workdir, '.stdin'), os.O_RDONLY)
+    stdout_fd = os.open(os.path.join(workdir, '.stdout'), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            os.chdir(workdir)
+            os.dup2(stdin_fd, 0)
+            os.dup2(stdout_fd, 1)
+            os.dup2(stdout_fd, 2)
+            sys.stdin = open(0, 'r', encoding='utf-8', errors='replace', closefd=False)
+            sys.stdout = open(1, 'w', encoding='utf-8', errors='replace', closefd=False)
+            sys.stderr = sys.stdout
+            env = sandbox_env()
+            os.environ.clear()
+            os.environ.update(env)
+            _limit_child(limits, user)
+            exec(_BOOTSTRAP, {'__name__': '__sandbox__'})
+            status = 0
+        except SystemExit as e:
+            status = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except BaseException:
+            import traceback
+            traceback.print_exc()
+        finally:
+            try:
+                sys.stdout.flush()
+            finally:
+                os._exit(status)
+
+    os.close(stdin_fd)
+    os.close(stdout_fd)
+    deadline = time.monotonic() + limits['wall_seconds']
+    timed_out = False
+    while True:
+        done, status = os.waitpid(pid, os.WNOHANG)
+        if done:
+            break
+        if time.monotonic() > deadline:
+            timed_out = True
+            try:
+                os.killpg(pid, signal.SIGKILL)
+            except OSError:
+                os.kill(pid, signal.SIGKILL)
+            _, status = os.waitpid(pid, 0)
+            break
+        time.sleep(0.005)
+
+    if timed_out:
+        return {'status': RUN_TIMEOUT, 'exit_code': None}
+    if os.WIFSIGNALED(status):
+        sig = os.WTERMSIG(status)
+        return {'status': RUN_TIMEOUT if sig == signal.SIGXCPU else RUN_KILLED, 'exit_code': -sig}
+    code = os.WEXITSTATUS(status)
+    return {'status': RUN_OK if code == 0 else RUN_ERROR, 'exit_code': code}
+
+
+def _run_subprocess(workdir: str, limits: Dict) -> Dict:
+    with open(os.path.join(workdir, '_bootstrap.py'), 'w', encoding='utf-8') as f:
+        f.write(_BOOTSTRAP)
+    with open(os.path.join(workdir, '.stdin'), 'rb') as stdin, open(os.path.join(workdir, '.stdout'), 'wb') as stdout:
+        try:
+            process = subprocess.run([sys.executable, '-I', '-X', 'utf8', '_bootstrap.py'], cwd=workdir,
+                                     stdin=stdin, stdout=stdout, stderr=subprocess.STDOUT, env=sandbox_env(),
+                                     timeout=limits['wall_seconds'])
+        except subprocess.TimeoutExpired:
+            return {'status': RUN_TIMEOUT, 'exit_code': None}
+    return {'status': RUN_OK if process.returncode == 0 else RUN_ERROR, 'exit_code': process.returncode}
+
+
+def run_case(code: str, stdin: str, limits: Dict) -> Dict:
+    """
+    在临时目录中运行一组测试（在进程池的工作进程中执行）
+
+    Returns:
+        {'status': 运行状态, 'exit_code', 'output': 标准输出和标准错误, 'seconds': 耗时}
+    """
+    workdir = tempfile.mkdtemp(prefix='sandbox_')
+    start = time.perf_counter()
+    try:
+        with open(os.path.join(workdir, 'main.py'), 'w', encoding='utf-8') as f:
+            f.write(code)
+        with open(os.path.join(workdir, '.stdin'), 'w', encoding='utf-8') as f:
+            f.write(stdin)
+        if hasattr(os, 'fork') and resource is not None:
+            result = _run_forked(workdir, limits)
+        else:
+            result = _run_subprocess(workdir, limits)
+        with open(os.path.join(workdir, '.stdout'), 'rb') as f:
+            result['output'] = f.read(limits['max_output_bytes']).decode('utf-8', errors='replace')
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+class CodeSandbox:
+    """运行学生代码的进程池"""
+
+    def __init__(self, max_workers: int = Config.SANDBOX_WORKERS,
+                 cpu_seconds: int = Config.SANDBOX_CPU_SECONDS,
+                 memory_mb: int = Config.SANDBOX_MEMORY_MB,
+                 wall_seconds: float = Config.SANDBOX_WALL_SECONDS,
+                 max_output_bytes: int = Config.SANDBOX_MAX_OUTPUT_BYTES):
+        self.max_workers = max_workers
+        self.limits = {
+            'cpu_seconds': cpu_seconds,
+            'memory_mb': memory_mb,
+            'wall_seconds': wall_seconds,
+            'max_output_bytes': max_output_bytes
+        }
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Web进程是多线程的，工作进程不能直接从中 fork
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=multiprocessing.get_context(method),
+                                                     initializer=_isolate_worker)
+            return self._executor
+
+    def _reset_executor(self, broken: ProcessPoolExecutor):
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+        broken.shutdown(wait=False)
+
+    def run_tests(self, code: str, cases: List[Dict]) -> Dict:
+        """
+        用多组测试运行代码
+
+        Args:
+            code: 学生代码
+            cases: parse_test_cases 的返回值
+
+        Returns:
+            {'total': 测试组数, 'passed': 通过组数, 'cases': [{'input', 'expected', 'output', 'status', 'passed'}]}
+        """
+        executor = self._get_executor()
+        futures = [executor.submit(run_case, code, case['input'], self.limits) for case in cases]
+        results = []
+        for case, future in zip(cases, futures):
+            try:
+                run = future.result(timeout=self.limits['wall_seconds'] + 30)
+            except BrokenProcessPool:
+                self._reset_executor(executor)
+                run = {'status': RUN_KILLED, 'exit_code': None, 'output': "沙箱工作进程异常退出"}
+            except Exception as e:
+                run = {'status': RUN_ERROR, 'exit_code': None, 'output': f"沙箱运行失败：{e}"}
+            passed = run['status'] == RUN_OK and outputs_match(run['output'], case['expected'])
+            results.append({'input': case['input'], 'expected': case['expected'], 'output': run['output'],
+                            'status': run['status'], 'passed': passed})
+        return {'total': len(results), 'passed': sum(r['passed'] for r in results), 'cases': results}
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _clip(text: str, limit: int = 200) -> str:
+    text = text.strip('\n')
+    return text if len(text) <= limit else text[:limit] + "…"
+
+
+def format_execution_facts(report: Optional[Dict]) -> str:
+    """把运行测试的结果整理为附加到提示词中的事实"""
+    if not report or not report['total']:
+        return ""
+    lines = [f"【运行测试（在隔离环境中实际运行学生代码，正确性评分以此为主要依据）】"
+             f"通过 {report['passed']}/{report['total']} 组"]
+    status_text = {RUN_TIMEOUT: "运行超时", RUN_KILLED: "超出资源限制被终止", RUN_ERROR: "运行出错"}
+    for index, case in enumerate(report['cases'], 1):
+        if case['passed']:
+            continue
+        reason = status_text.get(case['status'], "输出与期望不一致")
+        output = case['output']
+        if case['status'] == RUN_ERROR and 'Traceback' in output:
+            # 出错时只保留错误信息那一行
+            output = output.rstrip('\n').split('\n')[-1]
+        lines.append(f"- 第{index}组{reason}：输入 {_clip(case['input'], 80)!r}，期望输出 {_clip(case['expected'])!r}，"
+                     f"实际输出 {_clip(output)!r}")
+    return "\n".join(lines)
+
+
+_shared_sandbox = None
+_shared_sandbox_lock = threading.Lock()
+
+
+def get_shared_sandbox() -> CodeSandbox:
+    """返回进程内共享的沙箱，工作进程在所有提交之间复用"""
+    global _shared_sandbox
+    with _shared_sandbox_lock:
+        if _shared_sandbox is None:
+            _shared_sandbox = CodeSandbox()
+            atexit.register(_shared_sandbox.shutdown)
+        return _shared_sandbox
@@ -17,6 +17,12 @@ class Config:
     USING_DEEPSEEK = False
     USING_LONGCAT = True
 
+    # 不使用LLM时的默认值，评分由本地静态分析完成
+    MY_LLM_API_KEY = None
+    MY_LLM_API_URL = None
+    MODEL_NAME = "本地静态分析"
+    TEMPERATURE = 0.1
+
     # DeepSeek API配置
     if IS_LLM_RUN and USING_DEEPSEEK:
         MY_LLM_API_KEY = os.getenv('MY_DEEPSEEK_API_KEY')
@@ -31,13 +37,130 @@ class Config:
         MODEL_NAME = "LongCat-Flash-Chat"
         TEMPERATURE = 0.1  # 低温度保证评分一致性
 
+    # 备用大模型服务（按优先级排列），主服务失败或变慢时切换；未配置密钥的服务会被跳过
+    BACKUP_PROVIDERS = []
+    if IS_LLM_RUN and not USING_DEEPSEEK:
+        BACKUP_PROVIDERS.append({
+            "name": "DeepSeek",
+            "api_url": "https://api.deepseek.com/v1/chat/completions",
+            "api_key": os.getenv('MY_DEEPSEEK_API_KEY'),
+            "model": "deepseek-coder",
+            "temperature": 0.1
+        })
+    if IS_LLM_RUN and not USING_LONGCAT:
+        BACKUP_PROVIDERS.append({
+            "name": "LongCat",
+            "api_url": "https://api.longcat.chat/openai/v1/chat/completions",
+            "api_key": os.getenv('MY_LONGCAT_API_KEY'),
+            "model": "LongCat-Flash-Chat",
+            "temperature": 0.1
+        })
+    HEDGE_REQUESTS = True               # 主服务超过其p95延迟未返回时向备用服务发出对冲请求
+    HEDGE_MIN_SAMPLES = 10              # 延迟样本少于该数量时使用默认对冲等待时间
+    HEDGE_DEFAULT_DELAY = 15            # 默认对冲等待时间（秒）
+    HEDGE_MIN_DELAY = 1                 # 对冲等待时间下限（秒）
+    FAILOVER_MAX_RETRIES = 1            # 还有备用服务时，每个服务的最大尝试次数
+
     # 请求配置
     TIMEOUT = 30
+    MAX_CONCURRENT_REQUESTS = 8         # 批量评分时同时在途的最大请求数
+    REQUESTS_PER_MINUTE = 60            # 大模型接口每分钟请求数上限
+    TOKENS_PER_MINUTE = 100000          # 大模型接口每分钟token数上限
+    HTTP_POOL_SIZE = 16                 # HTTP连接池大小
+    LLM_MAX_RETRIES = 3                 # 单次调用最大尝试次数
+    LLM_BACKOFF_BASE = 1.0              # 指数退避基数（秒）
+    LLM_BACKOFF_MAX = 30                # 单次退避等待上限（秒）
+    CIRCUIT_FAILURE_THRESHOLD = 5       # 连续失败多少次后熔断
+    CIRCUIT_RESET_TIMEOUT = 30          # 熔断持续时间（秒）
+
+    # 多份短作业合并评分配置（教师批量评分时使用）
+    PACK_MAX_SUBMISSION_TOKENS = 800        # 作业内容不超过该token数时才参与合并
+    PACK_MAX_TOKENS = 4000                  # 一次合并请求中作业内容的token上限
+    PACK_MAX_SUBMISSIONS = 6                # 一次合并请求最多包含的作业份数
+    PACK_OUTPUT_TOKENS_PER_SUBMISSION = 600 # 合并请求中每份作业预留的生成token数
+
+    # 提示词token预算配置（不大于0表示不限制）
+    PROMPT_TOKEN_BUDGET = 6000              # 整份作业评分时作业内容的token上限
+    QUESTION_TOKEN_BUDGET = 2000            # 按题评分时单题作答的token上限
+    STUDY_PLAN_CONTENT_BUDGET = 1500        # 生成学习计划时作业内容的token上限
+    STUDY_PLAN_EVALUATION_BUDGET = 2000     # 生成学习计划时评分结果的token上限
+    MAX_OUTPUT_TOKENS = 2000                # 单次调用最大生成token数
+
+    # 本地静态分析：把语法、知识点使用、代码规范等检查结果附加到提示词中
+    STATIC_ANALYSIS = True
+
+    # 运行测试：按老师填写的测试输入和期望输出在沙箱中实际运行各题代码
+    CODE_EXECUTION = True
+    SANDBOX_WORKERS = 2                     # 沙箱工作进程数
+    SANDBOX_CPU_SECONDS = 2                 # 每组测试的CPU时间上限（秒）
+    SANDBOX_MEMORY_MB = 256                 # 每组测试的内存上限
+    SANDBOX_WALL_SECONDS = 5                # 每组测试的墙钟时间上限（秒），等待输入等情况也会超时
+    SANDBOX_MAX_OUTPUT_BYTES = 64 * 1024    # 输出大小上限
+    SANDBOX_USER = 'nobody'                 # 以root运行时学生代码切换到该用户执行，为空时不切换
+
+    # 提交文件文本提取（txt、pdf、doc、docx）
+    EXTRACTION_WORKERS = 2                  # 提取工作进程数
+    EXTRACTION_TIMEOUTS = {'txt': 5, 'docx': 20, 'doc': 30, 'pdf': 60}   # 各类型单个文件的提取超时（秒）
+    EXTRACTION_DEFAULT_TIMEOUT = 30
+    EXTRACTION_QUEUE_GRACE = 30             # 等待提取结果时在超时之外额外允许的排队时间（秒）
+
+    # 作业相似度检测（MinHash + LSH）
+    SIMILARITY_SHINGLE_SIZE = 5             # 每个片段包含的连续词法单元数
+    SIMILARITY_NUM_PERM = 128               # MinHash 签名长度
+    SIMILARITY_BANDS = 32                   # LSH 分段数（每段 SIMILARITY_NUM_PERM / SIMILARITY_BANDS 行）
+    SIMILARITY_THRESHOLD = 0.7              # 估计相似度不低于该值才列为相似提交
+    SIMILARITY_MIN_TOKENS = 30              # 代码词法单元少于该数量时不参与比较
+
+    # 评分结果缓存配置
+    EVALUATION_CACHE_ENABLED = True
+    EVALUATION_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'evaluation_cache.db')
+    EVALUATION_CACHE_MEMORY_ITEMS = 256         # 进程内LRU条目上限
+    EVALUATION_CACHE_MAX_ROWS = 20000           # SQLite缓存条目上限
+    EVALUATION_CACHE_TTL = 30 * 24 * 3600       # 缓存有效期（秒）
+
+    # 后台评分任务配置
+    GRADING_WORKERS = 4                 # 评分工作线程数
+    GRADING_POLL_INTERVAL = 5           # 空闲时扫描数据库中待处理任务的间隔（秒）
+    GRADING_JOB_STALE_SECONDS = 600     # 运行超过该时长的任务视为中断，重新排队
+    GRADING_RETRY_COOLDOWN = 60         # 任务失败后允许重新排队的冷却时间（秒）
+    PER_QUESTION_GRADING = True         # 作业设置了题目时按题拆分、并发评分
+    GRADING_LEASE_POLL_INTERVAL = 1     # 同一作业已有评分在进行时，任务放回队列、间隔该时长后再检查其结果（秒）
+
+    # 评分任务优先级调度：interactive 交互、deadline 截止批量、backfill 回填
+    SCHEDULER_WEIGHTS = {'interactive': 8, 'deadline': 3, 'backfill': 1}               # 出队权重
+    # 各类别同时运行的任务数上限；单个批量类别至少并发2份、最多占一半工作线程，大模型请求量由下面的请求数上限控制
+    SCHEDULER_JOB_LIMITS = {'interactive': GRADING_WORKERS,
+                            'deadline': max(2, GRADING_WORKERS // 2),
+                            'backfill': max(2, GRADING_WORKERS // 2)}
+    SCHEDULER_CALL_LIMITS = {'interactive': 8, 'deadline': 4, 'backfill': 2}          # 各类别同时在途的大模型请求数上限
+
+    # 一键评分整份作业
+    GRADE_ALL_DEADLINE_WINDOW_HOURS = 72    # 截止时间前后该时长内的批量评分按 deadline 类别调度，否则按 backfill
+    GRADE_ALL_PACKED = True                 # 不按题评分时，同一批次的短作业合并到一次请求中评分
+    GRADE_ALL_PROGRESS_INTERVAL = 2         # 命令行等待时打印进度的间隔（秒）
+
+    # 提交后立即评分（按作业开启）
+    EAGER_GRADING_DEBOUNCE_SECONDS = 20     # 上传后等待该时长内没有再次上传才开始评分
+
+    # 流式输出配置
+    LLM_STREAMING = True                # 后台评分使用 stream: true 接口，并通过SSE推送到预览页
+    STREAM_MAX_SECONDS = 300            # 单个SSE连接的最长保持时间（秒）
+    STREAM_IDLE_SECONDS = 30            # SSE连接持续该时长没有新输出时断开，页面改为轮询任务状态（秒）
+    STREAM_HEARTBEAT_SECONDS = 15       # SSE心跳间隔（秒）
+
+    # 评分结果语音（IS_SOUND_ON 打开时在后台进程中合成音频文件，预览页在浏览器中播放）
+    TTS_RATE = 150                      # 语速
+    TTS_VOLUME = 0.9                    # 音量
+    TTS_VOICE = None                    # pyttsx3 的语音ID，为空时使用系统默认语音
+    TTS_TIMEOUT = 120                   # 单次合成的超时时间（秒）
+    TTS_RETRY_COOLDOWN = 300            # 合成失败后间隔该时长才重试（秒）
+    AUDIO_CACHE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'feedback_audio')
+    AUDIO_CACHE_MAX_FILES = 2000        # 缓存的音频文件数上限，超出时删除最久未使用的文件
 
     # 验证配置
     @classmethod
     def validate_config(cls):
-        if not cls.MY_LLM_API_KEY:
+        if cls.IS_LLM_RUN and not cls.MY_LLM_API_KEY:
             raise ValueError("❌ 未找到DEEPSEEK_API_KEY环境变量，请检查.env文件配置")
         print("✅ 配置验证通过")
 
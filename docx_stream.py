@@ -0,0 +1,142 @@
+# docx_stream.py
+"""
+流式 .docx 文本提取
+
+直接从压缩包中读取 word/document.xml，用 iterparse 增量解析，处理完一个段落或一行表格就释放对应的XML节点，
+内存占用只与单个段落、单行表格的大小有关，不随文件大小增长。输出与 python-docx 一致：
+段落文本与 Document().paragraphs 相同，表格单元格文本与 Table.rows[i].cells 相同（只取正文顶层的段落和表格）。
+"""
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import Dict, Iterator, List, Tuple
+
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_DOCUMENT_PART = 'word/document.xml'
+
+# 与 python-docx 的 CT_R.text 一致：run 中这些子元素对应的文本
+_RUN_TEXT = {'tab': '\t', 'ptab': '\t', 'cr': '\n', 'noBreakHyphen': '-'}
+
+_BODY = ['document', 'body']
+_TABLE = _BODY + ['tbl']
+_ROW = _TABLE + ['tr']
+_CELL = _ROW + ['tc']
+
+
+def _local(tag: str) -> str:
+    return tag[len(_W):] if tag.startswith(_W) else tag
+
+
+def iter_blocks(path: str) -> Iterator[Tuple[str, object]]:
+    """
+    按文档顺序逐个产生正文中的段落和表格行
+
+    Args:
+        path: .docx 文件路径
+
+    Returns:
+        迭代器，元素为 ('paragraph', 段落文本)、('table', 表格序号，从1开始) 或 ('row', 该行各单元格文本列表)；
+        每个单元格一项，横向合并的单元格只出现一次，纵向合并的后续单元格取首个单元格的文本
+    """
+    with zipfile.ZipFile(path) as archive, archive.open(_DOCUMENT_PART) as xml_file:
+        stack: List[str] = []
+        parents: List[ET.Element] = []
+        paragraph_depth = None      # 正在收集文本的段落在 stack 中的位置
+        parts: List[str] = []
+        table_count = 0
+        cell_paragraphs: List[str] = []
+        cell_span, cell_merge = 1, None
+        row_cells: List[str] = []
+        row_offsets: Dict[int, str] = {}    # 本行各单元格起始列 -> 文本，供下一行纵向合并的单元格取值
+        above_offsets: Dict[int, str] = {}
+        grid_offset = 0
+
+        for event, elem in ET.iterparse(xml_file, events=('start', 'end')):
+            if event == 'start':
+                name = _local(elem.tag)
+                if name == 'p' and (stack == _BODY or stack == _CELL):
+                    paragraph_depth = len(stack)
+                    parts = []
+                elif name == 'tbl' and stack == _BODY:
+                    table_count += 1
+                    above_offsets = {}
+                    yield 'table', table_count
+                elif name == 'tr' and stack == _TABLE:
+                    row_cells, row_offsets, grid_offset = [], {}, 0
+                elif name == 'tc' and stack == _ROW:
+                    cell_paragraphs, cell_span, cell_merge = [], 1, None
+                stack.append(name)
+                parents.append(elem)
+                continue
+
+            name = stack.pop()
+            parents.pop()
+            if paragraph_depth is not None and len(stack) >= 2 and stack[-1] == 'r' and \
+                    (len(stack) == paragraph_depth + 2 or
+                     (len(stack) == paragraph_depth + 3 and stack[paragraph_depth + 1] == 'hyperlink')):
+                # 段落（或段落中超链接）直接包含的 run 中的文本
+                if name == 't':
+                    parts.append(elem.text or '')
+                elif name == 'br':
+                    parts.append('\n' if elem.get(_W + 'type', 'textWrapping') == 'textWrapping' else '')
+                elif name in _RUN_TEXT:
+                    parts.append(_RUN_TEXT[name])
+            elif name == 'gridBefore' and stack == _ROW + ['trPr']:
+                grid_offset = int(elem.get(_W + 'val', 0))
+            elif name == 'gridSpan' and stack == _CELL + ['tcPr']:
+                cell_span = int(elem.get(_W + 'val', 1))
+            elif name == 'vMerge' and stack == _CELL + ['tcPr']:
+                cell_merge = elem.get(_W + 'val', 'continue')
+            elif name == 'p' and len(stack) == paragraph_depth:
+                paragraph_depth = None
+                text = ''.join(parts)
+                if stack == _BODY:
+                    yield 'paragraph', text
+                else:
+                    cell_paragraphs.append(text)
+            elif name == 'tc' and stack == _ROW:
+                if cell_merge == 'continue':
+                    text = above_offsets.get(grid_offset, '')
+                else:
+                    text = '\n'.join(cell_paragraphs)
+                row_offsets[grid_offset] = text
+                row_cells.append(text)
+                grid_offset += cell_span
+            elif name == 'tr' and stack == _TABLE:
+                above_offsets = row_offsets
+                yield 'row', row_cells
+
+            # 正文中的段落、表格和表格行处理完后从树中移除，保持内存占用有界
+            if stack == _BODY or (name == 'tr' and stack == _TABLE) or (name == 'p' and stack == _CELL):
+                parents[-1].remove(elem)
+                elem.clear()
+
+
+def iter_paragraphs(path: str) -> Iterator[str]:
+    """逐个产生正文顶层段落的文本，与 [p.text for p in Document(path).paragraphs] 相同"""
+    for kind, value in iter_blocks(path):
+        if kind == 'paragraph':
+            yield value
+
+
+def extract_docx(path: str) -> Dict:
+    """
+    流式提取 .docx 中段落和表格的文本，结果与 homework_parser.extract_docx 相同
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        {'text': 文本（每段一行）, 'paragraph_count': 段落数, 'table_count': 表格数}
+    """
+    lines = []
+    paragraph_count = table_count = 0
+    for kind, value in iter_blocks(path):
+        if kind == 'paragraph':
+            paragraph_count += 1
+            lines.append(value)
+        elif kind == 'table':
+            table_count = value
+        else:
+            lines.append('\t'.join(value))
+    text = ''.join(line + '\n' for line in lines)
+    return {'text': text, 'paragraph_count': paragraph_count, 'table_count': table_count}
@@ -0,0 +1,151 @@
+# evaluation_cache.py
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from config import Config
+
+
+def normalize_homework_text(text: str) -> str:
+    """规范化作业文本：统一换行、去掉行尾空白、合并连续空行，使重复上传的相同作业得到相同的键"""
+    text = text.replace('\r\n', '\n').replace('\r', '\n').replace('\u00a0', ' ')
+    lines = [line.rstrip() for line in text.split('\n')]
+    text = '\n'.join(lines)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    return text.strip()
+
+
+def make_cache_key(homework_content: str, system_prompt: str, model: str, temperature: float) -> str:
+    """由规范化后的作业文本、系统提示词、模型名和温度计算缓存键"""
+    payload = json.dumps(
+        [normalize_homework_text(homework_content), system_prompt, model, temperature],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class EvaluationCache:
+    """评分结果缓存
+
+    两级结构：进程内有界LRU + SQLite持久化层（按TTL过期、按条数上限淘汰，跨进程共享）。
+    """
+
+    def __init__(self, db_path: str = Config.EVALUATION_CACHE_PATH,
+                 max_memory_items: int = Config.EVALUATION_CACHE_MEMORY_ITEMS,
+                 max_db_rows: int = Config.EVALUATION_CACHE_MAX_ROWS,
+                 ttl_seconds: int = Config.EVALUATION_CACHE_TTL):
+        self.db_path = db_path
+        self.max_memory_items = max_memory_items
+        self.max_db_rows = max_db_rows
+        self.ttl_seconds = ttl_seconds
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._writes_since_evict = 0
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=10)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS evaluation_cache ('
+            'cache_key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+            'created_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS ix_evaluation_cache_accessed ON evaluation_cache (accessed_at)')
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """查询缓存，未命中或已过期返回 None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and now - entry[1] < self.ttl_seconds:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry[0]
+
+            row = self._conn.execute(
+                'SELECT value, created_at FROM evaluation_cache WHERE cache_key = ?', (key,)
+            ).fetchone()
+            if row and now - row[1] < self.ttl_seconds:
+                self._conn.execute('UPDATE evaluation_cache SET accessed_at = ? WHERE cache_key = ?', (now, key))
+                self._conn.commit()
+                self._remember(key, row[0], row[1])
+                self.disk_hits += 1
+                return row[0]
+
+            self._memory.pop(key, None)
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: str):
+        """写入缓存"""
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            self._conn.execute(
+                'INSERT OR REPLACE INTO evaluation_cache (cache_key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)',
+                (key, value, now, now)
+            )
+            self._conn.commit()
+            self._writes_since_evict += 1
+            if self._writes_since_evict >= 50:
+                self._evict(now)
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._memory.pop(key, None)
+            self._conn.execute('DELETE FROM evaluation_cache WHERE cache_key = ?', (key,))
+            self._conn.commit()
+
+    def _remember(self, key: str, value: str, created_at: float):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _evict(self, now: float):
+        """删除过期条目，并按最近访问时间淘汰超出条数上限的部分"""
+        self._writes_since_evict = 0
+        self._conn.execute('DELETE FROM evaluation_cache WHERE created_at < ?', (now - self.ttl_seconds,))
+        self._conn.execute(
+            'DELETE FROM evaluation_cache WHERE cache_key IN ('
+            'SELECT cache_key FROM evaluation_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_db_rows,)
+        )
+        self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                'memory_items': len(self._memory)
+            }
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_shared_cache() -> EvaluationCache:
+    """返回进程内共享的评分缓存"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = EvaluationCache()
+        return _shared_cache
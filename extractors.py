@@ -0,0 +1,353 @@
+# extractors.py
+"""
+提交文件的文本提取
+
+按文件类型注册提取器（txt、pdf、doc、docx），在常驻的工作进程池中执行：解析PDF、Word等CPU密集的工作不占用
+Web进程的请求线程和GIL，单个文件超过该类型的超时时间时中止提取。每种类型分别统计提取次数、失败次数、
+耗时和吞吐量。
+
+pdf 需要安装 pypdf，doc 需要安装 olefile（或系统中有 antiword 命令），未安装时该类型的提取报错，不影响其他类型。
+"""
+import atexit
+import multiprocessing
+import os
+import re
+import shutil
+import signal
+import struct
+import subprocess
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Optional
+
+try:
+    from charset_normalizer import from_bytes as detect_encoding
+except ImportError:  # 未安装时无法识别的编码按UTF-8替换非法字节
+    detect_encoding = None
+
+from config import Config
+import docx_stream
+
+# 旧版 .doc 中的控制字符：段落结束、单元格结束、域代码标记等
+_DOC_CONTROL = re.compile(r'[\x00-\x06\x08\x0b\x0c\x0e-\x1f]')
+_DOC_FIELD = re.compile(r'\x13[^\x13\x14\x15]*\x14?([^\x13\x14\x15]*)\x15')
+
+
+class ExtractionError(Exception):
+    """文件无法提取文本：格式损坏、缺少依赖、超时等"""
+
+
+class ExtractionRetryable(ExtractionError):
+    """暂时性的提取失败（超时、提取进程异常退出等），与文件本身无关，结果不应保存，稍后重试"""
+
+
+class ExtractionTimeout(ExtractionRetryable):
+    """提取超过该文件类型的超时时间"""
+
+
+_EXTRACTORS: Dict[str, Callable[[str], Dict]] = {}
+
+
+def register_extractor(*file_types: str):
+    """注册一个或多个文件类型（扩展名，小写，不带点）的提取器"""
+    def decorator(func):
+        for file_type in file_types:
+            _EXTRACTORS[file_type] = func
+        return func
+    return decorator
+
+
+def file_type_of(path: str) -> str:
+    return os.path.splitext(path)[1].lstrip('.').lower()
+
+
+def is_supported(path: str) -> bool:
+    return file_type_of(path) in _EXTRACTORS
+
+
+def _result(text: str, paragraph_count: Optional[int] = None, table_count: int = 0) -> Dict:
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    if text and not text.endswith('\n'):
+        text += '\n'
+    if paragraph_count is None:
+        paragraph_count = text.count('\n')
+    return {'text': text, 'paragraph_count': paragraph_count, 'table_count': table_count}
+
+
+@register_extractor('docx')
+def extract_docx(path: str) -> Dict:
+    return docx_stream.extract_docx(path)
+
+
+def decode_text(data: bytes) -> str:
+    """
+    识别文本文件的编码并解码：依次按BOM、UTF-8、GB18030（兼容GBK）严格解码，都失败时用 charset_normalizer 检测。
+    学生作业以中文为主，短文本上自动检测不如直接尝试GB18030可靠。
+
+    Returns:
+        解码后的文本，无法识别时按UTF-8解码并替换非法字节
+    """
+    for bom, encoding in ((b'\xef\xbb\xbf', 'utf-8-sig'), (b'\xff\xfe', 'utf-16'), (b'\xfe\xff', 'utf-16')):
+        if data.startswith(bom):
+            return data.decode(encoding, errors='replace')
+    for encoding in ('utf-8', 'gb18030'):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            pass
+    if detect_encoding is not None:
+        best = detect_encoding(data).best()
+        if best is not None:
+            return str(best)
+    return data.decode('utf-8', errors='replace')
+
+
+@register_extractor('txt')
+def extract_txt(path: str) -> Dict:
+    with open(path, 'rb') as f:
+        return _result(decode_text(f.read()))
+
+
+@register_extractor('pdf')
+def extract_pdf(path: str) -> Dict:
+    """提取PDF的文字层，扫描件等没有文字层的PDF报错"""
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise ExtractionError("未安装 pypdf，无法提取PDF文本")
+    try:
+        reader = PdfReader(path)
+        pages = [page.extract_text() or '' for page in reader.pages]
+    except Exception as e:
+        raise ExtractionError(f"PDF解析失败：{e}")
+    text = '\n'.join(page.rstrip('\n') for page in pages)
+    if not text.strip():
+        raise ExtractionError("PDF中没有可提取的文字（可能是扫描件）")
+    return _result(text)
+
+
+def _doc_text_from_streams(word_document: bytes, table: bytes) -> str:
+    """
+    按 Word 97-2003 的 FIB 和分段表（piece table）从 WordDocument 流中取出正文文本
+
+    Args:
+        word_document: WordDocument 流
+        table: FIB 指定的 0Table 或 1Table 流
+    """
+    if struct.unpack_from('<H', word_document, 0)[0] != 0xA5EC:
+        raise ExtractionError("不是有效的Word 97-2003文档")
+    # FibBase(32字节) 之后依次是 fibRgW、fibRgLw、fibRgFcLcb，各自以长度开头
+    csw = struct.unpack_from('<H', word_document, 32)[0]
+    rg_lw = 34 + csw * 2 + 2
+    cslw = struct.unpack_from('<H', word_document, rg_lw - 2)[0]
+    ccp_text = struct.unpack_from('<i', word_document, rg_lw + 12)[0]
+    rg_fc_lcb = rg_lw + cslw * 4 + 2
+    fc_clx, lcb_clx = struct.unpack_from('<II', word_document, rg_fc_lcb + 33 * 8)
+    clx = table[fc_clx:fc_clx + lcb_clx]
+
+    pos = 0
+    while pos < len(clx) and clx[pos] == 0x01:  # 跳过格式信息 Prc
+        pos += 3 + struct.unpack_from('<H', clx, pos + 1)[0]
+    if pos >= len(clx) or clx[pos] != 0x02:
+        raise ExtractionError("Word文档分段表损坏")
+    lcb = struct.unpack_from('<I', clx, pos + 1)[0]
+    plc = clx[pos + 5:pos + 5 + lcb]
+    count = (lcb - 4) // 12
+    cps = struct.unpack_from(f'<{count + 1}i', plc, 0)
+    parts = []
+    for index in range(count):
+        start, end = cps[index], min(cps[index + 1], ccp_text)
+        if start >= end:
+            break
+        fc = struct.unpack_from('<I', plc, (count + 1) * 4 + index * 8 + 2)[0]
+        if fc & 0x40000000:
+            offset = (fc & ~0x40000000) // 2
+            parts.append(word_document[offset:offset + end - start].decode('cp1252', errors='replace'))
+        else:
+            parts.append(word_document[fc:fc + (end - start) * 2].decode('utf-16-le', errors='replace'))
+    text = ''.join(parts)
+    text = _DOC_FIELD.sub(r'\1', text)       # 域只保留显示结果
+    text = text.replace('\x07', '\t')        # 单元格结束
+    return _DOC_CONTROL.sub('', text.replace('\r', '\n'))
+
+
+@register_extractor('doc')
+def extract_doc(path: str) -> Dict:
+    """提取旧版Word文档正文：优先用 olefile 解析分段表，未安装时使用系统的 antiword 命令"""
+    try:
+        import olefile
+    except ImportError:
+        olefile = None
+    if olefile is not None:
+        try:
+            with olefile.OleFileIO(path) as ole:
+                word_document = ole.openstream('WordDocument').read()
+                flags = struct.unpack_from('<H', word_document, 0x0A)[0]
+                table = ole.openstream('1Table' if flags & 0x0200 else '0Table').read()
+        except (OSError, ValueError) as e:
+            raise ExtractionError(f"Word文档解析失败：{e}")
+        return _result(_doc_text_from_streams(word_document, table))
+
+    if shutil.which('antiword'):
+        completed = subprocess.run(['antiword', '-w', '0', path], capture_output=True,
+                                   timeout=Config.EXTRACTION_TIMEOUTS.get('doc', Config.EXTRACTION_DEFAULT_TIMEOUT))
+        if completed.returncode != 0:
+            raise ExtractionError(f"antiword 提取失败：{completed.stderr.decode('utf-8', errors='replace')[:200]}")
+        return _result(completed.stdout.decode('utf-8', errors='replace'))
+    raise ExtractionError("未安装 olefile 或 antiword，无法提取 .doc 文本")
+
+
+def run_extractor(path: str, timeout: Optional[float] = None) -> Dict:
+    """按扩展名调用提取器（在工作进程中执行），超过 timeout 秒时抛出 ExtractionTimeout"""
+    extractor = _EXTRACTORS.get(file_type_of(path))
+    if extractor is None:
+        raise ExtractionError(f"不支持的文件类型：{file_type_of(path) or '无扩展名'}")
+
+    def on_timeout(signum, frame):
+        raise ExtractionTimeout(f"提取超时（超过{timeout}秒）")
+
+    # 工作进程在主线程中执行任务，可以用定时器信号限制单个文件的提取时间（不含排队时间）
+    use_alarm = bool(timeout) and hasattr(signal, 'setitimer')
+    if use_alarm:
+        previous = signal.signal(signal.SIGALRM, on_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return extractor(path)
+    except ExtractionError:
+        raise
+    except Exception as e:
+        # 工作进程中的其他异常可能无法在主进程中还原，统一转换
+        raise ExtractionError(f"{type(e).__name__}: {e}")
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+
+class ExtractorPool:
+    """执行文本提取的进程池，按文件类型统计吞吐量"""
+
+    def __init__(self, max_workers: int = Config.EXTRACTION_WORKERS):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict] = {}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Web进程是多线程的，工作进程不能直接从中 fork
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=multiprocessing.get_context(method))
+            return self._executor
+
+    def _reset_executor(self, broken: ProcessPoolExecutor, kill: bool = False):
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+        if kill:
+            # 超时的提取仍在工作进程中运行，只能终止进程；同一进程池中的其他提取会以 BrokenProcessPool 失败
+            for process in list((getattr(broken, '_processes', None) or {}).values()):
+                process.terminate()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _record(self, file_type: str, size: int, seconds: float, outcome: str) -> Dict:
+        with self._lock:
+            stats = self._stats.setdefault(file_type, {'files': 0, 'failed': 0, 'timeouts': 0,
+                                                       'bytes': 0, 'seconds': 0.0})
+            stats['files'] += 1
+            stats['bytes'] += size
+            stats['seconds'] += seconds
+            if outcome == 'failed':
+                stats['failed'] += 1
+            elif outcome == 'timeout':
+                stats['timeouts'] += 1
+            return dict(stats)
+
+    def _run(self, path: str, timeout: float) -> Dict:
+        for attempt in range(2):
+            executor = self._get_executor()
+            try:
+                future = executor.submit(run_extractor, path, timeout)
+                # 工作进程自行限时；卡在C扩展中无法响应信号时，由这里兜底终止
+                return future.result(timeout=timeout + Config.EXTRACTION_QUEUE_GRACE)
+            except FutureTimeoutError:
+                self._reset_executor(executor, kill=True)
+                raise ExtractionTimeout(f"提取超时（超过{timeout}秒）")
+            except BrokenProcessPool:
+                # 其他文件超时导致进程池被终止时重试一次
+                self._reset_executor(executor)
+        raise ExtractionRetryable("提取进程异常退出，稍后将重试")
+
+    def extract(self, path: str) -> Dict:
+        """
+        在工作进程中提取文件文本
+
+        Args:
+            path: 文件路径
+
+        Returns:
+            {'text', 'paragraph_count', 'table_count'}，失败时抛出 ExtractionError，
+            超时或提取进程异常退出时抛出 ExtractionRetryable
+        """
+        file_type = file_type_of(path)
+        if file_type not in _EXTRACTORS:
+            raise ExtractionError(f"不支持的文件类型：{file_type or '无扩展名'}")
+        # 工作进程的当前目录与Web进程不一定相同，上传目录是相对路径
+        path = os.path.abspath(path)
+        timeout = Config.EXTRACTION_TIMEOUTS.get(file_type, Config.EXTRACTION_DEFAULT_TIMEOUT)
+        size = os.path.getsize(path)
+        start = time.perf_counter()
+        outcome = 'ok'
+        try:
+            return self._run(path, timeout)
+        except ExtractionTimeout:
+            outcome = 'timeout'
+            raise
+        except ExtractionError:
+            outcome = 'failed'
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            stats = self._record(file_type, size, elapsed, outcome)
+            print(f"📄 {file_type} 文件提取{'完成' if outcome == 'ok' else '失败'}，耗时 {elapsed:.2f}s"
+                  f"（{os.path.basename(path)}；{file_type} 累计 {stats['files']} 个，"
+                  f"平均 {stats['seconds'] / stats['files']:.2f}s/个）")
+
+    def stats(self) -> Dict[str, Dict]:
+        """
+        各文件类型的提取统计
+
+        Returns:
+            类型 -> {'files', 'failed', 'timeouts', 'bytes', 'seconds', 'files_per_second', 'mb_per_second'}
+        """
+        with self._lock:
+            snapshot = {file_type: dict(stats) for file_type, stats in self._stats.items()}
+        for stats in snapshot.values():
+            seconds = stats['seconds']
+            stats['files_per_second'] = round(stats['files'] / seconds, 2) if seconds else 0.0
+            stats['mb_per_second'] = round(stats['bytes'] / 1024 / 1024 / seconds, 2) if seconds else 0.0
+        return snapshot
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_shared_extractor_pool() -> ExtractorPool:
+    """返回进程内共享的提取进程池"""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = ExtractorPool()
+            atexit.register(_shared_pool.shutdown)
+        return _shared_pool
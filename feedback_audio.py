@@ -0,0 +1,198 @@
+# feedback_audio.py
+"""
+评分结果语音
+
+把评分结果合成为音频文件，由浏览器播放，不在Web请求中调用扬声器：合成在后台工作进程中完成，
+音频文件按文本和语音参数的哈希缓存，同一份评分结果只合成一次。
+
+合成使用 pyttsx3（python_speaking.VoiceAssistant），未安装时合成失败，不影响预览页其他内容。
+音频的实际格式由语音引擎决定，与扩展名无关：Windows（sapi5）和 Linux（espeak）生成 WAV，macOS（nsss）生成 AIFF。
+缓存文件统一使用 .wav 扩展名，返回给浏览器时按文件头识别格式（audio_mimetype）；AIFF 只有 Safari 能直接播放。
+"""
+import atexit
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Tuple
+
+try:
+    from python_speaking import VoiceAssistant
+except ImportError:  # 未安装 pyttsx3 时无法合成语音
+    VoiceAssistant = None
+
+from config import Config
+
+AUDIO_SUFFIX = '.wav'  # 缓存文件的扩展名，不代表实际格式
+
+AUDIO_READY = 'ready'
+AUDIO_PENDING = 'pending'
+AUDIO_FAILED = 'failed'
+
+
+def audio_mimetype(path: str) -> str:
+    """按文件头识别音频格式，返回对应的 MIME 类型，无法识别时按 WAV 处理"""
+    with open(path, 'rb') as f:
+        header = f.read(12)
+    if header[:4] == b'FORM' and header[8:12] in (b'AIFF', b'AIFC'):
+        return 'audio/aiff'
+    if header[:3] == b'ID3' or header[:2] in (b'\xff\xfb', b'\xff\xf3', b'\xff\xf2'):
+        return 'audio/mpeg'
+    return 'audio/wav'
+
+
+def audio_key(text: str) -> str:
+    """音频缓存键：文本或任一语音参数变化都会得到不同的音频"""
+    payload = json.dumps([text, Config.TTS_RATE, Config.TTS_VOLUME, Config.TTS_VOICE], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def synthesize(text: str, path: str, rate: float, volume: float, voice: Optional[str]):
+    """
+    在工作进程中把文本合成为音频文件；先写入临时文件再改名，合成中途失败不会留下不完整的缓存
+
+    Args:
+        text: 要朗读的文本
+        path: 音频文件路径
+        rate: 语速
+        volume: 音量
+        voice: 语音ID，为空时使用系统默认语音
+    """
+    if VoiceAssistant is None:
+        raise RuntimeError("未安装 pyttsx3，无法合成语音")
+    temp_path = f"{path[:-len(AUDIO_SUFFIX)]}.{os.getpid()}.tmp{AUDIO_SUFFIX}"
+    try:
+        VoiceAssistant(rate, volume, voice).save(text, temp_path)
+        if not os.path.exists(temp_path) or os.path.getsize(temp_path) == 0:
+            raise RuntimeError("语音引擎没有生成音频文件")
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+class FeedbackAudio:
+    """评分结果音频的后台合成与文件缓存"""
+
+    def __init__(self, folder: str = Config.AUDIO_CACHE_FOLDER):
+        self.folder = folder
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._failures: Dict[str, Tuple[float, str]] = {}  # 缓存键 -> (失败时间, 原因)
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.folder, key + AUDIO_SUFFIX)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # 语音引擎不是线程安全的，单个工作进程依次合成；Web进程是多线程的，工作进程不能直接从中 fork
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                self._executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context(method))
+            return self._executor
+
+    def _reset_executor(self, broken: ProcessPoolExecutor):
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+        # 超时的合成仍在工作进程中运行，只能终止进程；排队中的其他合成以 BrokenProcessPool 失败，稍后重试
+        for process in list((getattr(broken, '_processes', None) or {}).values()):
+            process.terminate()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _synthesize(self, key: str, text: str):
+        """后台线程：提交到工作进程并等待结果，超时时终止工作进程"""
+        start = time.perf_counter()
+        executor = self._get_executor()
+        try:
+            future = executor.submit(synthesize, text, self.path_for(key),
+                                     Config.TTS_RATE, Config.TTS_VOLUME, Config.TTS_VOICE)
+            future.result(timeout=Config.TTS_TIMEOUT)
+            print(f"🔊 评分结果语音合成完成，耗时 {time.perf_counter() - start:.2f}s（{key[:12]}）")
+            self._prune()
+        except FutureTimeoutError:
+            self._reset_executor(executor)
+            self._fail(key, f"语音合成超时（超过{Config.TTS_TIMEOUT}秒）")
+        except BrokenProcessPool:
+            # 工作进程异常退出（如语音引擎崩溃），下次合成时重建进程池
+            self._reset_executor(executor)
+            self._fail(key, "语音合成进程异常退出")
+        except Exception as e:
+            self._fail(key, str(e))
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def _fail(self, key: str, reason: str):
+        print(f"⚠️ 评分结果语音合成失败（{key[:12]}）：{reason}")
+        with self._lock:
+            self._failures[key] = (time.monotonic(), reason)
+
+    def _prune(self):
+        """缓存文件数超过上限时删除最久未使用的文件"""
+        try:
+            entries = [entry for entry in os.scandir(self.folder)
+                       if entry.is_file() and entry.name.endswith(AUDIO_SUFFIX) and '.tmp' not in entry.name]
+        except FileNotFoundError:
+            return
+        excess = len(entries) - Config.AUDIO_CACHE_MAX_FILES
+        if excess <= 0:
+            return
+        for entry in sorted(entries, key=lambda item: item.stat().st_mtime)[:excess]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def request(self, text: str) -> Tuple[str, str, Optional[str]]:
+        """
+        返回评分结果的音频，尚未合成时在后台开始合成（不等待）
+
+        Args:
+            text: 评分结果
+
+        Returns:
+            (缓存键, 状态 ready/pending/failed, 失败原因)
+        """
+        key = audio_key(text)
+        path = self.path_for(key)
+        if os.path.exists(path):
+            # 更新访问时间，清理缓存时保留最近使用的文件
+            os.utime(path)
+            return key, AUDIO_READY, None
+        with self._lock:
+            if key in self._pending:
+                return key, AUDIO_PENDING, None
+            failure = self._failures.get(key)
+            if failure and time.monotonic() - failure[0] < Config.TTS_RETRY_COOLDOWN:
+                return key, AUDIO_FAILED, failure[1]
+            self._failures.pop(key, None)
+            self._pending.add(key)
+        os.makedirs(self.folder, exist_ok=True)
+        threading.Thread(target=self._synthesize, args=(key, text), daemon=True).start()
+        return key, AUDIO_PENDING, None
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+_shared_audio = None
+_shared_audio_lock = threading.Lock()
+
+
+def get_shared_feedback_audio() -> FeedbackAudio:
+    """返回进程内共享的评分结果语音合成器"""
+    global _shared_audio
+    with _shared_audio_lock:
+        if _shared_audio is None:
+            _shared_audio = FeedbackAudio()
+            atexit.register(_shared_audio.shutdown)
+        return _shared_audio
@@ -0,0 +1,114 @@
+# grading_jobs.py
+import threading
+from typing import Callable, Iterable, Optional, Tuple
+
+from config import Config
+from grading_scheduler import GradingScheduler, PRIORITY_INTERACTIVE
+
+# 评分任务状态
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'  # 作业已重新提交，任务的结果作废
+
+ACTIVE_JOB_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+# 评分任务类型
+JOB_KIND_EVALUATE = 'evaluate'
+JOB_KIND_STUDY_PLAN = 'study_plan'
+JOB_KIND_EXTRACT = 'extract'  # 上传后提取文件文字、更新相似度索引、拆分题目并预检，不调用大模型
+
+# 批量评分（一键评分整份作业的所有提交）状态
+RUN_RUNNING = 'running'
+RUN_DONE = 'done'
+
+
+class GradingWorkerPool:
+    """后台评分工作线程池
+
+    任务本身持久化在数据库中，线程池只负责按任务ID调度执行，出队顺序由 GradingScheduler 按优先级决定。
+    空闲时会调用 recover 回调扫描数据库，拾取其他进程写入或因重启而遗留的任务。
+    """
+
+    def __init__(self, handler: Callable[[int], None],
+                 recover: Optional[Callable[[], Iterable[Tuple[int, str, Optional[int]]]]] = None,
+                 max_workers: int = Config.GRADING_WORKERS,
+                 poll_interval: float = Config.GRADING_POLL_INTERVAL,
+                 scheduler: Optional[GradingScheduler] = None):
+        """
+        Args:
+            handler: 执行单个任务的函数，参数为任务ID
+            recover: 返回待执行任务 (任务ID, 优先级类别, 课程ID) 列表的函数，用于启动和空闲时扫描
+            max_workers: 工作线程数
+            poll_interval: 空闲扫描间隔（秒）
+            scheduler: 任务调度器
+        """
+        self.handler = handler
+        self.recover = recover
+        self.max_workers = max_workers
+        self.poll_interval = poll_interval
+        self.scheduler = scheduler or GradingScheduler()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._stopping = threading.Event()
+
+    def start(self):
+        """启动工作线程（重复调用无副作用）"""
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.max_workers):
+                thread = threading.Thread(target=self._worker_loop, name=f"grading-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        self._recover()
+
+    def submit(self, job_id: int, priority: str = PRIORITY_INTERACTIVE, course_id: Optional[int] = None,
+               delay: float = 0):
+        """
+        提交任务ID，已在队列中的任务不会重复加入（优先级更高时会提升）
+
+        Args:
+            delay: 延迟多少秒后再加入队列，用于合并短时间内的重复提交
+        """
+        if delay > 0:
+            timer = threading.Timer(delay, self.scheduler.put, args=(job_id, priority, course_id))
+            timer.daemon = True
+            timer.start()
+            return
+        self.scheduler.put(job_id, priority, course_id)
+
+    def shutdown(self, wait: bool = True):
+        """停止工作线程"""
+        self._stopping.set()
+        self.scheduler.close()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        self._threads = []
+
+    def _recover(self):
+        if not self.recover:
+            return
+        try:
+            for job_id, priority, course_id in self.recover():
+                self.submit(job_id, priority, course_id)
+        except Exception as e:
+            print(f"❌ 扫描待处理评分任务失败：{e}")
+
+    def _worker_loop(self):
+        while not self._stopping.is_set():
+            item = self.scheduler.get(timeout=self.poll_interval)
+            if item is None:
+                if not self._stopping.is_set():
+                    self._recover()
+                continue
+
+            job_id, priority = item
+            try:
+                self.handler(job_id)
+            except Exception as e:
+                print(f"❌ 评分任务 {job_id} 执行异常：{e}")
+            finally:
+                self.scheduler.task_done(priority)
@@ -0,0 +1,169 @@
+# grading_scheduler.py
+"""
+评分任务优先级调度
+
+任务分为三个优先级类别：交互（学生/教师打开预览页时触发）、截止批量（临近截止时间的批量评分）、
+回填（重新评分等后台任务）。各类别按权重公平出队，同一类别内按课程轮转，避免一个大班占满队列；
+每个类别同时运行的任务数和同时在途的大模型请求数都有上限，批量任务不会把交互请求挤掉。
+"""
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from config import Config
+
+# 优先级类别，按优先程度从高到低排列
+PRIORITY_INTERACTIVE = 'interactive'
+PRIORITY_DEADLINE = 'deadline'
+PRIORITY_BACKFILL = 'backfill'
+PRIORITY_CLASSES = (PRIORITY_INTERACTIVE, PRIORITY_DEADLINE, PRIORITY_BACKFILL)
+
+
+def higher_priority(a: str, b: str) -> bool:
+    """a 是否比 b 更优先"""
+    return PRIORITY_CLASSES.index(a) < PRIORITY_CLASSES.index(b)
+
+
+class GradingScheduler:
+    """加权公平的评分任务队列
+
+    各类别维护一个虚拟时间，每出队一个任务增加 1/权重，总是从虚拟时间最小且未达到并发上限的类别出队；
+    类别从空变为非空时虚拟时间追到当前值，空闲期间不会积攒额度。
+    """
+
+    def __init__(self, weights: Dict[str, float] = None, job_limits: Dict[str, int] = None,
+                 call_limits: Dict[str, int] = None):
+        self.weights = weights or Config.SCHEDULER_WEIGHTS
+        self.job_limits = job_limits or Config.SCHEDULER_JOB_LIMITS
+        call_limits = call_limits or Config.SCHEDULER_CALL_LIMITS
+        self._queues = {cls: OrderedDict() for cls in PRIORITY_CLASSES}  # 类别 -> {课程ID: 任务ID队列}
+        self._where = {}  # 任务ID -> (类别, 课程ID)
+        self._pass = {cls: 0.0 for cls in PRIORITY_CLASSES}
+        self._running = {cls: 0 for cls in PRIORITY_CLASSES}
+        self._vtime = 0.0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._call_slots = {cls: threading.BoundedSemaphore(call_limits[cls]) for cls in PRIORITY_CLASSES}
+
+    def _queued(self, cls: str) -> int:
+        return sum(len(jobs) for jobs in self._queues[cls].values())
+
+    def _remove(self, job_id: int):
+        cls, course_id = self._where.pop(job_id)
+        jobs = self._queues[cls][course_id]
+        jobs.remove(job_id)
+        if not jobs:
+            del self._queues[cls][course_id]
+
+    def put(self, job_id: int, priority: str = PRIORITY_INTERACTIVE, course_id: Optional[int] = None) -> bool:
+        """
+        加入任务
+
+        Returns:
+            是否新加入；任务已在队列中时返回 False，若新的优先级更高则把任务移到更高的类别
+        """
+        if priority not in PRIORITY_CLASSES:
+            priority = PRIORITY_BACKFILL
+        with self._cond:
+            if job_id in self._where:
+                if not higher_priority(priority, self._where[job_id][0]):
+                    return False
+                self._remove(job_id)
+                added = False
+            else:
+                added = True
+            if not self._queues[priority]:
+                self._pass[priority] = max(self._pass[priority], self._vtime)
+            self._queues[priority].setdefault(course_id, deque()).append(job_id)
+            self._where[job_id] = (priority, course_id)
+            self._cond.notify()
+            return added
+
+    def _pick(self) -> Optional[str]:
+        candidates = [cls for cls in PRIORITY_CLASSES
+                      if self._queues[cls] and self._running[cls] < self.job_limits[cls]]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda cls: (self._pass[cls], PRIORITY_CLASSES.index(cls)))
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Tuple[int, str]]:
+        """
+        取出下一个任务，执行完后必须调用 task_done
+
+        Returns:
+            (任务ID, 类别)，超时或调度器已关闭时返回 None
+        """
+        with self._cond:
+            while not self._closed:
+                cls = self._pick()
+                if cls is not None:
+                    courses = self._queues[cls]
+                    course_id, jobs = next(iter(courses.items()))
+                    job_id = jobs.popleft()
+                    # 同一类别内按课程轮转
+                    if jobs:
+                        courses.move_to_end(course_id)
+                    else:
+                        del courses[course_id]
+                    del self._where[job_id]
+                    self._running[cls] += 1
+                    self._pass[cls] += 1.0 / self.weights[cls]
+                    self._vtime = self._pass[cls]
+                    return job_id, cls
+                if not self._cond.wait(timeout):
+                    return None
+            return None
+
+    def task_done(self, priority: str):
+        with self._cond:
+            self._running[priority] -= 1
+            self._cond.notify_all()
+
+    def close(self):
+        """唤醒并结束所有等待中的 get 调用"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @contextmanager
+    def call_slot(self, priority: str):
+        """占用该类别的一个大模型请求名额"""
+        slot = self._call_slots.get(priority, self._call_slots[PRIORITY_BACKFILL])
+        with slot:
+            yield
+
+    def try_call_slot(self, priority: str) -> Optional[Callable[[], None]]:
+        """不等待地占用该类别的一个大模型请求名额，成功时返回释放函数，名额已满时返回 None"""
+        slot = self._call_slots.get(priority, self._call_slots[PRIORITY_BACKFILL])
+        return slot.release if slot.acquire(blocking=False) else None
+
+    def client_for(self, priority: str, client) -> 'ScheduledClient':
+        """包装大模型客户端，使其调用受该类别的并发上限约束"""
+        return ScheduledClient(client, self, priority)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._cond:
+            return {cls: {'queued': self._queued(cls), 'running': self._running[cls]} for cls in PRIORITY_CLASSES}
+
+
+class ScheduledClient:
+    """按优先级类别限制并发的大模型客户端包装，接口与 ProviderPool 一致"""
+
+    def __init__(self, client, scheduler: GradingScheduler, priority: str):
+        self.client = client
+        self.scheduler = scheduler
+        self.priority = priority
+
+    def chat(self, messages: List[Dict], **kwargs) -> str:
+        with self.scheduler.call_slot(self.priority):
+            # 对冲请求会再发出一个HTTP请求，需要另外占用一个名额
+            return self.client.chat(messages, hedge_slot=lambda: self.scheduler.try_call_slot(self.priority),
+                                    **kwargs)
+
+    def chat_stream(self, messages: List[Dict], **kwargs) -> Iterator[str]:
+        with self.scheduler.call_slot(self.priority):
+            yield from self.client.chat_stream(messages, **kwargs)
+
+    def answered_model(self) -> Optional[str]:
+        return self.client.answered_model()
@@ -0,0 +1,107 @@
+# grading_stream.py
+import threading
+import time
+from typing import Hashable, Iterator, Optional, Tuple
+
+
+class _Channel:
+    def __init__(self):
+        self.chunks = []
+        self.started = False
+        self.finished = False
+        self.error = None
+        self.finished_at = None
+        self.listeners = 0
+        self.cond = threading.Condition()
+
+
+class GradingStreamHub:
+    """进程内的评分输出广播中心
+
+    后台评分线程把大模型的流式输出逐段发布到以 (提交ID, 任务类型) 为键的频道，
+    SSE 接口订阅频道转发给浏览器。中途订阅的客户端会先收到已生成的全部内容。
+    """
+
+    def __init__(self, retention_seconds: float = 60):
+        self.retention_seconds = retention_seconds
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def _get_channel(self, key: Hashable) -> _Channel:
+        with self._lock:
+            self._cleanup()
+            channel = self._channels.get(key)
+            if channel is None or channel.finished:
+                channel = _Channel()
+                self._channels[key] = channel
+            return channel
+
+    def _cleanup(self):
+        now = time.monotonic()
+        expired = [key for key, channel in self._channels.items()
+                   if channel.finished and now - channel.finished_at > self.retention_seconds]
+        for key in expired:
+            del self._channels[key]
+
+    def start(self, key: Hashable):
+        """评分线程开始输出前调用"""
+        channel = self._get_channel(key)
+        with channel.cond:
+            channel.started = True
+            channel.cond.notify_all()
+
+    def publish(self, key: Hashable, delta: str):
+        channel = self._get_channel(key)
+        with channel.cond:
+            channel.chunks.append(delta)
+            channel.cond.notify_all()
+
+    def finish(self, key: Hashable, error: Optional[str] = None):
+        """输出结束（error 不为空表示失败）"""
+        with self._lock:
+            channel = self._channels.get(key)
+        if channel is None:
+            return
+        with channel.cond:
+            channel.finished = True
+            channel.error = error
+            channel.finished_at = time.monotonic()
+            channel.cond.notify_all()
+
+    def listen(self, key: Hashable, poll_interval: float = 1.0) -> Iterator[Tuple[str, Optional[str]]]:
+        """
+        订阅频道
+
+        Returns:
+            事件迭代器：('delta', 文本片段)、('idle', None)（等待超时，调用方可借机检查数据库状态）、
+            ('end', 错误信息或None)
+        """
+        channel = self._get_channel(key)
+        with channel.cond:
+            channel.listeners += 1
+        index = 0
+        try:
+            while True:
+                with channel.cond:
+                    if index >= len(channel.chunks) and not channel.finished:
+                        channel.cond.wait(poll_interval)
+                    new_chunks = channel.chunks[index:]
+                    index = len(channel.chunks)
+                    finished, error = channel.finished, channel.error
+
+                if new_chunks:
+                    yield 'delta', ''.join(new_chunks)
+                elif finished:
+                    yield 'end', error
+                    return
+                else:
+                    yield 'idle', None
+        finally:
+            with channel.cond:
+                channel.listeners -= 1
+                unused = channel.listeners == 0 and not channel.started
+            # 评分任务不在本进程运行时，订阅方创建的空频道不再保留
+            if unused:
+                with self._lock:
+                    if self._channels.get(key) is channel:
+                        del self._channels[key]
@@ -1,27 +1,155 @@
 # homework_LLM_grader.py
-import requests
+import hashlib
+import json
+import re
 import time
-from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Tuple
 from config import Config
 import Promptconfig
+from llm_client import LLMError, LLMTimeoutError, LLMHTTPError, LLMResponseError, CircuitOpenError
+from provider_pool import ProviderPool, get_shared_pool
+from evaluation_cache import EvaluationCache, get_shared_cache, make_cache_key
+from prompt_budget import count_tokens, fit_to_budget, fit_text
+from homework_parser import split_questions
+import static_grader
+from code_sandbox import format_execution_facts, get_shared_sandbox
+from score_parser import SCORE_DIMENSIONS, parse_evaluation, parse_json_evaluation
+
+# 合并评分回复中每份作业的评分段落
+PACKED_RESULT = re.compile(r'===\s*评分\s*(\S+?)\s*===\s*\n(.*?)\n\s*===\s*评分\s*\1\s*结束\s*===', re.S)
+
+def is_error_result(result: str) -> bool:
+    """判断判分器返回的是否为错误信息（判分器出错时返回以❌开头的字符串）"""
+    return not result or result.startswith("❌")
+
+
+def question_answer_hash(answer: str, question: Dict) -> str:
+    """
+    单题评分输入的哈希：作答、题目要求、知识点、测试用例或评分方式任一变化，已有的单题评分都不能沿用
+    """
+    payload = json.dumps([
+        answer,
+        question.get('prompt', ''),
+        question.get('knowledge_point', ''),
+        question.get('test_cases') or [],
+        Config.MODEL_NAME if Config.IS_LLM_RUN else "本地静态分析"
+    ], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def static_facts(homework_content: str) -> str:
+    """整份作业按题做静态分析，返回附加到提示词中的事实"""
+    answers = split_questions(homework_content)
+    if len(answers) <= 1:
+        return static_grader.format_facts(static_grader.analyze_code(homework_content))
+    return "\n".join(f"题目{i}：\n{static_grader.format_facts(static_grader.analyze_code(answer))}"
+                     for i, answer in enumerate(answers, 1))
+
+
+def run_question_tests(report: Dict, question: Dict) -> Optional[Dict]:
+    """
+    用题目的测试数据在沙箱中运行静态分析提取出的代码
+
+    Returns:
+        运行测试的结果，未开启运行测试、题目没有测试数据或代码有语法错误时返回 None
+    """
+    if not (Config.CODE_EXECUTION and question.get('test_cases') and report['syntax_ok']):
+        return None
+    return get_shared_sandbox().run_tests(report['code'], question['test_cases'])
+
+
+def static_evaluation(homework_content: str, questions: Optional[List[Dict]] = None) -> str:
+    """
+    只用本地静态分析（和运行测试）评分，不调用大模型
+
+    Args:
+        homework_content: 作业全文
+        questions: 按顺序排列的题目，每个元素可包含 'knowledge_point' 和 'test_cases'，可为空
+
+    Returns:
+        与 SYSTEM_PROMPT 输出格式一致的评分结果字符串
+    """
+    questions = questions or []
+    answers = split_questions(homework_content)
+    results = []
+    for index in range(max(len(answers), len(questions))):
+        answer = answers[index] if index < len(answers) else ''
+        question = questions[index] if index < len(questions) else {}
+        report = static_grader.analyze_code(answer, question.get('knowledge_point'))
+        result = {'index': index, 'knowledge_point': question.get('knowledge_point') or '未指定',
+                  'evaluation': '本地静态分析'}
+        result.update(static_grader.score_report(report, run_question_tests(report, question)))
+        results.append(result)
+    evaluation = PythonCodeGrader.combine_question_results(results)
+    if is_error_result(evaluation):
+        return evaluation
+    return evaluation + "\n评分方式：本地静态分析（未调用大模型）"
+
 
 class PythonCodeGrader:
     """Python程序自动判分助手"""
 
     #def __init__(self, homework_id, question_id):
-    def __init__(self):
+    def __init__(self, client: Optional[ProviderPool] = None, cache: Optional[EvaluationCache] = None):
+        self.last_batch_stats = None
         self.api_key = Config.MY_LLM_API_KEY
         self.api_url = Config.MY_LLM_API_URL
         self.model = Config.MODEL_NAME
-        self.headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
+        # 共享的服务池：长连接复用、退避重试、熔断，多个服务间故障切换和对冲请求
+        self.client = client or (get_shared_pool() if Config.IS_LLM_RUN else None)
+        # 评分结果缓存：相同的作业内容直接返回已有评分
+        self.cache = cache or (get_shared_cache() if Config.EVALUATION_CACHE_ENABLED else None)
 
         # 系统提示词 - 定义评分标准
         #self.system_prompt = Promptconfig.get_system_prompt(homework_id,question_id)
         self.system_prompt = Promptconfig.SYSTEM_PROMPT
 
+    def _chat(self, messages: List[Dict], max_retries: int, label: str, failure_prefix: str,
+              max_tokens: int = Config.MAX_OUTPUT_TOKENS) -> str:
+        """调用大模型，失败时返回以 failure_prefix 开头的错误信息"""
+        try:
+            return self.client.chat(
+                messages,
+                max_tokens=max_tokens,
+                max_retries=max_retries,
+                label=label
+            )
+        except LLMTimeoutError:
+            return f"{failure_prefix}请求超时，请稍后重试"
+        except CircuitOpenError as e:
+            return f"{failure_prefix}{str(e)}"
+        except LLMHTTPError as e:
+            return f"{failure_prefix}网络错误 - {str(e)}"
+        except LLMResponseError as e:
+            return f"{failure_prefix}API响应格式错误 - {str(e)}"
+        except LLMError as e:
+            return f"{failure_prefix}{str(e)}"
+        except Exception as e:
+            return f"{failure_prefix}未知错误 - {str(e)}"
+
+    def _answered_by_primary(self) -> bool:
+        """最近一次调用是否由主服务作答；备用服务的结果不写入以主模型为键的缓存"""
+        return self.client.answered_model() in (None, self.model)
+
+    def _chat_stream(self, messages: List[Dict], max_retries: int, label: str) -> Iterator[str]:
+        """流式调用大模型，失败时抛出 LLMError"""
+        return self.client.chat_stream(
+            messages,
+            max_tokens=Config.MAX_OUTPUT_TOKENS,
+            max_retries=max_retries,
+            label=label
+        )
+
+    @staticmethod
+    def _fit_homework(homework_content: str, budget: int) -> str:
+        """压缩作业内容到token预算之内，并打印压缩前后的token数"""
+        fitted = fit_to_budget(homework_content, budget)
+        before, after = count_tokens(homework_content), count_tokens(fitted)
+        if after < before:
+            print(f"✂️ 作业内容压缩：{before} → {after} tokens")
+        return fitted
+
     def evaluate_code(self, student_code: str, requirements: str, max_retries: int = 3) -> str:
         """
         评估Python代码
@@ -34,118 +162,134 @@ class PythonCodeGrader:
         Returns:
             评分结果字符串
         """
+        student_code = self._fit_homework(student_code, Config.PROMPT_TOKEN_BUDGET)
         user_prompt = f"""
         {requirements}
         {student_code}
         请根据评分标准进行客观评价。"""
 
-        data = {
-            "model": self.model,
-            "messages": [
-                {"role": "system", "content": self.system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            "temperature": Config.TEMPERATURE,
-            "max_tokens": 2000
-        }
-
-        for attempt in range(max_retries):
-            try:
-                print(f"🔍 正在评估代码 (尝试 {attempt + 1}/{max_retries})...")
-
-                response = requests.post(
-                    self.api_url,
-                    headers=self.headers,
-                    json=data,
-                    timeout=Config.TIMEOUT
-                )
-                response.raise_for_status()
-
-                result = response.json()
-                evaluation = result['choices'][0]['message']['content']
-
-                print("✅ LLM评估完成！")
-                return evaluation
-
-            except requests.exceptions.Timeout:
-                print(f"⏰ 请求超时，正在重试... ({attempt + 1}/{max_retries})")
-                if attempt < max_retries - 1:
-                    time.sleep(2)  # 等待2秒后重试
-                else:
-                    return "❌ 评分失败：请求超时，请稍后重试"
-
-            except requests.exceptions.RequestException as e:
-                return f"❌ 网络错误：{str(e)}"
-
-            except KeyError as e:
-                return f"❌ API响应格式错误：{str(e)}"
-
-            except Exception as e:
-                return f"❌ 未知错误：{str(e)}"
+        messages = [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+        evaluation = self._chat(messages, max_retries, "🔍 正在评估代码", "❌ 评分失败：")
+        if not is_error_result(evaluation):
+            print("✅ LLM评估完成！")
+        return evaluation
 
-        return "❌ 评分失败：达到最大重试次数"
-
-    def evaluate_code_2(self, homework_content: str, max_retries: int = 3) -> str:
+    def evaluate_code_2(self, homework_content: str, max_retries: int = 3, use_cache: bool = True) -> str:
         """
         评估Python代码
 
         Args:
-            student_code: 学生提交的代码
-            requirements: 题目要求
+            homework_content: 学生提交的作业全文
             max_retries: 最大重试次数
+            use_cache: 是否使用评分结果缓存
 
         Returns:
             评分结果字符串
         """
-        user_prompt = f"""
-        {homework_content}
-        请根据评分标准进行客观评价。"""
-
-        data = {
-            "model": self.model,
-            "messages": [
-                {"role": "system", "content": self.system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            "temperature": Config.TEMPERATURE,
-            "max_tokens": 2000
-        }
-
-        for attempt in range(max_retries):
-            try:
-                print(f"🔍 正在评估代码 (尝试 {attempt + 1}/{max_retries})...")
+        if not Config.IS_LLM_RUN:
+            return static_evaluation(homework_content)
+
+        homework_content = self._fit_homework(homework_content, Config.PROMPT_TOKEN_BUDGET)
+        messages = self._evaluation_messages(homework_content)
+        cache_key = None
+        if use_cache and self.cache:
+            cache_key = self._evaluation_cache_key(messages)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                print("⚡ 命中评分缓存")
+                return cached
+
+        evaluation = self._chat(messages, max_retries, "🔍 正在评估代码", "❌ 评分失败：")
+        if not is_error_result(evaluation):
+            print("✅ LLM评估完成！")
+            if cache_key and self._answered_by_primary():
+                self.cache.put(cache_key, evaluation)
+        return evaluation
+
+    def evaluate_code_2_stream(self, homework_content: str, max_retries: int = 3,
+                               use_cache: bool = True) -> Iterator[str]:
+        """
+        流式评估Python代码，评分结果边生成边产出
 
-                response = requests.post(
-                    self.api_url,
-                    headers=self.headers,
-                    json=data,
-                    timeout=Config.TIMEOUT
-                )
-                response.raise_for_status()
+        Args:
+            homework_content: 学生提交的作业全文
+            max_retries: 最大重试次数（仅在开始输出前重试）
+            use_cache: 是否使用评分结果缓存
 
-                result = response.json()
-                evaluation = result['choices'][0]['message']['content']
+        Returns:
+            评分结果文本片段的迭代器，命中缓存时一次性产出完整结果
 
-                print("✅ LLM评估完成！")
-                return evaluation
+        Raises:
+            LLMError: 大模型调用失败
+        """
+        if not Config.IS_LLM_RUN:
+            yield static_evaluation(homework_content)
+            return
+
+        homework_content = self._fit_homework(homework_content, Config.PROMPT_TOKEN_BUDGET)
+        messages = self._evaluation_messages(homework_content)
+        cache_key = None
+        if use_cache and self.cache:
+            cache_key = self._evaluation_cache_key(messages)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                print("⚡ 命中评分缓存")
+                yield cached
+                return
+
+        chunks = []
+        for delta in self._chat_stream(messages, max_retries, "🔍 正在流式评估代码"):
+            chunks.append(delta)
+            yield delta
+
+        print("✅ LLM评估完成！")
+        if cache_key and self._answered_by_primary():
+            self.cache.put(cache_key, ''.join(chunks))
+
+    def _evaluation_messages(self, homework_content: str) -> List[Dict]:
+        facts = static_facts(homework_content) if Config.STATIC_ANALYSIS else ""
+        user_prompt = f"""
+        {homework_content}
+        {facts}
+        请根据评分标准进行客观评价。"""
 
-            except requests.exceptions.Timeout:
-                print(f"⏰ 请求超时，正在重试... ({attempt + 1}/{max_retries})")
-                if attempt < max_retries - 1:
-                    time.sleep(2)  # 等待2秒后重试
-                else:
-                    return "❌ 评分失败：请求超时，请稍后重试"
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
 
-            except requests.exceptions.RequestException as e:
-                return f"❌ 网络错误：{str(e)}"
+    def _evaluation_cache_key(self, messages: List[Dict]) -> str:
+        """整份作业评分的缓存键，按实际发送的提示词（含静态分析结果）计算，开关静态分析或修改其措辞后不会命中旧结果"""
+        return make_cache_key(messages[1]['content'], messages[0]['content'], self.model, Config.TEMPERATURE)
 
-            except KeyError as e:
-                return f"❌ API响应格式错误：{str(e)}"
+    def extract_scores(self, evaluation: str, max_retries: int = 2) -> Optional[Dict]:
+        """
+        从评分结果中解析总分和各维度分，格式不符时请大模型重新整理一次
 
-            except Exception as e:
-                return f"❌ 未知错误：{str(e)}"
+        Args:
+            evaluation: 评分结果
+            max_retries: 重新整理时的最大重试次数
 
-        return "❌ 评分失败：达到最大重试次数"
+        Returns:
+            score_parser.parse_evaluation 的解析结果，仍无法解析时返回 None
+        """
+        parsed = parse_evaluation(evaluation)
+        if parsed is not None or not Config.IS_LLM_RUN or is_error_result(evaluation):
+            return parsed
+
+        print("⚠️ 评分结果格式不符，请大模型重新整理")
+        messages = [
+            {"role": "system", "content": Promptconfig.SCORE_REASK_PROMPT},
+            {"role": "user", "content": evaluation}
+        ]
+        reply = self._chat(messages, max_retries, "🔁 正在重新整理评分结果", "❌ 评分结果整理失败：")
+        if is_error_result(reply):
+            print(reply)
+            return None
+        return parse_json_evaluation(reply)
 
     #学习计划生成
     def generate_study_plan(self, homework_content: str, evaluation_result: str, max_retries: int = 3) -> str:
@@ -158,15 +302,38 @@ class PythonCodeGrader:
         Returns:
             学习计划字符串
         """
+        messages = self._study_plan_messages(homework_content, evaluation_result)
+        study_plan = self._chat(messages, max_retries, "📚 正在生成学习计划", "❌ 学习计划生成失败：")
+        if not is_error_result(study_plan):
+            print("✅ 学习计划生成完成！")
+        return study_plan
+
+    def generate_study_plan_stream(self, homework_content: str, evaluation_result: str,
+                                   max_retries: int = 3) -> Iterator[str]:
+        """
+        流式生成学习计划
+
+        Returns:
+            学习计划文本片段的迭代器
+
+        Raises:
+            LLMError: 大模型调用失败
+        """
+        messages = self._study_plan_messages(homework_content, evaluation_result)
+        yield from self._chat_stream(messages, max_retries, "📚 正在流式生成学习计划")
+        print("✅ 学习计划生成完成！")
+
+    @staticmethod
+    def _study_plan_messages(homework_content: str, evaluation_result: str) -> List[Dict]:
         # 学习计划专属Prompt（适配Python作业场景）
         user_prompt = f"""
         请基于以下Python作业内容和AI评分结果，为学生制定学习计划：
 
         【作业内容】
-        {homework_content[:1000]}  # 限制长度避免Prompt过长
+        {fit_to_budget(homework_content, Config.STUDY_PLAN_CONTENT_BUDGET)}
 
         【AI评分结果】
-        {evaluation_result[:10000]}  # 限制长度避免Prompt过长
+        {fit_text(evaluation_result, Config.STUDY_PLAN_EVALUATION_BUDGET)}
 
         【学习计划要求】
         1. 结构：包含「学习目标」「核心内容」「练习任务」「薄弱点弥补」4部分
@@ -175,78 +342,344 @@ class PythonCodeGrader:
         """
 
         # 复用LLM API调用逻辑，仅替换Prompt
-        data = {
-            "model": self.model,
-            "messages": [
-                {"role": "system", "content": "你是专业的Python编程学习规划师，擅长为学生制定可落地的学习计划。"},
-                {"role": "user", "content": user_prompt}
-            ],
-            "temperature": Config.TEMPERATURE,
-            "max_tokens": 2000
-        }
+        return [
+            {"role": "system", "content": "你是专业的Python编程学习规划师，擅长为学生制定可落地的学习计划。"},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    def _evaluate_question(self, system_prompt: str, requirement: str, answer: str,
+                           max_retries: int = 3, facts: str = "") -> str:
+        """评估单道题（带缓存），facts 为附加的静态分析结果"""
+        answer = fit_to_budget(answer, Config.QUESTION_TOKEN_BUDGET)
+        user_prompt = f"""
+        【题目要求】
+        {requirement}
+        【学生作答】
+        {answer}
+        {facts}
+        请根据评分标准进行客观评价。"""
 
-        for attempt in range(max_retries):
-            try:
-                print(f"📚 正在生成学习计划 (尝试 {attempt + 1}/{max_retries})...")
-                response = requests.post(
-                    self.api_url,
-                    headers=self.headers,
-                    json=data,
-                    timeout=Config.TIMEOUT
-                )
-                response.raise_for_status()
-                result = response.json()
-                study_plan = result['choices'][0]['message']['content']
-                print("✅ 学习计划生成完成！")
-                return study_plan
-
-            except requests.exceptions.Timeout:
-                print(f"⏰ 请求超时，正在重试... ({attempt + 1}/{max_retries})")
-                if attempt < max_retries - 1:
-                    time.sleep(2)
-                else:
-                    return "❌ 学习计划生成失败：请求超时，请稍后重试"
+        cache_key = None
+        if self.cache:
+            cache_key = make_cache_key(user_prompt, system_prompt, self.model, Config.TEMPERATURE)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+        evaluation = self._chat(messages, max_retries, "🔍 正在评估单题", "❌ 评分失败：")
+        if (cache_key and not is_error_result(evaluation) and parse_json_evaluation(evaluation)
+                and self._answered_by_primary()):
+            self.cache.put(cache_key, evaluation)
+        return evaluation
+
+    def iter_evaluate_by_questions(self, answers: List[str], questions: List[Dict],
+                                   max_in_flight: int = Config.MAX_CONCURRENT_REQUESTS,
+                                   max_retries: int = 3,
+                                   previous: Optional[Dict[int, Dict]] = None) -> Iterator[Dict]:
+        """
+        按题并发评分，每完成一题立即返回
 
-            except requests.exceptions.RequestException as e:
-                return f"❌ 学习计划生成失败：网络错误 - {str(e)}"
+        Args:
+            answers: 按顺序拆分出的各题作答
+            questions: 按顺序排列的题目，每个元素包含 'prompt' 和 'knowledge_point'，可包含 'test_cases'
+            max_in_flight: 同时在途的最大请求数
+            max_retries: 最大重试次数
+            previous: 上次提交的单题评分，题号 -> {'answer_hash', 'result'}；作答未变化的题目直接沿用，不再评分
 
-            except KeyError as e:
-                return f"❌ 学习计划生成失败：API响应格式错误 - {str(e)}"
+        Returns:
+            单题结果的迭代器，每个元素包含 index、knowledge_point、evaluation、total、sub_scores、
+            answer_hash，沿用上次评分的题目 reused 为 True
+        """
+        previous = previous or {}
+        count = max(len(answers), len(questions))
+        hashes = [question_answer_hash(answers[index] if index < len(answers) else '',
+                                       questions[index] if index < len(questions) else {})
+                  for index in range(count)]
+
+        pending = []
+        for index in range(count):
+            stored = previous.get(index)
+            if stored and stored['answer_hash'] == hashes[index]:
+                print(f"♻️ 第 {index + 1}/{count} 题作答未变化，沿用上次评分")
+                yield dict(stored['result'], index=index, answer_hash=hashes[index], reused=True)
+            else:
+                pending.append(index)
+        if not pending:
+            return
+
+        def grade_one(index):
+            answer = answers[index] if index < len(answers) else ''
+            question = questions[index] if index < len(questions) else {}
+            knowledge_point = question.get('knowledge_point') or '未指定'
+            result = {'index': index, 'knowledge_point': knowledge_point, 'total': None, 'sub_scores': {},
+                      'answer_hash': hashes[index], 'reused': False}
+
+            if not answer.strip():
+                result.update(evaluation="未找到该题的作答", total=0.0,
+                              sub_scores={name: 0.0 for name in SCORE_DIMENSIONS})
+                return result
+
+            report = static_grader.analyze_code(answer, question.get('knowledge_point'))
+            execution = run_question_tests(report, question)
+            if not Config.IS_LLM_RUN:
+                result.update(static_grader.score_report(report, execution), evaluation="本地静态分析")
+                return result
+
+            system_prompt = Promptconfig.build_question_prompt(knowledge_point)
+            facts = static_grader.format_facts(report) if Config.STATIC_ANALYSIS else ""
+            facts = "\n".join(part for part in (facts, format_execution_facts(execution)) if part)
+            evaluation = self._evaluate_question(system_prompt, question.get('prompt', ''), answer,
+                                                 max_retries, facts)
+            result['evaluation'] = evaluation
+            parsed = None if is_error_result(evaluation) else parse_json_evaluation(evaluation)
+            if parsed:
+                result.update(parsed)
+            return result
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_in_flight, len(pending)))) as executor:
+            futures = [executor.submit(grade_one, index) for index in pending]
+            for future in as_completed(futures):
+                result = future.result()
+                print(f"📝 第 {result['index'] + 1}/{count} 题评分完成")
+                yield result
+
+    def evaluate_by_questions(self, answers: List[str], questions: List[Dict],
+                              max_in_flight: int = Config.MAX_CONCURRENT_REQUESTS) -> str:
+        """
+        按题并发评分并汇总为整份作业的评分结果
 
-            except Exception as e:
-                return f"❌ 学习计划生成失败：未知错误 - {str(e)}"
+        Returns:
+            与 SYSTEM_PROMPT 输出格式一致的评分结果字符串，任一题评分失败时返回错误信息
+        """
+        results = sorted(self.iter_evaluate_by_questions(answers, questions, max_in_flight),
+                         key=lambda r: r['index'])
+        return self.combine_question_results(results)
+
+    @staticmethod
+    def combine_question_results(results: List[Dict]) -> str:
+        """把各题评分汇总：总分和各维度分取各题平均，评语按题列出"""
+        if not results:
+            return "❌ 评分失败：未找到可评分的题目"
+        for result in results:
+            if result['total'] is None:
+                reason = result.get('evaluation', '')
+                reason = reason.replace("❌ 评分失败：", "") if is_error_result(reason) else "大模型输出无法解析"
+                return f"❌ 评分失败：第{result['index'] + 1}题 - {reason}"
+
+        count = len(results)
+        total = sum(r['total'] for r in results) / count
+        lines = [
+            f"完成题目数量：{count}",
+            f"★★总分★★:{total:.1f}",
+            "★★详细评分★★"
+        ]
+        for name in SCORE_DIMENSIONS:
+            scores = [r['sub_scores'].get(name) for r in results if r['sub_scores'].get(name) is not None]
+            average = sum(scores) / len(scores) if scores else 0.0
+            lines.append(f'{name}:"{average:.1f}",')
+        for field in ("优点", "缺点", "建议"):
+            comments = "；".join(f"题目{r['index'] + 1}：{r[field]}" for r in results if r.get(field))
+            lines.append(f'{field}:"{comments}",')
+        lines[-1] = lines[-1].rstrip(',')
+
+        lines.append("")
+        lines.append("★★各题评分★★")
+        for r in results:
+            lines.append(f"题目{r['index'] + 1}（知识点：{r['knowledge_point']}）：{r['total']:.1f}分")
+        return "\n".join(lines)
+
+    def _pack(self, items: List[Tuple[str, str, int]]) -> List[List[Tuple[str, str, int]]]:
+        """把 (编号, 作业内容, token数) 按token上限和份数上限依次装入若干个合并请求"""
+        packs, current, used = [], [], 0
+        for item in items:
+            if current and (used + item[2] > Config.PACK_MAX_TOKENS or len(current) >= Config.PACK_MAX_SUBMISSIONS):
+                packs.append(current)
+                current, used = [], 0
+            current.append(item)
+            used += item[2]
+        if current:
+            packs.append(current)
+        return packs
+
+    def _evaluate_pack(self, pack: List[Tuple[str, str, int]], max_retries: int = 3) -> Dict[str, str]:
+        """
+        把多份作业合并到一次请求中评分，回复中缺失或无法解析的部分改为逐份单独评分
 
-        return "❌ 学习计划生成失败：达到最大重试次数"
-    def batch_evaluate(self, submissions: List[Dict]) -> Dict:
+        Returns:
+            {编号: 评分结果}
         """
-        批量评估多个代码提交
+        if len(pack) == 1:
+            return {pack[0][0]: self.evaluate_code_2(pack[0][1], max_retries)}
+
+        parts = []
+        for submission_id, content, _ in pack:
+            facts = static_facts(content) if Config.STATIC_ANALYSIS else ""
+            parts.append(f"===作业 {submission_id}===\n{content}\n{facts}\n===作业 {submission_id} 结束===")
+        messages = [
+            {"role": "system", "content": self.system_prompt + Promptconfig.PACKED_PROMPT_SUFFIX},
+            {"role": "user", "content": "\n\n".join(parts) + "\n请根据评分标准分别对每份作业进行客观评价。"}
+        ]
+        reply = self._chat(messages, max_retries, f"📦 正在合并评估 {len(pack)} 份作业", "❌ 评分失败：",
+                           max_tokens=Config.PACK_OUTPUT_TOKENS_PER_SUBMISSION * len(pack))
+        cacheable = self.cache is not None and self._answered_by_primary()
+
+        results = {}
+        if not is_error_result(reply):
+            for submission_id, evaluation in PACKED_RESULT.findall(reply):
+                evaluation = evaluation.strip()
+                if parse_evaluation(evaluation):
+                    results.setdefault(submission_id, evaluation)
+
+        for submission_id, content, _ in pack:
+            if submission_id in results:
+                if cacheable:
+                    # 与单独评分使用同一缓存键
+                    key = self._evaluation_cache_key(self._evaluation_messages(content))
+                    self.cache.put(key, results[submission_id])
+            else:
+                print(f"↩️ 合并评分中未解析出作业 {submission_id} 的结果，改为单独评分")
+                results[submission_id] = self.evaluate_code_2(content, max_retries)
+        return results
+
+    def iter_evaluate_packed(self, submissions: List[Dict],
+                             max_in_flight: int = Config.MAX_CONCURRENT_REQUESTS) -> Iterator[Tuple[str, str]]:
+        """
+        批量评估整份作业：短作业合并到同一请求中评分，省去重复的系统提示词和请求开销
 
         Args:
-            submissions: 提交列表，每个元素包含 'code' 和 'requirements'
+            submissions: 提交列表，每个元素包含 'id' 和 'content'（作业全文）
+            max_in_flight: 同时在途的最大请求数
 
         Returns:
-            评估结果字典
+            按完成顺序产出 (编号, 评分结果) 的迭代器，评分结果与 evaluate_code_2 的返回值一致
         """
-        results = {}
+        short, long = [], []
+        for submission in submissions:
+            submission_id = str(submission['id'])
+            if not Config.IS_LLM_RUN:
+                yield submission_id, static_evaluation(submission['content'])
+                continue
+            content = self._fit_homework(submission['content'], Config.PROMPT_TOKEN_BUDGET)
+            if self.cache:
+                cached = self.cache.get(self._evaluation_cache_key(self._evaluation_messages(content)))
+                if cached is not None:
+                    yield submission_id, cached
+                    continue
+            tokens = count_tokens(content)
+            if tokens <= Config.PACK_MAX_SUBMISSION_TOKENS:
+                short.append((submission_id, content, tokens))
+            else:
+                long.append((submission_id, content, tokens))
+
+        tasks = self._pack(short) + [[item] for item in long]
+        if not tasks:
+            return
+        print(f"📦 {len(short) + len(long)} 份作业合并为 {len(tasks)} 个请求")
+        with ThreadPoolExecutor(max_workers=max(1, min(max_in_flight, len(tasks)))) as executor:
+            futures = [executor.submit(self._evaluate_pack, pack) for pack in tasks]
+            for future in as_completed(futures):
+                yield from future.result().items()
+
+    def evaluate_packed(self, submissions: List[Dict],
+                        max_in_flight: int = Config.MAX_CONCURRENT_REQUESTS) -> Dict[str, str]:
+        """
+        批量评估整份作业（短作业合并请求）
 
-        for i, submission in enumerate(submissions, 1):
-            print(f"\n📝 正在评估第 {i}/{len(submissions)} 个提交...")
+        Returns:
+            {编号: 评分结果}，按提交顺序排列
+        """
+        results = dict(self.iter_evaluate_packed(submissions, max_in_flight))
+        return {str(s['id']): results[str(s['id'])] for s in submissions}
 
-            evaluation = self.evaluate_code(
-                submission['code'],
-                submission['requirements']
-            )
+    def iter_batch_evaluate(self, submissions: List[Dict],
+                            max_in_flight: int = Config.MAX_CONCURRENT_REQUESTS) -> Iterator[Tuple[str, Dict]]:
+        """
+        并发批量评估，每完成一个提交就立即返回其结果
 
-            results[f"submission_{i}"] = {
-                'code': submission['code'],
-                'requirements': submission['requirements'],
-                'evaluation': evaluation
+        Args:
+            submissions: 提交列表，每个元素包含 'code' 和 'requirements'
+            max_in_flight: 同时在途的最大请求数，实际请求速率另受共享限流器约束
+
+        Returns:
+            按完成顺序产出 (提交编号, 评估结果) 的迭代器
+        """
+        def evaluate_one(submission):
+            start = time.perf_counter()
+            evaluation = self.evaluate_code(submission['code'], submission['requirements'])
+            return evaluation, time.perf_counter() - start
+
+        total = len(submissions)
+        latencies = []
+        failed = 0
+        batch_start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=max(1, max_in_flight)) as executor:
+            futures = {
+                executor.submit(evaluate_one, submission): (i, submission)
+                for i, submission in enumerate(submissions, 1)
             }
+            for done, future in enumerate(as_completed(futures), 1):
+                i, submission = futures[future]
+                try:
+                    evaluation, latency = future.result()
+                except Exception as e:
+                    evaluation, latency = f"❌ 未知错误：{str(e)}", 0.0
+                latencies.append(latency)
+                if is_error_result(evaluation):
+                    failed += 1
+                print(f"📝 第 {i} 个提交评估完成 ({done}/{total})，耗时 {latency:.1f} 秒")
+
+                yield f"submission_{i}", {
+                    'code': submission['code'],
+                    'requirements': submission['requirements'],
+                    'evaluation': evaluation,
+                    'latency': latency
+                }
+
+        self.last_batch_stats = self._batch_stats(latencies, failed, time.perf_counter() - batch_start)
+
+    @staticmethod
+    def _batch_stats(latencies: List[float], failed: int, elapsed: float) -> Dict:
+        ordered = sorted(latencies)
+
+        def percentile(p):
+            if not ordered:
+                return 0.0
+            return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+        stats = {
+            'total': len(ordered),
+            'failed': failed,
+            'elapsed': elapsed,
+            'throughput_per_minute': len(ordered) / elapsed * 60 if elapsed > 0 else 0.0,
+            'latency_p50': percentile(50),
+            'latency_p95': percentile(95),
+            'latency_max': ordered[-1] if ordered else 0.0
+        }
+        print(f"📈 批量评估完成：共 {stats['total']} 个（失败 {failed} 个），总耗时 {elapsed:.1f} 秒，"
+              f"吞吐 {stats['throughput_per_minute']:.1f} 个/分钟，"
+              f"延迟 p50={stats['latency_p50']:.1f}s p95={stats['latency_p95']:.1f}s max={stats['latency_max']:.1f}s")
+        return stats
 
-            # 添加延迟避免API限制
-            time.sleep(1)
+    def batch_evaluate(self, submissions: List[Dict],
+                       max_in_flight: int = Config.MAX_CONCURRENT_REQUESTS) -> Dict:
+        """
+        批量评估多个代码提交
 
-        return results
+        Args:
+            submissions: 提交列表，每个元素包含 'code' 和 'requirements'
+            max_in_flight: 同时在途的最大请求数
+
+        Returns:
+            评估结果字典（吞吐量与延迟统计见 last_batch_stats）
+        """
+        results = dict(self.iter_batch_evaluate(submissions, max_in_flight))
+        # 保持与提交顺序一致
+        return {f"submission_{i}": results[f"submission_{i}"] for i in range(1, len(submissions) + 1)}
 
 def main():
     """主函数 - 演示使用方法"""
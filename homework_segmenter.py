@@ -0,0 +1,148 @@
+# homework_segmenter.py
+"""
+作业结构拆分与预检
+
+按 ##Begin/##End 标记和题目标题把作业拆分为各题，再把每道题拆分为题目内容、源代码、运行结果和小结，
+全部在本地按规则完成，不需要大模型解析作业结构。预检在评分前拒绝空白或结构不完整的作业，
+这类作业不会发起任何大模型请求。
+"""
+import ast
+import re
+from typing import Dict, List, Optional
+
+from homework_parser import BEGIN_MARK, END_MARK, QUESTION_HEADING, extract_homework_body, split_questions
+from prompt_budget import OUTPUT_HEADING
+from static_grader import extract_code
+
+# 各部分的段落标题，运行结果段落的标题与提示词预算中的规则一致
+CODE_HEADING = re.compile(r'^\s*(?:【)?(?:源代码|源程序|程序代码|代码)')
+SUMMARY_HEADING = re.compile(r'^\s*(?:【)?(?:小结|总结|心得)')
+_HEADING_TAIL = re.compile(r'^\s*[】\]]?\s*[：:]?\s*')
+
+SECTIONS = ('prompt', 'code', 'output', 'summary')
+
+
+def _heading_section(line: str):
+    """
+    判断一行是否为段落标题
+
+    Returns:
+        (部分名称, 标题之后同一行的内容)，不是段落标题时返回 (None, '')
+    """
+    for section, pattern in (('output', OUTPUT_HEADING), ('summary', SUMMARY_HEADING), ('code', CODE_HEADING)):
+        match = pattern.match(line)
+        if match:
+            rest = line[match.end():]
+            return section, rest[_HEADING_TAIL.match(rest).end():].rstrip()
+    return None, ''
+
+
+def segment_question(text: str) -> Dict:
+    """
+    把一道题的作答拆分为题目标题、题目内容、源代码、运行结果和小结
+
+    没有“源代码”标题时，题目标题之后第一行代码之前的说明文字作为题目内容，之后的部分作为源代码区域。
+
+    Args:
+        text: 单道题的作答（split_questions 的一个元素）
+
+    Returns:
+        {'title', 'prompt', 'code', 'output', 'summary', 'text'}，code 为去掉说明文字后的源代码
+    """
+    lines = text.split('\n')
+    title = ''
+    if lines and QUESTION_HEADING.match(lines[0]):
+        title = lines.pop(0).strip()
+
+    parts = {section: [] for section in SECTIONS}
+    section = 'prompt'
+    for line in lines:
+        heading, rest = _heading_section(line)
+        if heading:
+            section = heading
+            if rest:
+                parts[section].append(rest)
+            continue
+        if section == 'prompt' and extract_code(line):
+            section = 'code'
+        parts[section].append(line)
+
+    return {
+        'title': title,
+        'prompt': '\n'.join(parts['prompt']).strip(),
+        'code': extract_code('\n'.join(parts['code'])),
+        'output': '\n'.join(parts['output']).strip('\n'),
+        'summary': '\n'.join(parts['summary']).strip(),
+        'text': text
+    }
+
+
+def segment_homework(content: str) -> List[Dict]:
+    """
+    把作业拆分为各题的结构
+
+    Args:
+        content: 作业全文
+
+    Returns:
+        按题目顺序排列的 segment_question 结果，每个元素另有 'position'（题号，从0开始）；
+        各题的 'text' 与 split_questions 的结果一一对应
+    """
+    segments = []
+    for position, answer in enumerate(split_questions(content or '')):
+        segment = segment_question(answer)
+        segment['position'] = position
+        segments.append(segment)
+    return segments
+
+
+def is_code_statement(line: str) -> bool:
+    """
+    判断一行能否解析为有实际作用的Python语句
+
+    单独的变量名或常量、没有赋值的类型标注不算：中文句子、“Answer: 42”之类的说明文字也能解析成这些形式。
+    表达式语句只认函数调用（如 print(...)）。复合语句的首行（以冒号结尾）补上 pass 后解析。
+    """
+    line = line.strip()
+    if line.endswith(':'):
+        line += ' pass'
+    try:
+        module = ast.parse(line)
+    except (SyntaxError, ValueError):
+        return False
+    for node in module.body:
+        if isinstance(node, ast.Expr) and not isinstance(node.value, ast.Call):
+            continue
+        if isinstance(node, ast.AnnAssign) and node.value is None:
+            continue
+        return True
+    return False
+
+
+def preflight_check(content: Optional[str]) -> Optional[str]:
+    """
+    评分前的快速预检：作业为空、起止标记不完整或找不到任何代码时拒绝评分
+
+    代码识别（extract_code）会把形似代码的说明文字也保留下来，因此还要求其中至少有一行是有实际作用的语句；
+    代码中有语法错误的作业仍然通过预检，由评分指出错误。
+
+    Args:
+        content: 作业全文
+
+    Returns:
+        拒绝的原因，通过预检时返回 None
+    """
+    if not content or not content.strip():
+        return "作业内容为空"
+    begin = BEGIN_MARK.search(content)
+    if begin and not END_MARK.search(content, begin.end()):
+        return "有 ##Begin 开始标记但其后缺少 ##End 结束标记"
+    if not begin and END_MARK.search(content):
+        return "有 ##End 结束标记但缺少 ##Begin 开始标记"
+    body = extract_homework_body(content)
+    if not body.strip():
+        return "##Begin 与 ##End 之间没有作业内容"
+    code = extract_code(body)
+    if not code or not any(is_code_statement(line) for line in code.split('\n')):
+        return "作业中没有找到Python代码"
+    return None
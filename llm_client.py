@@ -0,0 +1,291 @@
+# llm_client.py
+import json
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterator, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import Config
+from rate_limiter import TokenBucketRateLimiter, estimate_tokens
+
+
+class LLMError(Exception):
+    """大模型调用失败"""
+
+
+class LLMTimeoutError(LLMError):
+    """请求超时（已用完重试次数）"""
+
+
+class LLMHTTPError(LLMError):
+    """接口返回错误状态码或网络异常"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class LLMResponseError(LLMError):
+    """接口响应格式不符合预期"""
+
+
+class CircuitOpenError(LLMError):
+    """熔断器打开，服务暂不可用，请求被直接拒绝"""
+
+
+# 需要重试的状态码：限流和服务端错误
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class CircuitBreaker:
+    """熔断器
+
+    连续失败达到阈值后打开，在 reset_timeout 秒内直接拒绝请求；
+    超时后进入半开状态，只放行一个试探请求，成功则关闭，失败则重新打开。
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = Config.CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout: float = Config.CIRCUIT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """检查是否允许发出请求，不允许时抛出 CircuitOpenError"""
+        with self._lock:
+            if self.state == self.OPEN:
+                remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+                if remaining > 0:
+                    raise CircuitOpenError(f"大模型服务暂不可用，{remaining:.0f} 秒后重试")
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN:
+                if self._probing:
+                    raise CircuitOpenError("大模型服务恢复检测中，请稍后重试")
+                self._probing = True
+
+    def is_open(self) -> bool:
+        """是否处于熔断期（只查询状态，不占用半开状态的试探名额）"""
+        with self._lock:
+            return self.state == self.OPEN and time.monotonic() - self._opened_at < self.reset_timeout
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    print(f"🔌 大模型服务连续失败 {self._failures} 次，熔断 {self.reset_timeout} 秒")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 响应头，支持秒数和HTTP日期两种格式"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMClient:
+    """OpenAI兼容的chat completions客户端
+
+    使用带连接池的 requests.Session 复用长连接，对超时、连接错误、429和5xx
+    做指数退避加随机抖动的重试，遵循 Retry-After，并通过熔断器在服务不可用时快速失败。
+    """
+
+    def __init__(self, api_url: str, api_key: str,
+                 rate_limiter: Optional[TokenBucketRateLimiter] = None,
+                 timeout: float = Config.TIMEOUT,
+                 pool_size: int = Config.HTTP_POOL_SIZE):
+        self.api_url = api_url
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.circuit_breaker = CircuitBreaker()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key}"
+        })
+
+    @staticmethod
+    def backoff_delay(attempt: int) -> float:
+        """第 attempt 次重试前的等待时间：指数退避 + 全抖动"""
+        cap = min(Config.LLM_BACKOFF_MAX, Config.LLM_BACKOFF_BASE * (2 ** attempt))
+        return random.uniform(0, cap)
+
+    def _post(self, data: Dict, estimated: int, max_retries: int, label: str,
+              stream: bool = False) -> requests.Response:
+        """发送请求并处理重试、退避、限流和熔断，返回状态码正常的响应"""
+        last_error = None
+        for attempt in range(max_retries):
+            self.circuit_breaker.allow()
+            if self.rate_limiter:
+                waited = self.rate_limiter.acquire(estimated)
+                if waited > 0.5:
+                    print(f"⏳ 触发限流，等待 {waited:.1f} 秒")
+
+            print(f"{label} (尝试 {attempt + 1}/{max_retries})...")
+            retry_after = None
+            try:
+                response = self.session.post(self.api_url, json=data, timeout=self.timeout, stream=stream)
+            except requests.exceptions.Timeout:
+                self.circuit_breaker.record_failure()
+                last_error = LLMTimeoutError("请求超时，请稍后重试")
+                print(f"⏰ 请求超时 ({attempt + 1}/{max_retries})")
+            except requests.exceptions.RequestException as e:
+                self.circuit_breaker.record_failure()
+                last_error = LLMHTTPError(str(e))
+                print(f"🌐 网络异常：{e} ({attempt + 1}/{max_retries})")
+            else:
+                if response.status_code in RETRYABLE_STATUS_CODES:
+                    # 429说明服务可用只是在限流，不计入熔断
+                    if response.status_code == 429:
+                        self.circuit_breaker.record_success()
+                    else:
+                        self.circuit_breaker.record_failure()
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                    last_error = LLMHTTPError(f"{response.status_code} {response.reason}", response.status_code)
+                    print(f"⚠️ 接口返回 {response.status_code} ({attempt + 1}/{max_retries})")
+                    response.close()
+                elif response.status_code >= 400:
+                    # 其他4xx属于请求本身的问题，服务是可用的
+                    self.circuit_breaker.record_success()
+                    message = f"{response.status_code} {response.reason}: {response.text[:200]}"
+                    response.close()
+                    raise LLMHTTPError(message, response.status_code)
+                else:
+                    self.circuit_breaker.record_success()
+                    return response
+
+            if attempt < max_retries - 1:
+                delay = retry_after if retry_after is not None else self.backoff_delay(attempt)
+                time.sleep(min(delay, Config.LLM_BACKOFF_MAX))
+
+        raise last_error or LLMError("达到最大重试次数")
+
+    def chat(self, messages: List[Dict], model: str, temperature: float,
+             max_tokens: int = 2000, max_retries: int = Config.LLM_MAX_RETRIES,
+             label: str = "🔍 正在调用大模型") -> str:
+        """
+        调用chat completions接口并返回回复文本
+
+        Args:
+            messages: 对话消息列表
+            model: 模型名称
+            temperature: 采样温度
+            max_tokens: 最大生成token数
+            max_retries: 最大尝试次数
+            label: 日志前缀
+
+        Returns:
+            模型回复内容
+
+        Raises:
+            LLMError: 重试耗尽或遇到不可重试的错误
+        """
+        data = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+        estimated = sum(estimate_tokens(m['content']) for m in messages) + max_tokens
+
+        response = self._post(data, estimated, max_retries, label)
+        try:
+            result = response.json()
+            content = result['choices'][0]['message']['content']
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            raise LLMResponseError(str(e))
+        usage = result.get('usage') or {}
+        if self.rate_limiter and 'total_tokens' in usage:
+            self.rate_limiter.reconcile(estimated, usage['total_tokens'])
+        return content
+
+    def chat_stream(self, messages: List[Dict], model: str, temperature: float,
+                    max_tokens: int = 2000, max_retries: int = Config.LLM_MAX_RETRIES,
+                    label: str = "🔍 正在调用大模型") -> Iterator[str]:
+        """
+        以流式方式（stream: true）调用chat completions接口，逐段产出回复文本
+
+        只在收到首个字节之前重试；开始输出后出现的错误直接抛出，避免重复输出。
+
+        Raises:
+            LLMError: 重试耗尽、遇到不可重试的错误或流式输出中断
+        """
+        data = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": True
+        }
+        estimated = sum(estimate_tokens(m['content']) for m in messages) + max_tokens
+
+        response = self._post(data, estimated, max_retries, label, stream=True)
+        with response:
+            try:
+                for raw_line in response.iter_lines():
+                    # 按UTF-8解码，服务端未声明字符集时 requests 会错误地按 ISO-8859-1 解码
+                    line = raw_line.decode('utf-8').strip()
+                    if not line.startswith('data:'):
+                        continue
+                    payload = line[5:].strip()
+                    if payload == '[DONE]':
+                        break
+                    try:
+                        chunk = json.loads(payload)
+                        delta = (chunk['choices'][0].get('delta') or {}).get('content')
+                    except (ValueError, KeyError, IndexError, TypeError) as e:
+                        raise LLMResponseError(str(e))
+                    if delta:
+                        yield delta
+            except requests.exceptions.RequestException as e:
+                self.circuit_breaker.record_failure()
+                raise LLMHTTPError(f"流式输出中断：{e}")
+
+
+_shared_clients = {}
+_shared_clients_lock = threading.Lock()
+
+
+def get_shared_client(api_url: str, api_key: str,
+                      rate_limiter: Optional[TokenBucketRateLimiter] = None) -> LLMClient:
+    """按接口地址和密钥返回进程内共享的客户端，使连接池和熔断状态在各判分器之间共享"""
+    key = (api_url, api_key)
+    with _shared_clients_lock:
+        client = _shared_clients.get(key)
+        if client is None:
+            client = LLMClient(api_url, api_key, rate_limiter=rate_limiter)
+            _shared_clients[key] = client
+        return client
@@ -0,0 +1,270 @@
+# mock_llm_server.py
+"""
+本地模拟的 OpenAI 兼容 chat completions 服务，用于在不消耗真实大模型额度的情况下测试和压测判分流程。
+
+支持可配置的延迟分布、错误率、周期性429限流、流式输出，以及录制/回放真实接口的响应。
+
+用法示例：
+    python mock_llm_server.py --port 8765 --latency lognormal:0.5,0.6 --error-rate 0.02 --burst-every 60 --burst-duration 5
+    python mock_llm_server.py --record recordings.jsonl --upstream https://api.longcat.chat/openai/v1/chat/completions
+    python mock_llm_server.py --replay recordings.jsonl
+然后把 Config.MY_LLM_API_URL 指向 http://127.0.0.1:8765/v1/chat/completions
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+import requests
+
+
+def parse_latency(spec: str):
+    """
+    解析延迟分布描述，返回采样函数（单位：秒）
+
+    支持 fixed:秒、uniform:最小,最大、normal:均值,标准差、lognormal:中位数,sigma
+    """
+    kind, _, args = spec.partition(':')
+    values = [float(v) for v in args.split(',')] if args else []
+    if kind == 'fixed':
+        return lambda: values[0]
+    if kind == 'uniform':
+        return lambda: random.uniform(values[0], values[1])
+    if kind == 'normal':
+        return lambda: max(0.0, random.gauss(values[0], values[1]))
+    if kind == 'lognormal':
+        median, sigma = values
+        return lambda: random.lognormvariate(0, sigma) * median
+    raise ValueError(f"不支持的延迟分布：{spec}")
+
+
+def request_key(body: Dict) -> str:
+    """录制/回放使用的请求键：模型名和消息内容的哈希"""
+    payload = json.dumps([body.get('model'), body.get('messages')], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def canned_reply(body: Dict) -> str:
+    """按请求内容生成确定性的模拟评分，格式与 Promptconfig 中约定的一致"""
+    messages = body.get('messages') or [{}]
+    system_prompt = messages[0].get('content', '')
+    seed = int(request_key(body)[:8], 16)
+    correctness = 35 + seed % 16
+    knowledge = 25 + seed % 11
+    readability = 6 + seed % 5
+    robustness = 2 + seed % 4
+    total = correctness + knowledge + readability + robustness
+
+    user_prompt = messages[-1].get('content', '')
+    packed_ids = re.findall(r'===作业 (\S+?)===', user_prompt)
+    if packed_ids:
+        # 合并评分：每份作业各自输出一段评分
+        blocks = []
+        for submission_id in packed_ids:
+            single = dict(body, messages=[{'role': 'system', 'content': ''},
+                                          {'role': 'user', 'content': submission_id}])
+            blocks.append(f"===评分 {submission_id}===\n{canned_reply(single)}\n===评分 {submission_id} 结束===")
+        return "\n".join(blocks)
+    if '学习规划师' in system_prompt:
+        return ("学习目标：巩固本次作业涉及的知识点\n核心内容：循环、分支与异常处理\n"
+                "练习任务：完成3道同类练习题\n薄弱点弥补：针对评分指出的问题逐条改进")
+    if 'JSON' in system_prompt:
+        return json.dumps({
+            "总分": total,
+            "详细评分": {"正确性": str(correctness), "知识点使用": str(knowledge),
+                      "可读性": str(readability), "健壮性": str(robustness)},
+            "优点": "功能实现完整", "缺点": "缺少边界处理", "建议": "补充异常处理"
+        }, ensure_ascii=False)
+    return (f"完成题目数量：{1 + seed % 4}\n★★总分★★:{total}\n★★详细评分★★\n"
+            f"正确性:\"{correctness}\"\n知识点使用:\"{knowledge}\",\n可读性:\"{readability}\",\n"
+            f"健壮性:\"{robustness}\",\n优点:\"功能实现完整\",\n缺点:\"缺少边界处理\",\n建议:\"补充异常处理\"")
+
+
+class MockLLMServer:
+    """可在进程内启动的模拟大模型服务"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: str = 'fixed:0',
+                 error_rate: float = 0.0, burst_every: float = 0.0, burst_duration: float = 0.0,
+                 stream_chunk_delay: float = 0.02, record_path: Optional[str] = None,
+                 replay_path: Optional[str] = None, upstream_url: Optional[str] = None,
+                 upstream_key: Optional[str] = None):
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.burst_every = burst_every
+        self.burst_duration = burst_duration
+        self.stream_chunk_delay = stream_chunk_delay
+        self.record_path = record_path
+        self.upstream_url = upstream_url
+        self.upstream_key = upstream_key
+        self.recordings = {}
+        self.request_count = 0
+        self._lock = threading.Lock()
+        self._started_at = time.monotonic()
+
+        if replay_path:
+            with open(replay_path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        item = json.loads(line)
+                        self.recordings[item['key']] = item['content']
+        if record_path and not upstream_url:
+            raise ValueError("录制模式需要指定上游接口地址")
+
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1/chat/completions"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def in_burst(self) -> bool:
+        """当前是否处于429限流窗口"""
+        if self.burst_every <= 0:
+            return False
+        return (time.monotonic() - self._started_at) % self.burst_every < self.burst_duration
+
+    def reply_for(self, body: Dict) -> str:
+        key = request_key(body)
+        if key in self.recordings:
+            return self.recordings[key]
+        if self.record_path:
+            response = requests.post(
+                self.upstream_url,
+                headers={"Authorization": f"Bearer {self.upstream_key}"},
+                json=dict(body, stream=False),
+                timeout=120
+            )
+            response.raise_for_status()
+            content = response.json()['choices'][0]['message']['content']
+            with self._lock:
+                self.recordings[key] = content
+                with open(self.record_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({'key': key, 'content': content}, ensure_ascii=False) + '\n')
+            return content
+        return canned_reply(body)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, payload: Dict, headers: Optional[Dict] = None):
+                data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = json.loads(self.rfile.read(length) or b'{}')
+                with server._lock:
+                    server.request_count += 1
+
+                if not self.path.rstrip('/').endswith('chat/completions'):
+                    self._send_json(404, {'error': {'message': 'not found'}})
+                    return
+                if server.in_burst():
+                    self._send_json(429, {'error': {'message': 'rate limited'}}, {'Retry-After': '1'})
+                    return
+
+                time.sleep(server.sample_latency())
+                if random.random() < server.error_rate:
+                    self._send_json(500, {'error': {'message': 'mock internal error'}})
+                    return
+
+                try:
+                    content = server.reply_for(body)
+                except Exception as e:
+                    self._send_json(502, {'error': {'message': f'upstream error: {e}'}})
+                    return
+
+                prompt_tokens = sum(len(m.get('content', '')) for m in body.get('messages', [])) // 2
+                usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': len(content) // 2,
+                         'total_tokens': prompt_tokens + len(content) // 2}
+                if body.get('stream'):
+                    self._send_stream(body, content)
+                else:
+                    self._send_json(200, {
+                        'id': 'mock-' + request_key(body)[:12],
+                        'object': 'chat.completion',
+                        'model': body.get('model'),
+                        'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content},
+                                     'finish_reason': 'stop'}],
+                        'usage': usage
+                    })
+
+            def _send_stream(self, body: Dict, content: str):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+                self.send_header('Cache-Control', 'no-cache')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                self.close_connection = True
+                for i in range(0, len(content), 8):
+                    chunk = {'choices': [{'index': 0, 'delta': {'content': content[i:i + 8]}}],
+                             'model': body.get('model')}
+                    self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+                    time.sleep(server.stream_chunk_delay)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟大模型服务")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', default='lognormal:0.5,0.5',
+                        help="延迟分布：fixed:秒 / uniform:a,b / normal:均值,标准差 / lognormal:中位数,sigma")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="返回500的概率")
+    parser.add_argument('--burst-every', type=float, default=0.0, help="每隔多少秒出现一次429限流窗口")
+    parser.add_argument('--burst-duration', type=float, default=0.0, help="每次429限流窗口持续秒数")
+    parser.add_argument('--stream-chunk-delay', type=float, default=0.02, help="流式输出每段之间的间隔秒数")
+    parser.add_argument('--record', help="录制模式：把上游真实响应写入该文件")
+    parser.add_argument('--replay', help="回放模式：从该文件读取录制的响应")
+    parser.add_argument('--upstream', help="录制模式下转发到的真实接口地址")
+    parser.add_argument('--upstream-key', default=os.getenv('MY_LONGCAT_API_KEY') or os.getenv('MY_DEEPSEEK_API_KEY'))
+    args = parser.parse_args()
+
+    server = MockLLMServer(
+        host=args.host, port=args.port, latency=args.latency, error_rate=args.error_rate,
+        burst_every=args.burst_every, burst_duration=args.burst_duration,
+        stream_chunk_delay=args.stream_chunk_delay, record_path=args.record,
+        replay_path=args.replay, upstream_url=args.upstream, upstream_key=args.upstream_key
+    )
+    print(f"🤖 模拟大模型服务已启动：{server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+# prompt_budget.py
+"""
+提示词token预算
+
+在本地统计token数，压缩作业文本（去掉多余空白、折叠运行结果中重复的行），超出预算时优先截断运行结果，
+尽量保留源代码，使每次请求都落在配置的token预算之内。
+"""
+import re
+from typing import List, Tuple
+
+from evaluation_cache import normalize_homework_text
+from homework_parser import QUESTION_HEADING
+from rate_limiter import estimate_tokens
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding('cl100k_base')
+except Exception:
+    # 未安装 tiktoken 或编码表无法加载时使用粗略估算
+    _encoding = None
+
+# 运行结果段落的开头，例如“运行结果”“输出结果：”“运行截图”
+OUTPUT_HEADING = re.compile(r'^\s*(?:【)?(?:运行结果|输出结果|运行截图|程序输出|运行输出)')
+# 运行结果段落之后的其他段落：小结、源代码、下一道题或作业结束标记
+SECTION_HEADING = re.compile(r'^\s*(?:(?:【)?(?:小结|总结|心得|源代码|源程序|程序代码|代码)|##\s*End)', re.IGNORECASE)
+
+TRUNCATED_MARK = "……（以下省略{}行）"
+REPEATED_MARK = "……（上一行重复{}次）"
+
+
+def count_tokens(text: str) -> int:
+    """统计文本的token数，安装了 tiktoken 时精确计数，否则按字符估算"""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return estimate_tokens(text)
+
+
+def _collapse_repeated_lines(lines: List[str]) -> List[str]:
+    """连续重复3次以上的相同行只保留一行并注明重复次数，只用于运行结果，源代码中的重复行（如多个 pass）必须原样保留"""
+    result = []
+    i = 0
+    while i < len(lines):
+        j = i
+        while j + 1 < len(lines) and lines[j + 1] == lines[i]:
+            j += 1
+        result.append(lines[i])
+        repeats = j - i
+        if repeats >= 2 and lines[i].strip():
+            result.append(REPEATED_MARK.format(repeats))
+        elif repeats:
+            result.extend(lines[i + 1:j + 1])
+        i = j + 1
+    return result
+
+
+def _split_sections(lines: List[str]) -> List[Tuple[bool, List[str]]]:
+    """把作业按行划分为 (是否运行结果, 行列表) 的段落序列"""
+    sections = []
+    is_output = False
+    for line in lines:
+        if OUTPUT_HEADING.match(line):
+            is_output = True
+            sections.append((True, [line]))
+            continue
+        if is_output and (SECTION_HEADING.match(line) or QUESTION_HEADING.match(line)):
+            is_output = False
+            sections.append((False, [line]))
+            continue
+        if not sections or sections[-1][0] != is_output:
+            sections.append((is_output, []))
+        sections[-1][1].append(line)
+    return sections
+
+
+def _join_sections(sections: List[Tuple[bool, List[str]]]) -> str:
+    return '\n'.join(line for _, lines in sections for line in lines)
+
+
+def compact_homework(content: str) -> str:
+    """
+    压缩作业文本：统一空白、合并空行，折叠运行结果中连续重复的行，并去掉与前面完全相同的运行结果段落；源代码不做改动
+
+    Args:
+        content: 作业全文
+
+    Returns:
+        压缩后的作业文本
+    """
+    sections = []
+    seen_outputs = set()
+    for is_output, section_lines in _split_sections(normalize_homework_text(content).split('\n')):
+        if is_output:
+            section_lines = section_lines[:1] + _collapse_repeated_lines(section_lines[1:])
+            body = '\n'.join(section_lines[1:]).strip()
+            if body and body in seen_outputs:
+                section_lines = [section_lines[0], "（与前面的运行结果相同）"]
+            elif body:
+                seen_outputs.add(body)
+        sections.append((is_output, section_lines))
+    return _join_sections(sections)
+
+
+def _truncate_lines(lines: List[str], keep: int) -> List[str]:
+    if len(lines) <= keep:
+        return lines
+    return lines[:keep] + [TRUNCATED_MARK.format(len(lines) - keep)]
+
+
+def fit_to_budget(content: str, budget: int) -> str:
+    """
+    把作业文本压缩到token预算之内
+
+    先做无损压缩；仍超出预算时逐步缩短各运行结果段落；再不够时从末尾按整行截断，不会把一行代码切断。
+
+    Args:
+        content: 作业全文
+        budget: token预算，不大于0表示不限制
+
+    Returns:
+        符合预算的作业文本
+    """
+    text = compact_homework(content)
+    if budget <= 0 or count_tokens(text) <= budget:
+        return text
+
+    # 运行结果段落依次只保留前 8、4、1 行
+    original = _split_sections(text.split('\n'))
+    for keep in (8, 4, 1):
+        sections = [(is_output, _truncate_lines(lines, keep + 1) if is_output else lines)
+                    for is_output, lines in original]
+        text = _join_sections(sections)
+        if count_tokens(text) <= budget:
+            return text
+
+    # 仍然超出：保留开头的整行，直到用完预算
+    return _keep_leading_lines(text.split('\n'), budget)
+
+
+def _keep_leading_lines(lines: List[str], budget: int) -> str:
+    kept, used = [], 0
+    for line in lines:
+        cost = count_tokens(line + '\n')
+        if used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    if len(kept) < len(lines):
+        kept.append(TRUNCATED_MARK.format(len(lines) - len(kept)))
+    return '\n'.join(kept)
+
+
+def fit_text(text: str, budget: int) -> str:
+    """按整行截断普通文本（如评分结果）到token预算之内"""
+    text = normalize_homework_text(text or '')
+    if budget <= 0 or count_tokens(text) <= budget:
+        return text
+    return _keep_leading_lines(text.split('\n'), budget)
@@ -0,0 +1,268 @@
+# provider_pool.py
+"""
+多大模型服务的故障切换与对冲请求
+
+按优先级排列多个OpenAI兼容的服务，各自记录健康状况（熔断状态、最近的延迟分布）。
+主服务失败时自动切换到备用服务；开启对冲后，主服务超过其p95延迟仍未返回时，
+再向备用服务发出同样的请求，采用先返回的结果，降低服务变慢时的尾延迟。
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterator, List, Optional
+
+from config import Config
+from llm_client import LLMError, get_shared_client
+from rate_limiter import TokenBucketRateLimiter
+
+
+class Provider:
+    """一个大模型服务及其健康状况"""
+
+    def __init__(self, name: str, api_url: str, api_key: str, model: str, temperature: float,
+                 requests_per_minute: int = Config.REQUESTS_PER_MINUTE,
+                 tokens_per_minute: int = Config.TOKENS_PER_MINUTE):
+        self.name = name
+        self.model = model
+        self.temperature = temperature
+        # 每个服务的限额独立计算
+        self.rate_limiter = TokenBucketRateLimiter(requests_per_minute, tokens_per_minute)
+        self.client = get_shared_client(api_url, api_key, rate_limiter=self.rate_limiter)
+        self.latencies = deque(maxlen=100)
+        self.successes = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        return not self.client.circuit_breaker.is_open()
+
+    def latency_p95(self) -> Optional[float]:
+        """最近成功请求的p95延迟，样本不足时返回 None"""
+        with self._lock:
+            if len(self.latencies) < Config.HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+
+    def hedge_delay(self) -> float:
+        """向备用服务发出对冲请求前等待的秒数"""
+        p95 = self.latency_p95()
+        delay = Config.HEDGE_DEFAULT_DELAY if p95 is None else p95
+        return max(Config.HEDGE_MIN_DELAY, delay)
+
+    def _record(self, ok: bool, latency: Optional[float] = None):
+        with self._lock:
+            if ok:
+                self.successes += 1
+                if latency is not None:
+                    self.latencies.append(latency)
+            else:
+                self.failures += 1
+
+    def chat(self, messages: List[Dict], max_tokens: int, max_retries: int, label: str) -> str:
+        start = time.perf_counter()
+        try:
+            content = self.client.chat(messages, model=self.model, temperature=self.temperature,
+                                       max_tokens=max_tokens, max_retries=max_retries,
+                                       label=f"{label}[{self.name}]")
+        except LLMError:
+            self._record(False)
+            raise
+        self._record(True, time.perf_counter() - start)
+        return content
+
+    def chat_stream(self, messages: List[Dict], max_tokens: int, max_retries: int, label: str) -> Iterator[str]:
+        try:
+            yield from self.client.chat_stream(messages, model=self.model, temperature=self.temperature,
+                                               max_tokens=max_tokens, max_retries=max_retries,
+                                               label=f"{label}[{self.name}]")
+        except LLMError:
+            self._record(False)
+            raise
+        # 流式请求的总耗时取决于输出长度，不计入对冲用的延迟分布
+        self._record(True)
+
+    def stats(self) -> Dict:
+        return {
+            'name': self.name,
+            'available': self.available(),
+            'successes': self.successes,
+            'failures': self.failures,
+            'latency_p95': self.latency_p95()
+        }
+
+
+class ProviderPool:
+    """按优先级使用多个大模型服务"""
+
+    def __init__(self, providers: List[Provider], hedge: bool = Config.HEDGE_REQUESTS,
+                 max_workers: int = Config.MAX_CONCURRENT_REQUESTS * 2):
+        if not providers:
+            raise ValueError("❌ 未配置可用的大模型服务")
+        self.providers = providers
+        self.hedge = hedge
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm-hedge')
+        self._local = threading.local()
+
+    def answered_model(self) -> Optional[str]:
+        """当前线程最近一次成功调用实际作答的模型，用于区分主服务和备用服务的结果"""
+        return getattr(self._local, 'model', None)
+
+    def _answered(self, provider: Provider):
+        self._local.model = provider.model
+
+    def _ordered(self) -> List[Provider]:
+        """可用的服务按优先级排在前面，熔断中的服务排在最后（全部熔断时仍会尝试）"""
+        return [p for p in self.providers if p.available()] + [p for p in self.providers if not p.available()]
+
+    def _retries_for(self, index: int, count: int, max_retries: int) -> int:
+        # 后面还有备用服务时少重试几次，尽快切换
+        return max_retries if index == count - 1 else min(max_retries, Config.FAILOVER_MAX_RETRIES)
+
+    def chat(self, messages: List[Dict], max_tokens: int = Config.MAX_OUTPUT_TOKENS,
+             max_retries: int = Config.LLM_MAX_RETRIES, label: str = "🔍 正在调用大模型",
+             hedge_slot: Optional[Callable[[], Optional[Callable[[], None]]]] = None) -> str:
+        """
+        调用大模型并返回回复文本，失败时按优先级切换服务
+
+        Args:
+            hedge_slot: 发出对冲请求前调用，占用一个并发名额并返回释放函数；没有空闲名额时返回 None，不发出对冲请求
+
+        Raises:
+            LLMError: 所有服务都调用失败
+        """
+        self._local.model = None
+        providers = self._ordered()
+        if self.hedge and len(providers) > 1:
+            return self._hedged_chat(providers, messages, max_tokens, max_retries, label, hedge_slot)
+        return self._failover_chat(providers, messages, max_tokens, max_retries, label)
+
+    def _failover_chat(self, providers: List[Provider], messages: List[Dict], max_tokens: int,
+                       max_retries: int, label: str) -> str:
+        last_error = None
+        for index, provider in enumerate(providers):
+            if last_error is not None:
+                print(f"🔀 切换到备用大模型服务 {provider.name}")
+            try:
+                content = provider.chat(messages, max_tokens,
+                                        self._retries_for(index, len(providers), max_retries), label)
+            except LLMError as e:
+                print(f"⚠️ 大模型服务 {provider.name} 调用失败：{e}")
+                last_error = e
+                continue
+            self._answered(provider)
+            return content
+        raise last_error or LLMError("没有可用的大模型服务")
+
+    @staticmethod
+    def _released(release: Callable[[], None], call: Callable, *args) -> str:
+        """对冲请求结束后（包括主服务先返回之后在后台完成的情况）释放其占用的并发名额"""
+        try:
+            return call(*args)
+        finally:
+            release()
+
+    def _hedged_chat(self, providers: List[Provider], messages: List[Dict], max_tokens: int,
+                     max_retries: int, label: str,
+                     hedge_slot: Optional[Callable[[], Optional[Callable[[], None]]]] = None) -> str:
+        primary, backup = providers[0], providers[1]
+        retries = min(max_retries, Config.FAILOVER_MAX_RETRIES)
+        futures = {self._executor.submit(primary.chat, messages, max_tokens, retries, label): primary}
+
+        delay = primary.hedge_delay()
+        done, _ = wait(futures, timeout=delay)
+        if not done:
+            # 对冲请求同样计入调用方的并发上限，名额已满时只等待主服务
+            release = hedge_slot() if hedge_slot else (lambda: None)
+            if release is None:
+                print(f"⏳ {primary.name} 超过 {delay:.1f} 秒未返回，但并发名额已满，不发出对冲请求")
+            else:
+                print(f"🪂 {primary.name} 超过 {delay:.1f} 秒未返回，向 {backup.name} 发出对冲请求")
+                futures[self._executor.submit(self._released, release, backup.chat,
+                                              messages, max_tokens, retries, label)] = backup
+
+        pending = set(futures)
+        last_error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    content = future.result()
+                except LLMError as e:
+                    print(f"⚠️ 大模型服务 {futures[future].name} 调用失败：{e}")
+                    last_error = e
+                    continue
+                # 较慢的请求继续在后台完成，其结果只用于更新健康状况
+                self._answered(futures[future])
+                return content
+
+        # 已发出的请求都失败了，剩下的服务依次切换
+        remaining = [p for p in providers if p not in futures.values()]
+        if remaining:
+            return self._failover_chat(remaining, messages, max_tokens, max_retries, label)
+        raise last_error or LLMError("没有可用的大模型服务")
+
+    def chat_stream(self, messages: List[Dict], max_tokens: int = Config.MAX_OUTPUT_TOKENS,
+                    max_retries: int = Config.LLM_MAX_RETRIES,
+                    label: str = "🔍 正在调用大模型") -> Iterator[str]:
+        """
+        流式调用大模型，在开始输出前失败时切换服务（流式请求不做对冲）
+
+        Raises:
+            LLMError: 所有服务都调用失败，或开始输出后中断
+        """
+        self._local.model = None
+        providers = self._ordered()
+        last_error = None
+        for index, provider in enumerate(providers):
+            if last_error is not None:
+                print(f"🔀 切换到备用大模型服务 {provider.name}")
+            stream = provider.chat_stream(messages, max_tokens,
+                                          self._retries_for(index, len(providers), max_retries), label)
+            try:
+                first = next(stream)
+            except StopIteration:
+                return
+            except LLMError as e:
+                print(f"⚠️ 大模型服务 {provider.name} 调用失败：{e}")
+                last_error = e
+                continue
+            self._answered(provider)
+            yield first
+            yield from stream
+            return
+        raise last_error or LLMError("没有可用的大模型服务")
+
+    def stats(self) -> List[Dict]:
+        return [provider.stats() for provider in self.providers]
+
+
+def configured_providers() -> List[Provider]:
+    """主服务（Config.MY_LLM_API_URL 等）加上配置了密钥的备用服务"""
+    specs = [{'name': Config.MODEL_NAME, 'api_url': Config.MY_LLM_API_URL, 'api_key': Config.MY_LLM_API_KEY,
+              'model': Config.MODEL_NAME, 'temperature': Config.TEMPERATURE}]
+    specs += Config.BACKUP_PROVIDERS
+    providers = []
+    for spec in specs:
+        if not spec.get('api_url') or not spec.get('api_key'):
+            continue
+        providers.append(Provider(
+            spec['name'], spec['api_url'], spec['api_key'], spec['model'], spec.get('temperature', Config.TEMPERATURE),
+            spec.get('requests_per_minute', Config.REQUESTS_PER_MINUTE),
+            spec.get('tokens_per_minute', Config.TOKENS_PER_MINUTE)
+        ))
+    return providers
+
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_shared_pool() -> ProviderPool:
+    """返回进程内共享的服务池，健康状况和连接池在各判分器之间共享"""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = ProviderPool(configured_providers())
+        return _shared_pool
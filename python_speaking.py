@@ -8,10 +8,12 @@ import pyttsx3
 import datetime
 
 class VoiceAssistant:
-    def __init__(self):
+    def __init__(self, rate=150, volume=0.9, voice=None):
         self.engine = pyttsx3.init()
-        self.engine.setProperty('rate', 150)
-        self.engine.setProperty('volume', 0.9)
+        self.engine.setProperty('rate', rate)
+        self.engine.setProperty('volume', volume)
+        if voice:
+            self.engine.setProperty('voice', voice)
     
     def speak(self, text):
         print(f"助手: {text}")
@@ -0,0 +1,68 @@
+# rate_limiter.py
+import threading
+import time
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本的token数：中文字符约1个token，其他字符约4个字符1个token"""
+    if not text:
+        return 0
+    cjk = sum(1 for ch in text if '一' <= ch <= '鿿')
+    return cjk + (len(text) - cjk) // 4 + 1
+
+
+class TokenBucketRateLimiter:
+    """按每分钟请求数(RPM)和每分钟token数(TPM)限流的令牌桶
+
+    两个桶的容量等于每分钟限额，按秒匀速补充。请求前按估算的token数扣减，
+    拿到真实用量后可调用 reconcile 修正，多线程共享一个实例即可实现进程内限流。
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.rpm = requests_per_minute
+        self.tpm = tokens_per_minute
+        self._request_tokens = float(requests_per_minute)
+        self._llm_tokens = float(tokens_per_minute)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._request_tokens = min(self.rpm, self._request_tokens + elapsed * self.rpm / 60)
+        self._llm_tokens = min(self.tpm, self._llm_tokens + elapsed * self.tpm / 60)
+
+    def acquire(self, tokens: int = 0) -> float:
+        """
+        阻塞直到同时拿到1个请求配额和指定数量的token配额
+
+        Args:
+            tokens: 本次请求预计消耗的token数
+
+        Returns:
+            等待的秒数
+        """
+        # 单次请求超过桶容量时按容量计算，避免永远等待
+        tokens = min(tokens, self.tpm)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._request_tokens >= 1 and self._llm_tokens >= tokens:
+                    self._request_tokens -= 1
+                    self._llm_tokens -= tokens
+                    return waited
+                wait = max(
+                    (1 - self._request_tokens) * 60 / self.rpm,
+                    (tokens - self._llm_tokens) * 60 / self.tpm,
+                    0.01
+                )
+            time.sleep(wait)
+            waited += wait
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: int):
+        """用接口返回的真实token用量修正预扣的配额"""
+        with self._lock:
+            self._refill()
+            self._llm_tokens = min(self.tpm, self._llm_tokens + estimated_tokens - actual_tokens)
@@ -0,0 +1,132 @@
+# score_parser.py
+"""
+评分结果解析
+
+按 Promptconfig 约定的两种输出格式（整份作业的markdown格式、单题的JSON格式）一次性解析出总分、
+四个维度分、完成题目数量和评语，不再在整段文本里猜第一个“xx分”。
+"""
+import json
+import re
+from typing import Dict, Optional
+
+# 四个评分维度及满分
+SCORE_DIMENSIONS = {"正确性": 50, "知识点使用": 35, "可读性": 10, "健壮性": 5}
+# 维度名到 Submission 列名
+SCORE_COLUMNS = {
+    "正确性": 'score_correctness',
+    "知识点使用": 'score_knowledge',
+    "可读性": 'score_readability',
+    "健壮性": 'score_robustness'
+}
+COMMENT_FIELDS = ("优点", "缺点", "建议")
+
+_NUMBER = r'-?\d+(?:\.\d+)?'
+
+# markdown格式每行一个字段：“标签:值”，值两侧可能有引号和逗号
+_MARKDOWN_LINE = re.compile(
+    r'^\s*(?P<label>完成题目数量|★★总分★★|' + '|'.join(list(SCORE_DIMENSIONS) + list(COMMENT_FIELDS)) +
+    r')\s*[:：]\s*(?P<value>.*?)\s*$'
+)
+
+
+def _to_score(value) -> Optional[float]:
+    match = re.search(_NUMBER, str(value))
+    return float(match.group()) if match else None
+
+
+def _strip_value(value: str) -> str:
+    return value.strip().rstrip(',，').strip().strip('"“”').strip()
+
+
+def _valid(total: Optional[float], sub_scores: Dict) -> bool:
+    """分数必须在各自的满分范围内"""
+    if total is None or not 0 <= total <= 100:
+        return False
+    return all(score is None or 0 <= score <= SCORE_DIMENSIONS[name] for name, score in sub_scores.items())
+
+
+def parse_json_evaluation(text: str) -> Optional[Dict]:
+    """
+    解析单题评分（Promptconfig.SYSTEM_PROMPT2 约定的JSON格式）
+
+    Returns:
+        {'total': 总分, 'sub_scores': {维度: 分数}, 'question_count': 完成题目数量（可能为None）,
+         '优点': ..., '缺点': ..., '建议': ...}，无法解析时返回 None
+    """
+    start, end = text.find('{'), text.rfind('}')
+    if start < 0 or end <= start:
+        return None
+    try:
+        data = json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+
+    details = data.get("详细评分") or {}
+    if not isinstance(details, dict):
+        return None
+    sub_scores = {name: _to_score(details.get(name)) for name in SCORE_DIMENSIONS}
+    total = _to_score(data.get("总分"))
+    if total is None:
+        if any(score is None for score in sub_scores.values()):
+            return None
+        total = sum(sub_scores.values())
+    if not _valid(total, sub_scores):
+        return None
+    count = _to_score(data.get("完成题目数量", ""))
+    return {
+        'total': total,
+        'sub_scores': sub_scores,
+        'question_count': int(count) if count is not None and count >= 0 else None,
+        '优点': str(data.get("优点", "")),
+        '缺点': str(data.get("缺点", "")),
+        '建议': str(data.get("建议", ""))
+    }
+
+
+def parse_markdown_evaluation(text: str) -> Optional[Dict]:
+    """
+    解析整份作业评分（Promptconfig.SYSTEM_PROMPT 约定的markdown格式）
+
+    只认行首的字段标签，各字段取第一次出现的值，“★★各题评分★★”等附加内容不参与解析。
+
+    Returns:
+        {'total', 'sub_scores', 'question_count', '优点', '缺点', '建议'}，缺少总分且维度分不全时返回 None
+    """
+    fields = {}
+    for line in text.split('\n'):
+        match = _MARKDOWN_LINE.match(line)
+        if match and match.group('label') not in fields:
+            fields[match.group('label')] = _strip_value(match.group('value'))
+
+    sub_scores = {name: _to_score(fields[name]) if name in fields else None for name in SCORE_DIMENSIONS}
+    total = _to_score(fields['★★总分★★']) if '★★总分★★' in fields else None
+    if total is None:
+        if any(score is None for score in sub_scores.values()):
+            return None
+        total = sum(sub_scores.values())
+    if not _valid(total, sub_scores):
+        return None
+
+    count = _to_score(fields.get('完成题目数量', ''))
+    result = {
+        'total': total,
+        'sub_scores': sub_scores,
+        'question_count': int(count) if count is not None and count >= 0 else None
+    }
+    for field in COMMENT_FIELDS:
+        result[field] = fields.get(field, '')
+    return result
+
+
+def parse_evaluation(text: str) -> Optional[Dict]:
+    """
+    解析评分结果：先按markdown格式，再按JSON格式
+
+    Returns:
+        解析结果字典，两种格式都无法解析时返回 None
+    """
+    if not text:
+        return None
+    return parse_markdown_evaluation(text) or parse_json_evaluation(text)
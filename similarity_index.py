@@ -0,0 +1,156 @@
+# similarity_index.py
+"""
+作业相似度（抄袭）检测
+
+把作业中的代码规范化为词法单元序列（变量名、函数名统一替换，字符串和数字字面量统一替换，去掉注释），
+取连续 k 个词法单元作为片段，计算 MinHash 签名并按 LSH 分段得到若干桶。两份作业只要有一段落入同一个桶
+就成为候选对，再用签名估计 Jaccard 相似度确认，避免两两比较全部提交。
+
+桶和签名由 app.py 存入数据库，上传时增量更新。
+"""
+import builtins
+import hashlib
+import io
+import keyword
+import random
+import re
+import tokenize
+from typing import Dict, List, Optional, Sequence
+
+from config import Config
+from static_grader import extract_code
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# 保留关键字和内置函数名（print、input、range 等反映解题思路），其余标识符统一替换
+_KEPT_NAMES = set(keyword.kwlist) | set(dir(builtins))
+_SKIPPED_TOKENS = {tokenize.COMMENT, tokenize.NL, tokenize.ENCODING, tokenize.ENDMARKER}
+# 代码无法分词（有语法错误）时按正则粗略切分
+_FALLBACK_TOKEN = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|\d+(?:\.\d+)?|[A-Za-z_]\w*|\S')
+
+
+def _normalize_token(kind: int, value: str, previous: str = '') -> str:
+    if kind == tokenize.NAME:
+        # 方法名（如 .append、.format）不受改名影响，保留
+        return value if value in _KEPT_NAMES or previous == '.' else 'ID'
+    if kind == tokenize.NUMBER:
+        return 'NUM'
+    if kind == tokenize.STRING or value[:1] in ('"', "'"):
+        return 'STR'
+    if kind == tokenize.NEWLINE:
+        return '\\n'
+    if kind == tokenize.INDENT:
+        return '>'
+    if kind == tokenize.DEDENT:
+        return '<'
+    return value
+
+
+def normalize_code(code: str) -> List[str]:
+    """
+    把代码转换为规范化的词法单元序列，改变量名、改字符串内容、增删注释都不影响结果
+
+    Args:
+        code: Python源代码
+
+    Returns:
+        规范化后的词法单元列表
+    """
+    tokens = []
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(code).readline):
+            if token.type in _SKIPPED_TOKENS:
+                continue
+            tokens.append(_normalize_token(token.type, token.string, tokens[-1] if tokens else ''))
+        return tokens
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        pass
+
+    tokens = []
+    for line in code.split('\n'):
+        line = line.split('#', 1)[0]
+        for value in _FALLBACK_TOKEN.findall(line):
+            if value[0].isdigit():
+                tokens.append('NUM')
+            elif value[0].isalpha() or value[0] == '_':
+                tokens.append(_normalize_token(tokenize.NAME, value, tokens[-1] if tokens else ''))
+            else:
+                tokens.append(_normalize_token(tokenize.OP, value))
+        if line.strip():
+            tokens.append('\\n')
+    return tokens
+
+
+def _shingles(tokens: Sequence[str], size: int) -> set:
+    """连续 size 个词法单元组成一个片段，取其64位哈希"""
+    if len(tokens) < size:
+        return set()
+    shingles = set()
+    for i in range(len(tokens) - size + 1):
+        digest = hashlib.blake2b(' '.join(tokens[i:i + size]).encode('utf-8'), digest_size=8).digest()
+        shingles.add(int.from_bytes(digest, 'big'))
+    return shingles
+
+
+def _permutations(num_perm: int):
+    # 固定种子，保证不同进程、不同时间计算的签名可以相互比较
+    rng = random.Random(20240901)
+    return [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME)) for _ in range(num_perm)]
+
+
+_PERMUTATIONS = _permutations(Config.SIMILARITY_NUM_PERM)
+
+
+def minhash(shingles: set) -> List[int]:
+    """计算 MinHash 签名，每个排列取所有片段哈希值的最小值"""
+    return [min(((a * s + b) % _MERSENNE_PRIME) & _MAX_HASH for s in shingles) for a, b in _PERMUTATIONS]
+
+
+def lsh_buckets(signature: Sequence[int], bands: int = None) -> List[str]:
+    """
+    把签名按行数相等的若干段切分，每段哈希为一个桶，第 i 个元素对应第 i 段
+
+    Returns:
+        桶标识列表
+    """
+    bands = bands or Config.SIMILARITY_BANDS
+    rows = len(signature) // bands
+    buckets = []
+    for band in range(bands):
+        chunk = ','.join(str(value) for value in signature[band * rows:(band + 1) * rows])
+        buckets.append(hashlib.blake2b(chunk.encode('ascii'), digest_size=8).hexdigest())
+    return buckets
+
+
+def estimate_similarity(signature_a: Sequence[int], signature_b: Sequence[int]) -> float:
+    """用两个签名中相同位置取值相等的比例估计 Jaccard 相似度"""
+    if not signature_a or len(signature_a) != len(signature_b):
+        return 0.0
+    return sum(1 for a, b in zip(signature_a, signature_b) if a == b) / len(signature_a)
+
+
+def fingerprint(homework_content: str) -> Optional[Dict]:
+    """
+    计算一份作业的相似度指纹
+
+    Args:
+        homework_content: 作业文本
+
+    Returns:
+        {'tokens': 词法单元数, 'signature': MinHash签名, 'buckets': LSH桶}；
+        代码过短（少于 Config.SIMILARITY_MIN_TOKENS 个词法单元）时返回 None，短代码之间天然相似，不参与比较
+    """
+    tokens = normalize_code(extract_code(homework_content or ''))
+    if len(tokens) < Config.SIMILARITY_MIN_TOKENS:
+        return None
+    signature = minhash(_shingles(tokens, Config.SIMILARITY_SHINGLE_SIZE))
+    return {'tokens': len(tokens), 'signature': signature, 'buckets': lsh_buckets(signature)}
+
+
+def encode_signature(signature: Sequence[int]) -> str:
+    return ','.join(str(value) for value in signature)
+
+
+def decode_signature(value: str) -> List[int]:
+    return [int(item) for item in value.split(',')] if value else []
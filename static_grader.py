@@ -0,0 +1,318 @@
+# static_grader.py
+"""
+本地静态预评分
+
+从作业文本中提取Python代码，用 ast 解析后检查语法、知识点使用（循环、分支、try...except、random库、
+str.format()、hex()/pow()、字符串切片等）和基本的PEP8规范。结果以结构化事实的形式附加到大模型提示词中，
+不运行大模型（Config.IS_LLM_RUN 关闭）时直接作为本地评分。
+"""
+import ast
+import re
+import textwrap
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from homework_parser import QUESTION_HEADING
+from prompt_budget import OUTPUT_HEADING, SECTION_HEADING
+
+# 去掉字符串和注释后仍含中文的行视为说明文字，不当作代码
+_STRING_OR_COMMENT = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|#.*')
+_CJK = re.compile(r'[\u4e00-\u9fff\u3000-\u303f\uff00-\uffef]')
+_SNAKE_CASE = re.compile(r'^_{0,2}[a-z][a-z0-9_]*$|^_$|^[A-Z][A-Z0-9_]*$')
+_PASCAL_CASE = re.compile(r'^_?[A-Z][a-zA-Z0-9]*$')
+
+MAX_LINE_LENGTH = 79
+
+
+def _looks_like_code(line: str) -> bool:
+    stripped = line.strip()
+    if not stripped or QUESTION_HEADING.match(line):
+        return False
+    bare = _STRING_OR_COMMENT.sub('', stripped)
+    return not _CJK.search(bare)
+
+
+def _classify_lines(text: str) -> Iterator[Tuple[str, str]]:
+    """
+    逐行判断类型：code 代码，text 说明文字或空行，skip 段落标题和运行结果段落中的内容
+
+    Returns:
+        (类型, 行内容) 的迭代器
+    """
+    in_output = False
+    for line in text.split('\n'):
+        if OUTPUT_HEADING.match(line):
+            in_output = True
+            yield 'skip', line
+        elif SECTION_HEADING.match(line) or QUESTION_HEADING.match(line):
+            in_output = False
+            yield 'skip', line
+        elif in_output:
+            yield 'skip', line
+        else:
+            yield ('code' if _looks_like_code(line) else 'text'), line
+
+
+def extract_code(text: str) -> str:
+    """
+    从一道题的作答中提取源代码：跳过运行结果、小结等段落和说明文字
+
+    Args:
+        text: 单道题（或整份作业）的文本
+
+    Returns:
+        去掉公共缩进后的代码，找不到代码时返回空字符串
+    """
+    code_lines = []
+    for kind, line in _classify_lines(text):
+        if kind == 'code':
+            code_lines.append(line.rstrip())
+        elif kind == 'text' and code_lines and not line.strip():
+            code_lines.append('')
+    return textwrap.dedent('\n'.join(code_lines)).strip('\n')
+
+
+def code_spans(text: str) -> List[Tuple[int, int]]:
+    """
+    找出作业文本中的代码块，代码块内部的空行不打断代码块
+
+    Returns:
+        [(起始行号, 结束行号)]，行号从1开始，包含结束行
+    """
+    spans = []
+    start = end = None
+    for number, (kind, line) in enumerate(_classify_lines(text), 1):
+        if kind == 'code':
+            if start is None:
+                start = number
+            end = number
+        elif kind == 'skip' or line.strip():
+            if start is not None:
+                spans.append((start, end))
+            start = None
+    if start is not None:
+        spans.append((start, end))
+    return spans
+
+
+def _parse(code: str):
+    """
+    解析代码，整体解析失败时按空行分块、再逐行解析，尽量保留可解析部分用于知识点检查
+
+    Returns:
+        (语法树列表, 语法错误描述列表)
+    """
+    try:
+        return [ast.parse(code)], []
+    except SyntaxError as e:
+        whole_error = f"第{e.lineno}行：{e.msg}"
+
+    trees = []
+    for block in re.split(r'\n\s*\n', code):
+        try:
+            trees.append(ast.parse(textwrap.dedent(block)))
+            continue
+        except SyntaxError:
+            pass
+        # 块内有错误时逐行解析，至少识别出 import、单行语句等
+        for line in block.split('\n'):
+            try:
+                trees.append(ast.parse(line.strip()))
+            except SyntaxError:
+                pass
+    return trees, [whole_error]
+
+
+def _collect_facts(trees: List[ast.AST]) -> Dict:
+    facts = {
+        'for': 0, 'while': 0, 'if': 0, 'try': 0, 'slice': 0, 'format': 0, 'fstring': 0,
+        'functions': 0, 'calls': set(), 'imports': set(), 'names': set(), 'function_names': set()
+    }
+    for tree in trees:
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.For, ast.AsyncFor)):
+                facts['for'] += 1
+            elif isinstance(node, ast.While):
+                facts['while'] += 1
+            elif isinstance(node, (ast.If, ast.IfExp)):
+                facts['if'] += 1
+            elif isinstance(node, ast.Try):
+                facts['try'] += 1
+            elif isinstance(node, ast.Slice):
+                facts['slice'] += 1
+            elif isinstance(node, ast.JoinedStr):
+                facts['fstring'] += 1
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                facts['functions'] += 1
+                facts['function_names'].add(node.name)
+            elif isinstance(node, ast.Import):
+                facts['imports'].update(alias.name.split('.')[0] for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module:
+                facts['imports'].add(node.module.split('.')[0])
+            elif isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+                facts['names'].add(node.id)
+            elif isinstance(node, ast.Call):
+                if isinstance(node.func, ast.Name):
+                    facts['calls'].add(node.func.id)
+                elif isinstance(node.func, ast.Attribute):
+                    facts['calls'].add(node.func.attr)
+                    if node.func.attr == 'format':
+                        facts['format'] += 1
+    return facts
+
+
+# 知识点检测：(名称, 匹配知识点要求文字的正则, 判断是否使用的函数)
+KNOWLEDGE_DETECTORS = [
+    ('循环语句', re.compile(r'循环'), lambda f: f['for'] + f['while'] > 0),
+    ('分支语句', re.compile(r'分支|if'), lambda f: f['if'] > 0),
+    ('try...except异常处理', re.compile(r'try|except|异常'), lambda f: f['try'] > 0),
+    ('random库', re.compile(r'random|随机'), lambda f: 'random' in f['imports']),
+    ('str.format()', re.compile(r'format'), lambda f: f['format'] > 0),
+    ('字符串切片', re.compile(r'切片'), lambda f: f['slice'] > 0),
+    ('hex()', re.compile(r'hex'), lambda f: 'hex' in f['calls']),
+    ('pow()', re.compile(r'pow'), lambda f: 'pow' in f['calls']),
+    ('str()', re.compile(r'str\(\)'), lambda f: 'str' in f['calls']),
+    ('int()', re.compile(r'int\(\)'), lambda f: 'int' in f['calls']),
+    ('函数定义', re.compile(r'函数定义|def'), lambda f: f['functions'] > 0),
+]
+
+
+def _check_style(code: str, facts: Dict) -> List[str]:
+    """基本的PEP8检查，返回发现的问题"""
+    issues = []
+    lines = code.split('\n')
+    long_lines = [i for i, line in enumerate(lines, 1) if len(line) > MAX_LINE_LENGTH]
+    if long_lines:
+        issues.append(f"{len(long_lines)}行超过{MAX_LINE_LENGTH}个字符")
+    bad_indent = [i for i, line in enumerate(lines, 1)
+                  if line.strip() and (len(line) - len(line.lstrip(' '))) % 4 != 0]
+    if bad_indent:
+        issues.append(f"第{bad_indent[0]}行等{len(bad_indent)}行缩进不是4的倍数")
+    if any('\t' in line[:len(line) - len(line.lstrip())] for line in lines):
+        issues.append("使用了Tab缩进")
+    if any(';' in _STRING_OR_COMMENT.sub('', line) for line in lines):
+        issues.append("一行中写了多条语句")
+    bad_names = sorted(name for name in facts['names'] if not _SNAKE_CASE.match(name))
+    bad_names += sorted(name for name in facts['function_names']
+                        if not _SNAKE_CASE.match(name) and not _PASCAL_CASE.match(name))
+    if bad_names:
+        issues.append(f"命名不符合snake_case：{'、'.join(bad_names[:5])}")
+    return issues
+
+
+def analyze_code(text: str, knowledge_point: Optional[str] = None) -> Dict:
+    """
+    静态分析一道题的作答
+
+    Args:
+        text: 单道题的作答文本
+        knowledge_point: 该题要求使用的知识点（如“至少使用循环语句、分支语句”），为空时只统计使用情况
+
+    Returns:
+        分析结果字典：code、has_code、has_output、syntax_ok、syntax_errors、required（要求的知识点及是否使用）、
+        used（已使用的知识点）、style_issues、has_error_handling
+    """
+    code = extract_code(text)
+    trees, errors = _parse(code) if code else ([], [])
+    facts = _collect_facts(trees)
+
+    required = {}
+    for name, pattern, check in KNOWLEDGE_DETECTORS:
+        if knowledge_point and pattern.search(knowledge_point):
+            required[name] = check(facts)
+
+    return {
+        'code': code,
+        'has_code': bool(code),
+        'has_output': any(OUTPUT_HEADING.match(line) for line in text.split('\n')),
+        'syntax_ok': bool(code) and not errors,
+        'syntax_errors': errors,
+        'required': required,
+        'used': [name for name, _, check in KNOWLEDGE_DETECTORS if check(facts)],
+        'style_issues': _check_style(code, facts) if code else [],
+        'has_error_handling': facts['try'] > 0 or bool({'isdigit', 'isnumeric', 'isinstance'} & facts['calls'])
+    }
+
+
+def format_facts(report: Dict) -> str:
+    """把分析结果整理为附加到提示词中的结构化事实"""
+    if not report['has_code']:
+        return "【静态分析】未识别到Python代码"
+    lines = ["【静态分析（程序自动检查，供评分参考）】"]
+    if report['syntax_ok']:
+        lines.append("- 语法检查：通过")
+    else:
+        lines.append(f"- 语法检查：存在语法错误（{'；'.join(report['syntax_errors'])}）")
+    if report['required']:
+        status = "，".join(f"{name}{'已使用' if used else '未使用'}" for name, used in report['required'].items())
+        lines.append(f"- 知识点要求：{status}")
+    lines.append(f"- 已使用：{'、'.join(report['used']) or '无'}")
+    lines.append(f"- 代码规范：{'；'.join(report['style_issues']) or '未发现问题'}")
+    lines.append(f"- 异常/输入校验：{'有' if report['has_error_handling'] else '无'}")
+    lines.append(f"- 运行结果：{'已提供' if report['has_output'] else '未提供'}")
+    return "\n".join(lines)
+
+
+def score_report(report: Dict, execution: Optional[Dict] = None) -> Dict:
+    """
+    按评分维度给出本地估算分数
+
+    Args:
+        report: analyze_code 的返回值
+        execution: 运行测试的结果（code_sandbox.CodeSandbox.run_tests 的返回值），有结果时正确性按通过率计分
+
+    Returns:
+        {'total', 'sub_scores', '优点', '缺点', '建议'}，格式与大模型单题评分的解析结果一致
+    """
+    if not report['has_code']:
+        return {'total': 0.0, 'sub_scores': {"正确性": 0.0, "知识点使用": 0.0, "可读性": 0.0, "健壮性": 0.0},
+                '优点': "", '缺点': "未识别到代码", '建议': "按 题目-源代码-运行结果-小结 的结构提交作业"}
+
+    tested = bool(execution and execution['total'])
+    if report['syntax_ok'] and tested:
+        correctness = round(50.0 * execution['passed'] / execution['total'], 1)
+    elif report['syntax_ok']:
+        correctness = 45.0 if report['has_output'] else 40.0
+    else:
+        correctness = 20.0
+    if report['required']:
+        knowledge = 35.0 * sum(report['required'].values()) / len(report['required'])
+    else:
+        knowledge = 25.0
+    readability = max(0.0, 10.0 - 2.0 * len(report['style_issues']))
+    robustness = 5.0 if report['has_error_handling'] else 2.0
+    sub_scores = {"正确性": correctness, "知识点使用": round(knowledge, 1),
+                  "可读性": readability, "健壮性": robustness}
+
+    strengths, weaknesses, advice = [], [], []
+    if report['syntax_ok']:
+        strengths.append("代码语法正确")
+    else:
+        weaknesses.append(f"存在语法错误（{'；'.join(report['syntax_errors'])}）")
+        advice.append("修正语法错误后重新运行")
+    if tested and report['syntax_ok']:
+        if execution['passed'] == execution['total']:
+            strengths.append(f"通过全部{execution['total']}组运行测试")
+        else:
+            weaknesses.append(f"运行测试只通过{execution['passed']}/{execution['total']}组")
+            advice.append("对照题目要求的输入输出格式检查程序逻辑")
+    missing = [name for name, used in report['required'].items() if not used]
+    if report['required'] and not missing:
+        strengths.append(f"使用了要求的知识点：{'、'.join(report['required'])}")
+    if missing:
+        weaknesses.append(f"未使用要求的知识点：{'、'.join(missing)}")
+        advice.append(f"按题目要求使用{'、'.join(missing)}")
+    if report['style_issues']:
+        weaknesses.append('；'.join(report['style_issues']))
+        advice.append("按PEP8规范调整代码格式和命名")
+    if not report['has_error_handling']:
+        advice.append("补充输入校验或异常处理")
+    if not report['has_output']:
+        weaknesses.append("未提供运行结果")
+
+    return {
+        'total': sum(sub_scores.values()),
+        'sub_scores': sub_scores,
+        '优点': "，".join(strengths),
+        '缺点': "，".join(weaknesses),
+        '建议': "，".join(advice)
+    }
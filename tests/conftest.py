@@ -0,0 +1,144 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+# 测试不调用大模型，配置校验前先提供占位密钥（与基准测试脚本相同）
+os.environ.setdefault('MY_LONGCAT_API_KEY', 'test')
+os.environ.setdefault('MY_DEEPSEEK_API_KEY', 'test')
+# 应用测试使用临时数据库，不改动 instance/homework.db
+os.environ['HOMEWORK_DATABASE_URI'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='homework-test-'),
+                                                                 'homework.db')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def app_module(monkeypatch):
+    """导入应用并进入应用上下文；不启动后台评分线程，测试中由用例直接调用任务函数"""
+    import app as app_module
+    monkeypatch.setattr(app_module.grading_pool, 'start', lambda: None)
+    with app_module.app.app_context():
+        yield app_module
+        app_module.db.session.rollback()
+
+
+@pytest.fixture
+def run_job(app_module):
+    """在工作线程入口中执行任务，执行后丢弃测试会话中缓存的旧状态"""
+
+    def run(job_id):
+        app_module.run_grading_job(job_id)
+        app_module.db.session.expire_all()
+        return app_module.db.session.get(app_module.GradingJob, job_id)
+
+    return run
+
+
+EVALUATION_REPLY = ("完成题目数量：1\n★★总分★★:85\n★★详细评分★★\n正确性:\"45\"\n知识点使用:\"30\",\n"
+                    "可读性:\"6\",\n健壮性:\"4\",\n优点:\"实现完整\",\n缺点:\"无\",\n建议:\"无\"")
+STUDY_PLAN_REPLY = "学习目标：巩固循环\n练习任务：完成3道练习题"
+
+
+class FakeLLMClient:
+    """按提示词返回固定评分或学习计划的大模型客户端，记录每次请求的消息"""
+
+    def __init__(self):
+        self.evaluation = EVALUATION_REPLY
+        self.study_plan = STUDY_PLAN_REPLY
+        self.calls = []
+
+    def chat(self, messages, **kwargs):
+        self.calls.append(messages)
+        if '学习规划师' in messages[0]['content']:
+            return self.study_plan
+        return self.evaluation
+
+    def chat_stream(self, messages, **kwargs):
+        reply = self.chat(messages, **kwargs)
+        yield reply[:5]
+        yield reply[5:]
+
+    def answered_model(self):
+        return None
+
+
+@pytest.fixture
+def fake_llm(app_module, monkeypatch, tmp_path):
+    """应用中的判分器改用 FakeLLMClient 和临时缓存"""
+    from evaluation_cache import EvaluationCache
+    from homework_LLM_grader import PythonCodeGrader
+
+    client = FakeLLMClient()
+    cache = EvaluationCache(db_path=str(tmp_path / 'cache.db'))
+    monkeypatch.setattr(app_module, 'PythonCodeGrader',
+                        lambda *args, **kwargs: PythonCodeGrader(client=client, cache=cache))
+    return client
+
+
+def write_docx(path, lines):
+    from docx import Document
+    doc = Document()
+    for line in lines:
+        doc.add_paragraph(line)
+    doc.save(str(path))
+
+
+@pytest.fixture
+def make_submission(app_module, tmp_path):
+    """创建一个新老师、新学生和作业，返回一份提交；lines 不为空时写入 .docx 文件，否则使用 file_name 指定的空文件"""
+
+    def make(lines=None, file_name='homework.docx', assignment=None):
+        db = app_module.db
+        suffix = uuid.uuid4().hex[:8]
+        if assignment is None:
+            teacher = app_module.User(username=f't-{suffix}', password='123', role='teacher', name='老师')
+            db.session.add(teacher)
+            db.session.flush()
+            assignment = app_module.Assignment(title='作业', content='作业要求', teacher_id=teacher.id)
+            db.session.add(assignment)
+            db.session.flush()
+        student = app_module.User(username=f's-{suffix}', password='123', role='student', name='学生')
+        db.session.add(student)
+        db.session.flush()
+
+        path = tmp_path / f'{suffix}-{file_name}'
+        if lines is not None:
+            write_docx(path, lines)
+        else:
+            path.write_bytes(b'')
+        submission = app_module.Submission(assignment_id=assignment.id, student_id=student.id,
+                                           file_path=str(path), file_name=file_name)
+        db.session.add(submission)
+        db.session.commit()
+        return submission
+
+    return make
+
+
+@pytest.fixture
+def upload(app_module, monkeypatch, tmp_path):
+    """以学生身份通过提交页面上传 .docx 作业，上传目录改为临时目录"""
+    upload_dir = tmp_path / 'uploads'
+    upload_dir.mkdir()
+    monkeypatch.setitem(app_module.app.config, 'UPLOAD_FOLDER', str(upload_dir))
+
+    def post(assignment, student_id, lines):
+        source = tmp_path / f'{uuid.uuid4().hex[:8]}.docx'
+        write_docx(source, lines)
+        client = app_module.app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = student_id
+            sess['role'] = 'student'
+        with open(source, 'rb') as f:
+            response = client.post(f'/student/submit_assignment/{assignment.id}',
+                                   data={'content': '', 'file': (f, 'homework.docx')},
+                                   content_type='multipart/form-data')
+        assert response.status_code == 302
+        app_module.db.session.expire_all()
+        return app_module.Submission.query.filter_by(assignment_id=assignment.id, student_id=student_id).one()
+
+    return post
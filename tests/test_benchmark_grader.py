@@ -0,0 +1,35 @@
+# tests/test_benchmark_grader.py
+import json
+import os
+import subprocess
+import sys
+
+from benchmark_grader import percentile, summarize
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_percentile_interpolates():
+    assert percentile([], 50) == 0.0
+    assert percentile([3, 1, 2], 50) == 2
+    assert percentile([1, 2], 95) == 1.95
+
+
+def test_summarize():
+    row = summarize([1.0, 2.0], failures=1, elapsed=30)
+    assert row['completed'] == 2
+    assert row['failures'] == 1
+    assert row['submissions_per_minute'] == 4.0
+
+
+def test_preview_smoke(tmp_path):
+    # /preview 触发后台评分的完整链路（提取、排队、评分）在模拟服务上能跑通
+    output = tmp_path / 'bench.json'
+    process = subprocess.run([sys.executable, 'benchmark_grader.py', '--target', 'preview', '--concurrency', '1',
+                              '--requests', '1', '--timeout', '10', '--latency', 'fixed:0.05',
+                              '--output', str(output)],
+                             cwd=ROOT, capture_output=True, text=True, timeout=60)
+    assert process.returncode == 0, process.stderr
+    grading = json.loads(output.read_text(encoding='utf-8'))['preview_grading'][0]
+    assert grading['failure_reasons'] == {}
+    assert grading['completed'] == 1
@@ -0,0 +1,112 @@
+# tests/test_code_sandbox.py
+import os
+
+import pytest
+
+import code_sandbox
+from code_sandbox import RUN_ERROR, RUN_OK, RUN_TIMEOUT, CodeSandbox, outputs_match, parse_test_cases, run_case
+
+LIMITS = {'cpu_seconds': 2, 'memory_mb': 256, 'wall_seconds': 5, 'max_output_bytes': 64 * 1024}
+
+
+def test_parse_test_cases_pairs_inputs_and_outputs():
+    cases = parse_test_cases("1\n2\n---\n3\n4", "3\n---\n7\n")
+    assert cases == [{'input': '1\n2\n', 'expected': '3'}, {'input': '3\n4\n', 'expected': '7'}]
+
+
+def test_parse_test_cases_windows_newlines_and_missing_input():
+    cases = parse_test_cases("5\r\n", "25\r\n---\r\nhello")
+    assert cases == [{'input': '5\n', 'expected': '25'}, {'input': '', 'expected': 'hello'}]
+
+
+def test_parse_test_cases_without_expected_output():
+    assert parse_test_cases("1", "") == []
+    assert parse_test_cases("1", None) == []
+
+
+@pytest.mark.parametrize('actual, expected', [
+    ("25\n", "25"),
+    ("\n25   \n\n", "25"),
+    ("结果是：25", "25"),
+    ("sum = 25", "25"),
+    ("请输入：\n和为 3\n积为 2\n", "3\n2"),
+])
+def test_outputs_match(actual, expected):
+    assert outputs_match(actual, expected)
+
+
+@pytest.mark.parametrize('actual, expected', [
+    ("125", "25"),
+    ("2\n3", "3\n2"),
+    ("", "25"),
+    ("25", ""),
+])
+def test_outputs_mismatch(actual, expected):
+    assert not outputs_match(actual, expected)
+
+
+@pytest.fixture
+def sandbox():
+    sandbox = CodeSandbox(max_workers=1, wall_seconds=2)
+    yield sandbox
+    sandbox.shutdown()
+
+
+def test_run_tests(sandbox):
+    code = "a = int(input())\nb = int(input())\nprint('和为', a + b)"
+    report = sandbox.run_tests(code, parse_test_cases("1\n2\n---\n5\n5", "3\n---\n11"))
+    assert report['total'] == 2
+    assert report['passed'] == 1
+    assert [case['status'] for case in report['cases']] == [RUN_OK, RUN_OK]
+
+
+def test_run_tests_timeout(sandbox):
+    report = sandbox.run_tests("while True:\n    pass", parse_test_cases("", "1"))
+    assert report['cases'][0]['status'] == RUN_TIMEOUT
+    assert report['passed'] == 0
+
+
+def test_run_case_hides_environment(monkeypatch):
+    monkeypatch.setenv('LLM_SECRET_TEST', 'sk-LEAKME')
+    result = run_case("import os\nprint(os.environ.get('LLM_SECRET_TEST'))\nprint(sorted(os.environ))", '', LIMITS)
+    assert result['status'] == RUN_OK
+    assert 'sk-LEAKME' not in result['output']
+    assert 'MY_LONGCAT_API_KEY' not in result['output']
+
+
+@pytest.mark.parametrize('path', ['/etc/hostname', os.path.abspath(__file__)])
+def test_run_case_blocks_reads_outside_workdir(path):
+    result = run_case(f"print(open({path!r}).read())", '', LIMITS)
+    assert result['status'] == RUN_ERROR
+    assert 'PermissionError' in result['output']
+
+
+def test_run_case_allows_workdir_files_and_stdlib():
+    code = ("import fractions, json\n"
+            "with open('data.txt', 'w') as f:\n    f.write(json.dumps([1, 2]))\n"
+            "print(open('data.txt').read(), fractions.Fraction(1, 3))")
+    result = run_case(code, '', LIMITS)
+    assert result['status'] == RUN_OK
+    assert result['output'].strip() == '[1, 2] 1/3'
+
+
+def test_run_case_blocks_repo_imports():
+    result = run_case("import config", '', LIMITS)
+    assert result['status'] == RUN_ERROR
+    assert 'ModuleNotFoundError' in result['output']
+
+
+@pytest.mark.skipif(code_sandbox._sandbox_user() is None, reason="不是root或Python安装目录对沙箱用户不可访问")
+def test_run_case_drops_root():
+    result = run_case("import os\nprint(os.getuid())", '', LIMITS)
+    assert result['status'] == RUN_OK
+    assert result['output'].strip() != '0'
+
+
+def test_pool_workers_hold_no_api_keys(sandbox):
+    # 即使绕过模块清理拿到工作进程中的配置，其中也没有密钥
+    code = ("try:\n    raise ValueError\nexcept ValueError as e:\n    frame = e.__traceback__.tb_frame\n"
+            "while frame and 'Config' not in frame.f_globals:\n    frame = frame.f_back\n"
+            "print(frame.f_globals['Config'].MY_LLM_API_KEY)")
+    report = sandbox.run_tests(code, parse_test_cases("", "None"))
+    assert report['cases'][0]['output'].strip() == 'None'
@@ -0,0 +1,52 @@
+# tests/test_docx_stream.py
+import pytest
+from docx import Document
+
+import docx_stream
+import homework_parser
+from benchmark_docx import build_document
+
+
+def _save(tmp_path, document, name='homework.docx'):
+    path = str(tmp_path / name)
+    document.save(path)
+    return path
+
+
+@pytest.mark.parametrize('paragraphs, tables', [(1, 0), (40, 0), (60, 3)])
+def test_matches_python_docx(tmp_path, paragraphs, tables):
+    path = str(tmp_path / f'p{paragraphs}_t{tables}.docx')
+    build_document(path, paragraphs, tables, seed=paragraphs)
+    assert docx_stream.extract_docx(path) == homework_parser.extract_docx(path)
+
+
+def test_runs_tabs_and_line_breaks(tmp_path):
+    document = Document()
+    paragraph = document.add_paragraph('for i in range(3):')
+    paragraph.add_run().add_break()
+    paragraph.add_run('\tprint(i)')
+    document.add_paragraph('')
+    document.add_paragraph('运行结果：0 1 2')
+    path = _save(tmp_path, document)
+    extracted = docx_stream.extract_docx(path)
+    assert extracted == homework_parser.extract_docx(path)
+    assert 'for i in range(3):\n\tprint(i)' in extracted['text']
+
+
+def test_merged_cells_output_once(tmp_path):
+    document = Document()
+    table = document.add_table(rows=2, cols=3)
+    table.cell(0, 0).merge(table.cell(0, 2))
+    table.cell(0, 0).text = '题目1'
+    table.cell(1, 0).text = 'x = 1'
+    table.cell(1, 1).text = 'print(x)'
+    path = _save(tmp_path, document)
+    extracted = docx_stream.extract_docx(path)
+    assert extracted == homework_parser.extract_docx(path)
+    assert extracted['table_count'] == 1
+    assert extracted['text'].count('题目1') == 1
+
+
+def test_empty_document(tmp_path):
+    path = _save(tmp_path, Document())
+    assert docx_stream.extract_docx(path) == homework_parser.extract_docx(path)
@@ -0,0 +1,50 @@
+# tests/test_eager_grading.py
+from datetime import datetime, timedelta
+
+from grading_jobs import JOB_KIND_EVALUATE, JOB_KIND_EXTRACT
+from grading_scheduler import PRIORITY_BACKFILL
+
+HOMEWORK_LINES = ['##Begin', '题目1 求和', 'total = 0', 'for i in range(10):', '    total += i', 'print(total)',
+                  '##End']
+
+
+def eager_submission(app_module, make_submission, eager=True):
+    submission = make_submission(HOMEWORK_LINES)
+    submission.assignment.eager_grading = eager
+    app_module.db.session.commit()
+    return submission
+
+
+def test_upload_queues_debounced_grading(app_module, make_submission, upload):
+    submission = eager_submission(app_module, make_submission)
+    submission = upload(submission.assignment, submission.student_id, HOMEWORK_LINES)
+
+    job = app_module.latest_grading_job(submission.id, JOB_KIND_EVALUATE)
+    assert job.priority == PRIORITY_BACKFILL
+    debounce = timedelta(seconds=app_module.Config.EAGER_GRADING_DEBOUNCE_SECONDS)
+    assert job.not_before > datetime.utcnow() + debounce - timedelta(seconds=5)
+    assert app_module.latest_grading_job(submission.id, JOB_KIND_EXTRACT) is not None
+    # 等待期间不会被认领，也不会在恢复时重新加入队列
+    assert not app_module.claim_grading_job(job.id)
+    assert job.id not in [job_id for job_id, _, _ in app_module.recover_grading_jobs()]
+
+
+def test_reupload_restarts_debounce(app_module, make_submission, upload):
+    submission = eager_submission(app_module, make_submission)
+    submission = upload(submission.assignment, submission.student_id, HOMEWORK_LINES)
+    job = app_module.latest_grading_job(submission.id, JOB_KIND_EVALUATE)
+    job.not_before = datetime.utcnow() + timedelta(seconds=1)
+    app_module.db.session.commit()
+
+    # 短时间内再次上传只评最后一次：沿用同一任务并重新计时
+    submission = upload(submission.assignment, submission.student_id, HOMEWORK_LINES + ['print("改")'])
+    again = app_module.latest_grading_job(submission.id, JOB_KIND_EVALUATE)
+    assert again.id == job.id
+    assert again.not_before > datetime.utcnow() + timedelta(seconds=5)
+
+
+def test_upload_without_eager_grading_only_extracts(app_module, make_submission, upload):
+    submission = eager_submission(app_module, make_submission, eager=False)
+    submission = upload(submission.assignment, submission.student_id, HOMEWORK_LINES)
+    assert app_module.latest_grading_job(submission.id, JOB_KIND_EVALUATE) is None
+    assert app_module.latest_grading_job(submission.id, JOB_KIND_EXTRACT) is not None
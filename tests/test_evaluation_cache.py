@@ -0,0 +1,101 @@
+# tests/test_evaluation_cache.py
+import pytest
+
+from config import Config
+from evaluation_cache import EvaluationCache, make_cache_key, normalize_homework_text
+from homework_LLM_grader import PythonCodeGrader
+
+HOMEWORK = "##Begin\n题目1 求和\ntotal = 0\nfor i in range(10):\n    total += i\nprint(total)\n##End"
+
+
+class FakeClient:
+    """按固定回复作答的大模型客户端，记录收到的请求"""
+
+    def __init__(self, reply="总分:90"):
+        self.reply = reply
+        self.calls = []
+
+    def chat(self, messages, **kwargs):
+        self.calls.append(messages)
+        return self.reply
+
+    def chat_stream(self, messages, **kwargs):
+        self.calls.append(messages)
+        yield self.reply
+
+    def answered_model(self):
+        return None
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return EvaluationCache(db_path=str(tmp_path / 'cache.db'), max_memory_items=2, max_db_rows=100,
+                           ttl_seconds=3600)
+
+
+def test_normalize_homework_text():
+    assert normalize_homework_text("a  \r\nb\r\n\r\n\r\n\r\nc\n") == "a\nb\n\nc"
+    assert make_cache_key("a \r\nb", "sys", "m", 0.1) == make_cache_key("a\nb", "sys", "m", 0.1)
+    assert make_cache_key("a\nb", "sys", "m", 0.1) != make_cache_key("a\nb", "sys", "m", 0.2)
+
+
+def test_memory_and_disk_layers(cache, tmp_path):
+    cache.put('k1', 'v1')
+    assert cache.get('k1') == 'v1'
+    assert cache.stats()['memory_hits'] == 1
+
+    # 超出进程内条目上限后从SQLite层读取
+    cache.put('k2', 'v2')
+    cache.put('k3', 'v3')
+    assert cache.get('k1') == 'v1'
+    assert cache.stats()['disk_hits'] == 1
+    assert cache.get('missing') is None
+    assert cache.stats()['misses'] == 1
+
+    # 持久化层跨实例共享
+    other = EvaluationCache(db_path=str(tmp_path / 'cache.db'))
+    assert other.get('k3') == 'v3'
+
+
+def test_expired_entries_miss(tmp_path):
+    cache = EvaluationCache(db_path=str(tmp_path / 'cache.db'), ttl_seconds=0)
+    cache.put('k', 'v')
+    assert cache.get('k') is None
+
+
+def test_invalidate(cache):
+    cache.put('k', 'v')
+    cache.invalidate('k')
+    assert cache.get('k') is None
+
+
+def test_grader_reuses_cached_evaluation(cache):
+    client = FakeClient()
+    grader = PythonCodeGrader(client=client, cache=cache)
+    assert grader.evaluate_code_2(HOMEWORK) == "总分:90"
+    # 只有行尾空白不同的重复提交命中缓存
+    assert grader.evaluate_code_2(HOMEWORK.replace('\n', '  \r\n')) == "总分:90"
+    assert len(client.calls) == 1
+    assert grader.evaluate_code_2(HOMEWORK, use_cache=False) == "总分:90"
+    assert len(client.calls) == 2
+
+
+def test_grader_does_not_cache_errors(cache):
+    client = FakeClient(reply="❌ 评分失败：请求超时")
+    grader = PythonCodeGrader(client=client, cache=cache)
+    grader.evaluate_code_2(HOMEWORK)
+    grader.evaluate_code_2(HOMEWORK)
+    assert len(client.calls) == 2
+
+
+def test_cache_key_follows_static_analysis(cache, monkeypatch):
+    # 附加到提示词中的静态分析结果变化后不能沿用旧的评分
+    client = FakeClient()
+    grader = PythonCodeGrader(client=client, cache=cache)
+    monkeypatch.setattr(Config, 'STATIC_ANALYSIS', True)
+    grader.evaluate_code_2(HOMEWORK)
+    monkeypatch.setattr(Config, 'STATIC_ANALYSIS', False)
+    grader.evaluate_code_2(HOMEWORK)
+    assert len(client.calls) == 2
+    grader.evaluate_code_2(HOMEWORK)
+    assert len(client.calls) == 2
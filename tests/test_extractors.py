@@ -0,0 +1,70 @@
+# tests/test_extractors.py
+import time
+
+import pytest
+
+import extractors
+from extractors import (ExtractionError, ExtractionTimeout, ExtractorPool, decode_text, file_type_of, is_supported,
+                        run_extractor)
+from conftest import write_docx
+
+
+@pytest.fixture
+def pool():
+    pool = ExtractorPool(max_workers=1)
+    yield pool
+    pool.shutdown()
+
+
+def test_supported_types():
+    assert file_type_of('uploads/作业.DOCX') == 'docx'
+    assert all(is_supported(f'homework.{ext}') for ext in ('txt', 'pdf', 'doc', 'docx'))
+    assert not is_supported('homework.xyz')
+    assert not is_supported('homework')
+
+
+def test_decode_text():
+    assert decode_text('总分'.encode('gb18030')) == '总分'
+    assert decode_text(b'\xef\xbb\xbf' + '总分'.encode('utf-8')) == '总分'
+    assert decode_text('总分'.encode('utf-16')) == '总分'
+
+
+def test_run_extractor_normalizes_line_endings(tmp_path):
+    path = tmp_path / 'homework.txt'
+    path.write_bytes('print(1)\r\nprint(2)'.encode('gb18030'))
+    assert run_extractor(str(path)) == {'text': 'print(1)\nprint(2)\n', 'paragraph_count': 2, 'table_count': 0}
+    with pytest.raises(ExtractionError, match='不支持的文件类型'):
+        run_extractor(str(tmp_path / 'homework.xyz'))
+
+
+def test_run_extractor_times_out(tmp_path, monkeypatch):
+    monkeypatch.setitem(extractors._EXTRACTORS, 'slow', lambda path: time.sleep(2))
+    start = time.perf_counter()
+    with pytest.raises(ExtractionTimeout):
+        run_extractor(str(tmp_path / 'homework.slow'), timeout=0.1)
+    assert time.perf_counter() - start < 1
+
+
+def test_pool_extracts_in_worker_process(tmp_path, pool):
+    docx_path = tmp_path / 'homework.docx'
+    write_docx(docx_path, ['##Begin', 'print("你好")', '##End'])
+    txt_path = tmp_path / 'homework.txt'
+    txt_path.write_text('print(1)\n', encoding='utf-8')
+
+    assert 'print("你好")' in pool.extract(str(docx_path))['text']
+    assert pool.extract(str(txt_path))['text'] == 'print(1)\n'
+    stats = pool.stats()
+    assert stats['docx']['files'] == 1
+    assert stats['txt']['failed'] == 0
+
+
+def test_pool_reports_broken_files(tmp_path, pool):
+    path = tmp_path / 'broken.docx'
+    path.write_bytes(b'not a zip file')
+    with pytest.raises(ExtractionError):
+        pool.extract(str(path))
+    assert pool.stats()['docx']['failed'] == 1
+    # 损坏的文件不影响之后的提取
+    path = tmp_path / 'homework.txt'
+    path.write_text('print(1)\n', encoding='utf-8')
+    assert pool.extract(str(path))['text'] == 'print(1)\n'
@@ -0,0 +1,114 @@
+# tests/test_feedback_audio.py
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import feedback_audio
+from config import Config
+from feedback_audio import AUDIO_FAILED, AUDIO_PENDING, AUDIO_READY, FeedbackAudio, audio_key, audio_mimetype
+
+WAV_HEADER = b'RIFF\x24\x00\x00\x00WAVEfmt '
+
+
+class FakeVoice:
+    """代替 pyttsx3 写出音频文件，记录朗读的文本"""
+    texts = []
+    error = None
+
+    def __init__(self, rate, volume, voice):
+        pass
+
+    def save(self, text, path):
+        FakeVoice.texts.append(text)
+        if FakeVoice.error:
+            raise RuntimeError(FakeVoice.error)
+        with open(path, 'wb') as f:
+            f.write(WAV_HEADER)
+
+
+@pytest.fixture
+def audio(tmp_path, monkeypatch):
+    """在线程池中合成的语音合成器，测试不启动工作进程"""
+    FakeVoice.texts, FakeVoice.error = [], None
+    monkeypatch.setattr(feedback_audio, 'VoiceAssistant', FakeVoice)
+    audio = FeedbackAudio(folder=str(tmp_path / 'audio'))
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(audio, '_get_executor', lambda: executor)
+    yield audio
+    executor.shutdown()
+
+
+def wait_for(audio, text, status):
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        result = audio.request(text)
+        if result[1] == status:
+            return result
+        time.sleep(0.01)
+    raise AssertionError(f"语音状态没有变为 {status}")
+
+
+def test_audio_key_follows_text_and_voice(monkeypatch):
+    key = audio_key("★★总分★★:85")
+    assert audio_key("★★总分★★:85") == key
+    assert audio_key("★★总分★★:86") != key
+    monkeypatch.setattr(Config, 'TTS_RATE', Config.TTS_RATE + 10)
+    assert audio_key("★★总分★★:85") != key
+
+
+def test_audio_mimetype(tmp_path):
+    samples = {'a.wav': (WAV_HEADER, 'audio/wav'), 'b.wav': (b'FORM\x00\x00\x00\x10AIFF', 'audio/aiff'),
+               'c.wav': (b'ID3\x04\x00\x00\x00\x00\x00\x00', 'audio/mpeg')}
+    for name, (header, mimetype) in samples.items():
+        (tmp_path / name).write_bytes(header)
+        assert audio_mimetype(str(tmp_path / name)) == mimetype
+
+
+def test_audio_synthesized_once_in_background(audio):
+    key, status, error = audio.request("★★总分★★:85")
+    assert (status, error) == (AUDIO_PENDING, None)
+    assert wait_for(audio, "★★总分★★:85", AUDIO_READY) == (key, AUDIO_READY, None)
+    with open(audio.path_for(key), 'rb') as f:
+        assert f.read() == WAV_HEADER
+    assert audio.request("★★总分★★:85")[1] == AUDIO_READY
+    assert FakeVoice.texts == ["★★总分★★:85"]
+
+
+def test_failed_synthesis_waits_before_retry(audio, monkeypatch):
+    FakeVoice.error = "语音引擎不可用"
+    key, status, error = wait_for(audio, "★★总分★★:60", AUDIO_FAILED)
+    assert error == "语音引擎不可用"
+    # 失败的合成不留下临时文件，冷却时间内不重复合成
+    assert os.listdir(audio.folder) == []
+    assert audio.request("★★总分★★:60")[1] == AUDIO_FAILED
+    assert len(FakeVoice.texts) == 1
+
+    FakeVoice.error = None
+    monkeypatch.setattr(Config, 'TTS_RETRY_COOLDOWN', 0)
+    assert wait_for(audio, "★★总分★★:60", AUDIO_READY)[0] == key
+
+
+def test_audio_file_route_serves_current_result(app_module, make_submission, audio, monkeypatch):
+    monkeypatch.setattr(app_module, 'get_shared_feedback_audio', lambda: audio)
+    submission = make_submission()
+    submission.evaluation_result = "★★总分★★:85"
+    app_module.db.session.commit()
+    key, _, _ = wait_for(audio, submission.evaluation_result, AUDIO_READY)
+
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = submission.student_id
+        sess['role'] = 'student'
+    response = client.get(f'/preview/{submission.id}/audio/{key}')
+    assert response.status_code == 200
+    assert response.mimetype == 'audio/wav'
+    assert response.data == WAV_HEADER
+    response.close()
+
+    # 评分结果变化后旧音频失效
+    assert client.get(f'/preview/{submission.id}/audio/{audio_key("★★总分★★:60")}').status_code == 404
+    status = client.get(f'/preview/{submission.id}/audio/status').get_json()
+    assert status['status'] == AUDIO_READY
+    assert status['url'].endswith(key)
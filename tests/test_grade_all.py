@@ -0,0 +1,102 @@
+# tests/test_grade_all.py
+from datetime import datetime, timedelta
+
+from grading_jobs import JOB_DONE, JOB_FAILED, JOB_KIND_STUDY_PLAN, JOB_QUEUED, RUN_DONE, RUN_RUNNING
+from grading_scheduler import PRIORITY_BACKFILL, PRIORITY_DEADLINE
+from homework_LLM_grader import static_evaluation
+
+HOMEWORK_LINES = ['##Begin', '题目1 求和', 'total = 0', 'for i in range(10):', '    total += i', 'print(total)',
+                  '##End']
+
+
+def run_jobs(app_module, run):
+    return app_module.GradingJob.query.filter_by(run_id=run.id).order_by(app_module.GradingJob.id).all()
+
+
+def test_grade_all_enqueues_only_ungraded_supported_submissions(app_module, make_submission):
+    first = make_submission(HOMEWORK_LINES)
+    assignment = first.assignment
+    graded = make_submission(HOMEWORK_LINES, assignment=assignment)
+    graded.evaluation_result = "★★总分★★:90"
+    app_module.db.session.commit()
+    make_submission(file_name='homework.xyz', assignment=assignment)
+
+    run = app_module.start_grading_run(assignment, assignment.teacher_id)
+    assert run.status == RUN_RUNNING
+    assert run.priority == PRIORITY_BACKFILL
+    assert [job.submission_id for job in run_jobs(app_module, run)] == [first.id]
+
+
+def test_grade_all_near_deadline_uses_deadline_class(app_module, make_submission):
+    assignment = make_submission(HOMEWORK_LINES).assignment
+    assignment.due_date = datetime.utcnow() + timedelta(hours=1)
+    app_module.db.session.commit()
+    assert app_module.start_grading_run(assignment, assignment.teacher_id).priority == PRIORITY_DEADLINE
+
+
+def test_grade_all_resumes_running_run(app_module, make_submission):
+    assignment = make_submission(HOMEWORK_LINES).assignment
+    make_submission(HOMEWORK_LINES, assignment=assignment)
+    run = app_module.start_grading_run(assignment, assignment.teacher_id)
+    jobs = run_jobs(app_module, run)
+
+    # 再次执行继续同一批次，排队中的任务不会重复创建
+    again = app_module.start_grading_run(assignment, assignment.teacher_id)
+    assert again.id == run.id
+    assert [job.id for job in run_jobs(app_module, again)] == [job.id for job in jobs]
+
+
+def test_progress_finishes_run(app_module, make_submission, run_job, fake_llm):
+    assignment = make_submission(HOMEWORK_LINES).assignment
+    make_submission(HOMEWORK_LINES, assignment=assignment)
+    run = app_module.start_grading_run(assignment, assignment.teacher_id)
+    progress = app_module.grading_run_progress(run)
+    assert (progress['total'], progress['queued'], progress['remaining']) == (2, 2, 2)
+
+    for job in run_jobs(app_module, run):
+        run_job(job.id)
+    progress = app_module.grading_run_progress(run)
+    assert (progress['done'], progress['remaining'], progress['failures']) == (2, 0, [])
+    assert progress['status'] == RUN_DONE
+    assert all(sub.evaluation_result == fake_llm.evaluation for sub in assignment.submissions)
+
+
+def test_progress_reports_failures(app_module, make_submission, run_job, fake_llm):
+    submission = make_submission(HOMEWORK_LINES)
+    fake_llm.evaluation = "❌ 评分失败：请求超时"
+    run = app_module.start_grading_run(submission.assignment, submission.assignment.teacher_id)
+    job = run_job(run_jobs(app_module, run)[0].id)
+    assert job.status == JOB_FAILED
+
+    progress = app_module.grading_run_progress(run)
+    assert progress['failed'] == 1
+    assert progress['failures'] == [{'submission_id': submission.id, 'student': '学生',
+                                     'error': "❌ 评分失败：请求超时"}]
+
+
+def test_interrupted_jobs_are_requeued(app_module, make_submission):
+    submission = make_submission(HOMEWORK_LINES)
+    run = app_module.start_grading_run(submission.assignment, submission.assignment.teacher_id)
+    job = run_jobs(app_module, run)[0]
+    assert app_module.claim_grading_job(job.id)
+    assert app_module.acquire_grading_lease(f"{submission.id}:evaluate:interrupted", job.id)
+
+    # 命令行评分被中断：认领的任务放回队列并释放租约，再次运行时继续
+    assert app_module.requeue_claimed_jobs() == 1
+    app_module.db.session.expire_all()
+    assert app_module.db.session.get(app_module.GradingJob, job.id).status == JOB_QUEUED
+    assert app_module.db.session.get(app_module.GradingLease, f"{submission.id}:evaluate:interrupted") is None
+    assert app_module.requeue_claimed_jobs() == 0
+
+
+def test_grade_all_without_llm_uses_static_analysis(app_module, make_submission, run_job, fake_llm, monkeypatch):
+    monkeypatch.setattr(app_module.Config, 'IS_LLM_RUN', False)
+    submission = make_submission(HOMEWORK_LINES)
+    run = app_module.start_grading_run(submission.assignment, submission.assignment.teacher_id)
+    job = run_job(run_jobs(app_module, run)[0].id)
+
+    assert job.status == JOB_DONE, job.error
+    assert submission.evaluation_result == static_evaluation(app_module.read_submission_content(submission))
+    assert fake_llm.calls == []
+    # 学习计划只能由大模型生成
+    assert app_module.latest_grading_job(submission.id, JOB_KIND_STUDY_PLAN) is None
@@ -0,0 +1,143 @@
+# tests/test_grading_jobs.py
+import threading
+import time
+
+import pytest
+
+from grading_jobs import (GradingWorkerPool, JOB_DONE, JOB_FAILED, JOB_KIND_EVALUATE, JOB_KIND_STUDY_PLAN,
+                          JOB_QUEUED)
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class Recorder:
+    """记录执行过的任务ID，可指定某些任务抛出异常"""
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.handled = []
+        self.lock = threading.Lock()
+
+    def __call__(self, job_id):
+        with self.lock:
+            self.handled.append(job_id)
+        if job_id in self.fail:
+            raise RuntimeError("模拟任务异常")
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def make(handler, **kwargs):
+        kwargs.setdefault('max_workers', 1)
+        kwargs.setdefault('poll_interval', 0.05)
+        pool = GradingWorkerPool(handler, **kwargs)
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.shutdown()
+
+
+def test_pool_runs_submitted_jobs(make_pool):
+    recorder = Recorder()
+    pool = make_pool(recorder, max_workers=2)
+    pool.start()
+    for job_id in (1, 2, 3):
+        pool.submit(job_id)
+    assert wait_until(lambda: sorted(recorder.handled) == [1, 2, 3])
+
+
+def test_pool_ignores_duplicate_submissions(make_pool):
+    recorder = Recorder()
+    pool = make_pool(recorder)
+    pool.submit(7)
+    pool.submit(7)
+    pool.start()
+    assert wait_until(lambda: recorder.handled == [7])
+    time.sleep(0.1)
+    assert recorder.handled == [7]
+
+
+def test_pool_survives_handler_errors(make_pool):
+    recorder = Recorder(fail={1})
+    pool = make_pool(recorder)
+    pool.start()
+    pool.submit(1)
+    pool.submit(2)
+    assert wait_until(lambda: recorder.handled == [1, 2])
+
+
+def test_pool_recovers_jobs_on_start_and_when_idle(make_pool):
+    recorder = Recorder()
+    pending = [(5, 'interactive', None)]
+    pool = make_pool(recorder, recover=lambda: list(pending))
+    pool.start()
+    assert wait_until(lambda: 5 in recorder.handled)
+
+    # 其他进程写入的任务在空闲扫描时拾取
+    pending[:] = [(6, 'backfill', 1)]
+    assert wait_until(lambda: 6 in recorder.handled)
+
+
+def test_pool_delays_submission(make_pool):
+    recorder = Recorder()
+    pool = make_pool(recorder)
+    pool.start()
+    pool.submit(9, delay=0.3)
+    time.sleep(0.1)
+    assert recorder.handled == []
+    assert wait_until(lambda: recorder.handled == [9])
+
+
+def test_enqueue_returns_active_job(app_module, make_submission):
+    submission = make_submission(file_name='homework.xyz')
+    job = app_module.enqueue_grading_job(submission)
+    assert job.status == JOB_QUEUED
+    assert app_module.enqueue_grading_job(submission).id == job.id
+    # 不同类型的任务互不影响
+    assert app_module.enqueue_grading_job(submission, JOB_KIND_STUDY_PLAN).id != job.id
+
+
+def test_unsupported_file_fails_job(app_module, make_submission, run_job):
+    submission = make_submission(file_name='homework.xyz')
+    job = run_job(app_module.enqueue_grading_job(submission).id)
+    assert job.status == JOB_FAILED
+    assert job.error == "此文件类型不支持自动评分"
+    assert job.attempts == 1
+    assert job.finished_at is not None
+
+    # 已结束的任务不会被再次认领执行
+    assert run_job(job.id).attempts == 1
+
+
+def test_failed_job_requeues_after_cooldown(app_module, make_submission, run_job, monkeypatch):
+    submission = make_submission(file_name='homework.xyz')
+    job = run_job(app_module.enqueue_grading_job(submission).id)
+
+    assert app_module.ensure_grading_job(submission, JOB_KIND_EVALUATE).id == job.id
+    monkeypatch.setattr(app_module.Config, 'GRADING_RETRY_COOLDOWN', -1)
+    retried = app_module.ensure_grading_job(submission, JOB_KIND_EVALUATE)
+    assert retried.id != job.id
+    assert retried.status == JOB_QUEUED
+
+
+def test_recover_lists_queued_jobs(app_module, make_submission):
+    submission = make_submission(file_name='homework.xyz')
+    queued = app_module.enqueue_grading_job(submission)
+    finished = app_module.enqueue_grading_job(submission, JOB_KIND_STUDY_PLAN)
+    finished.status = JOB_DONE
+    app_module.db.session.commit()
+
+    recovered = [item[0] for item in app_module.recover_grading_jobs()]
+    assert queued.id in recovered
+    assert finished.id not in recovered
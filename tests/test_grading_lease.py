@@ -0,0 +1,102 @@
+# tests/test_grading_lease.py
+from datetime import datetime, timedelta
+
+import pytest
+
+from grading_jobs import JOB_DONE, JOB_QUEUED
+
+HOMEWORK_LINES = ['##Begin', '题目1 求和', 'total = 0', 'for i in range(10):', '    total += i', 'print(total)',
+                  '##End']
+HOLDER_JOB_ID = 10 ** 6
+
+
+@pytest.fixture
+def no_poll_delay(app_module, monkeypatch):
+    monkeypatch.setattr(app_module.Config, 'GRADING_LEASE_POLL_INTERVAL', 0)
+
+
+def evaluate_lease_key(app_module, submission):
+    source_hash = app_module.content_hash(app_module.read_submission_content(submission))
+    app_module.db.session.commit()
+    return f"{submission.id}:evaluate:{source_hash}", source_hash
+
+
+def test_lease_is_exclusive_until_released(app_module):
+    key = 'lease-test:evaluate:exclusive'
+    assert app_module.acquire_grading_lease(key, 1)
+    assert not app_module.acquire_grading_lease(key, 2)
+    # 只有持有者能释放
+    app_module.release_grading_lease(key, 2)
+    assert not app_module.acquire_grading_lease(key, 2)
+    app_module.release_grading_lease(key, 1)
+    assert app_module.acquire_grading_lease(key, 2)
+
+
+def test_expired_lease_is_taken_over(app_module):
+    key = 'lease-test:evaluate:expired'
+    app_module.db.session.add(app_module.GradingLease(lease_key=key, job_id=1,
+                                                      expires_at=datetime.utcnow() - timedelta(seconds=1)))
+    app_module.db.session.commit()
+    assert app_module.acquire_grading_lease(key, 2)
+    assert app_module.db.session.get(app_module.GradingLease, key).job_id == 2
+
+
+def test_job_waits_for_lease_holder_and_reuses_its_result(app_module, make_submission, run_job, fake_llm,
+                                                           no_poll_delay):
+    submission = make_submission(HOMEWORK_LINES)
+    lease_key, source_hash = evaluate_lease_key(app_module, submission)
+    assert app_module.acquire_grading_lease(lease_key, HOLDER_JOB_ID)
+
+    # 租约被其他任务持有：放回队列，不调用大模型，也不计入尝试次数
+    job = run_job(app_module.enqueue_grading_job(submission).id)
+    assert job.status == JOB_QUEUED
+    assert job.attempts == 0
+    assert fake_llm.calls == []
+
+    # 持有者保存结果并释放租约后，排队的任务直接复用
+    submission.evaluation_result = "★★总分★★:77"
+    submission.evaluation_hash = source_hash
+    app_module.db.session.commit()
+    app_module.release_grading_lease(lease_key, HOLDER_JOB_ID)
+
+    job = run_job(job.id)
+    assert job.status == JOB_DONE
+    assert job.result == "★★总分★★:77"
+    assert fake_llm.calls == []
+
+
+def test_result_saved_just_before_lease_is_taken_is_reused(app_module, make_submission, run_job, fake_llm,
+                                                           monkeypatch):
+    submission = make_submission(HOMEWORK_LINES)
+    submission_id = submission.id
+    lease_key, source_hash = evaluate_lease_key(app_module, submission)
+    assert app_module.acquire_grading_lease(lease_key, HOLDER_JOB_ID)
+    acquire = app_module.acquire_grading_lease
+
+    def holder_finishes_first(key, job_id):
+        # 任务检查结果之后、获取租约之前，持有者保存结果并释放租约
+        holder_submission = app_module.db.session.get(app_module.Submission, submission_id)
+        holder_submission.evaluation_result = "★★总分★★:77"
+        holder_submission.evaluation_hash = source_hash
+        app_module.db.session.commit()
+        app_module.release_grading_lease(lease_key, HOLDER_JOB_ID)
+        return acquire(key, job_id)
+
+    monkeypatch.setattr(app_module, 'acquire_grading_lease', holder_finishes_first)
+    job = run_job(app_module.enqueue_grading_job(submission).id)
+    assert job.status == JOB_DONE
+    assert job.result == "★★总分★★:77"
+    assert fake_llm.calls == []
+    assert app_module.db.session.get(app_module.GradingLease, lease_key) is None
+
+def test_result_for_other_content_is_not_reused(app_module, make_submission, run_job, fake_llm, no_poll_delay):
+    submission = make_submission(HOMEWORK_LINES)
+    submission.evaluation_result = "★★总分★★:77"
+    submission.evaluation_hash = app_module.content_hash("旧文件的内容")
+    app_module.db.session.commit()
+
+    job = run_job(app_module.enqueue_grading_job(submission).id)
+    assert job.status == JOB_DONE
+    assert job.result == fake_llm.evaluation
+    assert app_module.GradingLease.query.filter(
+        app_module.GradingLease.lease_key.startswith(f"{submission.id}:")).count() == 0
@@ -0,0 +1,193 @@
+# tests/test_grading_scheduler.py
+import threading
+
+from config import Config
+from grading_jobs import JOB_DONE, JOB_FAILED, JOB_KIND_EVALUATE, JOB_KIND_STUDY_PLAN
+from grading_scheduler import (GradingScheduler, PRIORITY_BACKFILL, PRIORITY_DEADLINE, PRIORITY_INTERACTIVE,
+                               ScheduledClient, higher_priority)
+from homework_LLM_grader import static_evaluation
+
+WEIGHTS = {PRIORITY_INTERACTIVE: 8, PRIORITY_DEADLINE: 3, PRIORITY_BACKFILL: 1}
+NO_LIMITS = {PRIORITY_INTERACTIVE: 100, PRIORITY_DEADLINE: 100, PRIORITY_BACKFILL: 100}
+HOMEWORK_LINES = ['##Begin', '题目1 求和', 'total = 0', 'for i in range(10):', '    total += i', 'print(total)',
+                  '##End']
+
+
+def make_scheduler(job_limits=None, call_limits=None):
+    return GradingScheduler(weights=WEIGHTS, job_limits=job_limits or NO_LIMITS,
+                            call_limits=call_limits or NO_LIMITS)
+
+
+def drain(scheduler, count):
+    order = []
+    for _ in range(count):
+        job_id, priority = scheduler.get(timeout=0)
+        scheduler.task_done(priority)
+        order.append(job_id)
+    return order
+
+
+def test_higher_priority():
+    assert higher_priority(PRIORITY_INTERACTIVE, PRIORITY_BACKFILL)
+    assert not higher_priority(PRIORITY_BACKFILL, PRIORITY_DEADLINE)
+
+
+def test_weighted_fair_order_across_classes():
+    scheduler = make_scheduler()
+    for i in range(20):
+        scheduler.put(100 + i, PRIORITY_INTERACTIVE)
+        scheduler.put(200 + i, PRIORITY_DEADLINE)
+        scheduler.put(300 + i, PRIORITY_BACKFILL)
+    order = drain(scheduler, 12)
+    counts = {cls: sum(1 for job_id in order if job_id // 100 == n)
+              for n, cls in enumerate((PRIORITY_INTERACTIVE, PRIORITY_DEADLINE, PRIORITY_BACKFILL), 1)}
+    # 按 8:3:1 的权重出队，回填任务不会被饿死
+    assert counts == {PRIORITY_INTERACTIVE: 8, PRIORITY_DEADLINE: 3, PRIORITY_BACKFILL: 1}
+    assert order[0] == 100
+
+
+def test_idle_class_does_not_bank_credit():
+    scheduler = make_scheduler()
+    for i in range(10):
+        scheduler.put(100 + i, PRIORITY_INTERACTIVE)
+    drain(scheduler, 10)
+    for i in range(10):
+        scheduler.put(100 + i, PRIORITY_INTERACTIVE)
+        scheduler.put(300 + i, PRIORITY_BACKFILL)
+    # 回填类别空闲期间没有积攒额度，不会连续占用出队机会
+    assert sum(1 for job_id in drain(scheduler, 9) if job_id >= 300) == 1
+
+
+def test_round_robin_across_courses():
+    scheduler = make_scheduler()
+    for i in range(4):
+        scheduler.put(10 + i, PRIORITY_BACKFILL, course_id=1)
+    scheduler.put(20, PRIORITY_BACKFILL, course_id=2)
+    scheduler.put(30, PRIORITY_BACKFILL, course_id=3)
+    # 大班的任务不会排在其他课程前面占满队列
+    assert drain(scheduler, 6) == [10, 20, 30, 11, 12, 13]
+
+
+def test_duplicate_put_promotes_priority():
+    scheduler = make_scheduler()
+    assert scheduler.put(1, PRIORITY_BACKFILL)
+    assert scheduler.put(2, PRIORITY_BACKFILL)
+    assert not scheduler.put(2, PRIORITY_BACKFILL)
+    assert not scheduler.put(2, PRIORITY_INTERACTIVE)
+    assert scheduler.stats()[PRIORITY_INTERACTIVE]['queued'] == 1
+    assert scheduler.get(timeout=0) == (2, PRIORITY_INTERACTIVE)
+    # 已在更高类别中的任务不会被降级
+    scheduler.put(3, PRIORITY_INTERACTIVE)
+    scheduler.put(3, PRIORITY_BACKFILL)
+    assert scheduler.stats()[PRIORITY_BACKFILL]['queued'] == 1
+
+
+def test_job_limit_per_class():
+    scheduler = make_scheduler(job_limits=dict(NO_LIMITS, backfill=1))
+    scheduler.put(1, PRIORITY_BACKFILL)
+    scheduler.put(2, PRIORITY_BACKFILL)
+    assert scheduler.get(timeout=0) == (1, PRIORITY_BACKFILL)
+    assert scheduler.get(timeout=0.05) is None
+    # 达到上限的类别不影响其他类别出队
+    scheduler.put(3, PRIORITY_INTERACTIVE)
+    assert scheduler.get(timeout=0) == (3, PRIORITY_INTERACTIVE)
+    scheduler.task_done(PRIORITY_BACKFILL)
+    assert scheduler.get(timeout=0) == (2, PRIORITY_BACKFILL)
+
+
+def test_get_wakes_up_on_put_and_close():
+    scheduler = make_scheduler()
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(scheduler.get(timeout=5)))
+    waiter.start()
+    scheduler.put(7)
+    waiter.join(timeout=5)
+    assert results == [(7, PRIORITY_INTERACTIVE)]
+
+    waiter = threading.Thread(target=lambda: results.append(scheduler.get(timeout=5)))
+    waiter.start()
+    scheduler.close()
+    waiter.join(timeout=5)
+    assert results[-1] is None
+
+
+class SlotClient:
+    def __init__(self, scheduler, priority):
+        self.scheduler = scheduler
+        self.priority = priority
+        self.hedge_slots = []
+
+    def chat(self, messages, hedge_slot=None, **kwargs):
+        self.hedge_slots.append(hedge_slot())
+        return "ok"
+
+    def chat_stream(self, messages, **kwargs):
+        yield "ok"
+
+    def answered_model(self):
+        return None
+
+
+def test_scheduled_client_counts_hedges_against_call_limit():
+    scheduler = make_scheduler(call_limits=dict(NO_LIMITS, backfill=2))
+    client = SlotClient(scheduler, PRIORITY_BACKFILL)
+    scheduled = scheduler.client_for(PRIORITY_BACKFILL, client)
+    assert isinstance(scheduled, ScheduledClient)
+    assert scheduled.chat([]) == "ok"
+    # 对冲请求另外占用一个名额，直到对冲请求结束才释放
+    release = client.hedge_slots[0]
+    assert release is not None
+    other = scheduler.try_call_slot(PRIORITY_BACKFILL)
+    assert other is not None
+    assert scheduler.try_call_slot(PRIORITY_BACKFILL) is None
+    release()
+    other()
+    assert list(scheduled.chat_stream([])) == ["ok"]
+
+
+def test_no_hedge_when_call_limit_is_full():
+    scheduler = make_scheduler(call_limits=dict(NO_LIMITS, backfill=1))
+    client = SlotClient(scheduler, PRIORITY_BACKFILL)
+    scheduler.client_for(PRIORITY_BACKFILL, client).chat([])
+    assert client.hedge_slots == [None]
+
+
+def test_enqueue_promotes_queued_job(app_module, make_submission):
+    submission = make_submission(file_name='homework.xyz')
+    job = app_module.enqueue_grading_job(submission, JOB_KIND_EVALUATE, PRIORITY_BACKFILL)
+    assert job.priority == PRIORITY_BACKFILL
+
+    # 学生打开预览页时，排队中的批量任务提升为交互类别，不会重复创建
+    same = app_module.enqueue_grading_job(submission, JOB_KIND_EVALUATE, PRIORITY_INTERACTIVE)
+    assert same.id == job.id
+    assert same.priority == PRIORITY_INTERACTIVE
+    assert app_module.enqueue_grading_job(submission, JOB_KIND_EVALUATE, PRIORITY_DEADLINE).priority \
+        == PRIORITY_INTERACTIVE
+    assert app_module.grading_pool.scheduler._where[job.id][0] == PRIORITY_INTERACTIVE
+
+
+def test_recover_keeps_priority_and_course(app_module, make_submission):
+    submission = make_submission(file_name='homework.xyz')
+    job = app_module.enqueue_grading_job(submission, JOB_KIND_EVALUATE, PRIORITY_DEADLINE)
+    assert (job.id, PRIORITY_DEADLINE, submission.assignment.course_id) in app_module.recover_grading_jobs()
+
+
+def test_background_jobs_grade_statically_without_llm(app_module, make_submission, run_job, fake_llm, monkeypatch):
+    monkeypatch.setattr(app_module.Config, 'IS_LLM_RUN', False)
+    submission = make_submission(HOMEWORK_LINES)
+    job = run_job(app_module.enqueue_grading_job(submission).id)
+    assert job.status == JOB_DONE, job.error
+    assert submission.evaluation_result == static_evaluation(app_module.read_submission_content(submission))
+    assert fake_llm.calls == []
+
+    # 学习计划只能由大模型生成：评分后不排队，已排队的任务给出原因
+    assert app_module.latest_grading_job(submission.id, JOB_KIND_STUDY_PLAN) is None
+    plan_job = run_job(app_module.enqueue_grading_job(submission, JOB_KIND_STUDY_PLAN).id)
+    assert plan_job.status == JOB_FAILED
+    assert plan_job.error == "未使用大模型，不生成学习计划"
+
+
+def test_batch_classes_run_in_parallel():
+    # 批量评分至少两份同时进行，且不会占满全部工作线程
+    for priority in (PRIORITY_DEADLINE, PRIORITY_BACKFILL):
+        assert 2 <= Config.SCHEDULER_JOB_LIMITS[priority] <= max(2, Config.GRADING_WORKERS // 2)
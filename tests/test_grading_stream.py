@@ -0,0 +1,124 @@
+# tests/test_grading_stream.py
+import threading
+import time
+
+from grading_stream import GradingStreamHub
+
+KEY = (1, 'evaluate')
+
+
+def collect(events, stop_at_idle=False):
+    result = []
+    for event in events:
+        result.append(event)
+        if event[0] == 'end' or (stop_at_idle and event[0] == 'idle'):
+            break
+    return result
+
+
+def listen_in_background(hub, key=KEY):
+    events = []
+    thread = threading.Thread(target=lambda: events.extend(collect(hub.listen(key, poll_interval=0.01))))
+    thread.daemon = True
+    thread.start()
+    # 等订阅生效后再继续发布，订阅晚于结束时会拿到新的空频道
+    deadline = time.monotonic() + 5
+    while hub._channels[key].listeners == 0 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return events, thread
+
+
+def test_late_subscriber_gets_earlier_output():
+    hub = GradingStreamHub()
+    hub.start(KEY)
+    hub.publish(KEY, '总分')
+    hub.publish(KEY, '：90')
+    events, thread = listen_in_background(hub)
+    hub.publish(KEY, '分')
+    hub.finish(KEY)
+    thread.join(timeout=5)
+
+    assert ''.join(text for kind, text in events if kind == 'delta') == '总分：90分'
+    assert events[-1] == ('end', None)
+
+
+def test_subscriber_receives_error():
+    hub = GradingStreamHub()
+    hub.start(KEY)
+    events, thread = listen_in_background(hub)
+    hub.publish(KEY, '题目1')
+    hub.finish(KEY, '评分失败')
+    thread.join(timeout=5)
+
+    assert ''.join(text for kind, text in events if kind == 'delta') == '题目1'
+    assert events[-1] == ('end', '评分失败')
+
+
+def test_idle_events_while_waiting():
+    hub = GradingStreamHub()
+    hub.start(KEY)
+    assert collect(hub.listen(KEY, poll_interval=0.01), stop_at_idle=True) == [('idle', None)]
+
+
+def test_unused_channel_is_dropped_after_listener_leaves():
+    hub = GradingStreamHub()
+    # 评分任务不在本进程运行时，订阅方创建的空频道不保留
+    collect(hub.listen(KEY, poll_interval=0.01), stop_at_idle=True)
+    assert KEY not in hub._channels
+
+    hub.start(KEY)
+    collect(hub.listen(KEY, poll_interval=0.01), stop_at_idle=True)
+    assert KEY in hub._channels
+
+
+def test_new_run_starts_a_fresh_channel():
+    hub = GradingStreamHub()
+    hub.start(KEY)
+    hub.publish(KEY, '旧结果')
+    hub.finish(KEY)
+
+    # 已结束的频道不再重放，新的评分从空频道开始
+    hub.start(KEY)
+    hub.publish(KEY, '新结果')
+    events, thread = listen_in_background(hub)
+    hub.finish(KEY)
+    thread.join(timeout=5)
+    assert events == [('delta', '新结果'), ('end', None)]
+
+
+def test_finished_channels_expire():
+    hub = GradingStreamHub(retention_seconds=0)
+    hub.start(KEY)
+    hub.finish(KEY)
+    hub.start((2, 'evaluate'))
+    assert KEY not in hub._channels
+
+
+def stream_body(app_module, submission):
+    client = app_module.app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = submission.student_id
+        session['role'] = 'student'
+    return client.get(f'/preview/{submission.id}/stream').get_data(as_text=True)
+
+
+def test_preview_stream_sends_stored_result(app_module, make_submission):
+    submission = make_submission(file_name='homework.xyz')
+    submission.evaluation_result = '总分：90分'
+    app_module.db.session.commit()
+
+    body = stream_body(app_module, submission)
+    assert 'event: snapshot' in body
+    assert '总分：90分' in body
+    assert body.rstrip().endswith('data: {}')
+
+
+def test_preview_stream_closes_when_idle(app_module, make_submission, monkeypatch):
+    submission = make_submission(file_name='homework.xyz')
+    app_module.enqueue_grading_job(submission)
+    monkeypatch.setattr(app_module.Config, 'STREAM_IDLE_SECONDS', 0)
+
+    # 任务一直在排队时断开连接，页面改为轮询
+    body = stream_body(app_module, submission)
+    assert 'event: timeout' in body
+    assert 'event: snapshot' not in body
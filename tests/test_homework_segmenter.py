@@ -0,0 +1,77 @@
+# tests/test_homework_segmenter.py
+import pytest
+
+from benchmark_grader import sample_homework
+from homework_segmenter import is_code_statement, preflight_check, segment_homework, segment_question
+
+
+def test_segment_question_with_headings():
+    segment = segment_question("题目1 求和\n输入两个整数，输出它们的和\n源代码：\na = int(input())\nb = int(input())\n"
+                               "print(a + b)\n运行结果：\n3\n小结：掌握了 input 的用法")
+    assert segment['title'] == '题目1 求和'
+    assert segment['prompt'] == '输入两个整数，输出它们的和'
+    assert segment['code'] == 'a = int(input())\nb = int(input())\nprint(a + b)'
+    assert segment['output'] == '3'
+    assert segment['summary'] == '掌握了 input 的用法'
+
+
+def test_segment_question_without_code_heading():
+    segment = segment_question("题目2 循环\n打印0到2\nfor i in range(3):\n    print(i)\n运行结果：0 1 2")
+    assert segment['prompt'] == '打印0到2'
+    assert segment['code'] == 'for i in range(3):\n    print(i)'
+    assert segment['output'] == '0 1 2'
+
+
+def test_segment_homework_positions():
+    segments = segment_homework("##Begin\n题目1\nx = 1\n题目2\ny = 2\n##End")
+    assert [segment['position'] for segment in segments] == [0, 1]
+    assert [segment['code'] for segment in segments] == ['x = 1', 'y = 2']
+
+
+@pytest.mark.parametrize('line', [
+    'x = 1',
+    'print(x)',
+    'for i in range(3):',
+    'import math',
+    'def area(r):',
+    'return r * r',
+])
+def test_code_statements(line):
+    assert is_code_statement(line)
+
+
+@pytest.mark.parametrize('line', [
+    'hello world',
+    'Hello',
+    '请输入一个整数',
+    'Answer: 42',
+    '42',
+    '"说明文字"',
+    '',
+])
+def test_prose_is_not_code(line):
+    assert not is_code_statement(line)
+
+
+@pytest.mark.parametrize('content, reason', [
+    ('', '作业内容为空'),
+    ('   \n', '作业内容为空'),
+    ('##Begin\n题目1\nx = 1', '缺少 ##End'),
+    ('题目1\nx = 1\n##End', '缺少 ##Begin'),
+    ('##Begin\n\n##End', '没有作业内容'),
+    ('##Begin\n题目1 总结\n本次作业学会了循环\n##End', '没有找到Python代码'),
+    ('hello world', '没有找到Python代码'),
+    ('##Begin\n题目1 总结\n本次作业学会了循环\nAnswer: 42\n##End', '没有找到Python代码'),
+])
+def test_preflight_rejects(content, reason):
+    assert reason in preflight_check(content)
+
+
+@pytest.mark.parametrize('content', [
+    sample_homework(0),
+    sample_homework(3),
+    '##Begin\n题目1\nfor i in range(3)\n    print(i)\n##End',  # 有语法错误的代码仍然交给评分
+    'print("hello world")',
+])
+def test_preflight_accepts(content):
+    assert preflight_check(content) is None
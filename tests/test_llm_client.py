@@ -0,0 +1,184 @@
+# tests/test_llm_client.py
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import llm_client
+from llm_client import (CircuitBreaker, CircuitOpenError, LLMClient, LLMHTTPError, get_shared_client,
+                        parse_retry_after)
+
+MESSAGES = [{'role': 'user', 'content': '你好'}]
+
+
+class StubServer:
+    """按预设顺序返回状态码的 chat completions 接口，之后的请求都返回 200"""
+
+    def __init__(self, responses=()):
+        self.responses = list(responses)  # (状态码, 响应头)
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                request = json.loads(self.rfile.read(length))
+                stub.requests.append(request)
+                status, headers = stub.responses.pop(0) if stub.responses else (200, {})
+                if status == 200 and request.get('stream'):
+                    events = [{'choices': [{'delta': {'content': text}}]} for text in ('评分', '完成')]
+                    body = ''.join(f"data: {json.dumps(event, ensure_ascii=False)}\n\n" for event in events)
+                    body = (body + "data: [DONE]\n\n").encode('utf-8')
+                elif status == 200:
+                    body = json.dumps({'choices': [{'message': {'content': 'ok'}}],
+                                       'usage': {'total_tokens': 10}}).encode('utf-8')
+                else:
+                    body = b'{"error": "stub"}'
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/v1/chat/completions'
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """记录重试前的等待时间，不实际等待"""
+    recorded = []
+    monkeypatch.setattr(llm_client.time, 'sleep', recorded.append)
+    return recorded
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def make(responses=()):
+        server = StubServer(responses)
+        servers.append(server)
+        return server
+
+    yield make
+    for server in servers:
+        server.stop()
+
+
+def test_chat_returns_reply(stub):
+    server = stub()
+    client = LLMClient(server.url, 'key')
+    assert client.chat(MESSAGES, model='m', temperature=0.1, max_tokens=50) == 'ok'
+    assert server.requests[0]['model'] == 'm'
+    assert server.requests[0]['max_tokens'] == 50
+
+
+def test_chat_stream_yields_deltas(stub, sleeps):
+    server = stub([(503, {})])
+    client = LLMClient(server.url, 'key')
+    assert list(client.chat_stream(MESSAGES, model='m', temperature=0.1)) == ['评分', '完成']
+    assert server.requests[-1]['stream'] is True
+    # 开始输出前的错误同样重试
+    assert len(server.requests) == 2
+
+
+def test_retries_server_errors(stub, sleeps):
+    server = stub([(503, {}), (502, {})])
+    client = LLMClient(server.url, 'key')
+    assert client.chat(MESSAGES, model='m', temperature=0.1, max_retries=3) == 'ok'
+    assert len(server.requests) == 3
+    assert len(sleeps) == 2
+
+
+def test_honours_retry_after(stub, sleeps):
+    server = stub([(429, {'Retry-After': '2'})])
+    client = LLMClient(server.url, 'key')
+    assert client.chat(MESSAGES, model='m', temperature=0.1) == 'ok'
+    assert sleeps == [2.0]
+
+
+def test_gives_up_after_max_retries(stub, sleeps):
+    server = stub([(500, {})] * 3)
+    client = LLMClient(server.url, 'key')
+    with pytest.raises(LLMHTTPError) as excinfo:
+        client.chat(MESSAGES, model='m', temperature=0.1, max_retries=2)
+    assert excinfo.value.status_code == 500
+    assert len(server.requests) == 2
+
+
+def test_client_errors_are_not_retried(stub, sleeps):
+    server = stub([(400, {})])
+    client = LLMClient(server.url, 'key')
+    with pytest.raises(LLMHTTPError) as excinfo:
+        client.chat(MESSAGES, model='m', temperature=0.1)
+    assert excinfo.value.status_code == 400
+    assert len(server.requests) == 1
+    assert sleeps == []
+
+
+def test_circuit_opens_after_consecutive_failures(stub, sleeps):
+    server = stub([(500, {})] * 2)
+    client = LLMClient(server.url, 'key')
+    client.circuit_breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    with pytest.raises(LLMHTTPError):
+        client.chat(MESSAGES, model='m', temperature=0.1, max_retries=2)
+    # 熔断期间直接拒绝，不再发出请求
+    with pytest.raises(CircuitOpenError):
+        client.chat(MESSAGES, model='m', temperature=0.1)
+    assert len(server.requests) == 2
+
+
+def test_rate_limit_responses_do_not_open_circuit(stub, sleeps):
+    server = stub([(429, {})] * 2)
+    client = LLMClient(server.url, 'key')
+    client.circuit_breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    assert client.chat(MESSAGES, model='m', temperature=0.1, max_retries=3) == 'ok'
+    assert client.circuit_breaker.state == CircuitBreaker.CLOSED
+
+
+def test_circuit_half_open_allows_one_probe(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(llm_client.time, 'monotonic', lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+    now[0] += 11
+    breaker.allow()
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    # 试探失败后重新熔断，成功后恢复
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    now[0] += 11
+    breaker.allow()
+    breaker.record_success()
+    breaker.allow()
+    breaker.allow()
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('3') == 3.0
+    assert parse_retry_after('-1') == 0.0
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+    assert parse_retry_after('soon') is None
+
+
+def test_shared_client_per_endpoint():
+    first = get_shared_client('http://example.invalid/a', 'key')
+    assert get_shared_client('http://example.invalid/a', 'key') is first
+    assert get_shared_client('http://example.invalid/b', 'key') is not first
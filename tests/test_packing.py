@@ -0,0 +1,96 @@
+# tests/test_packing.py
+import re
+
+import pytest
+
+from config import Config
+from evaluation_cache import EvaluationCache
+from homework_LLM_grader import PythonCodeGrader
+from mock_llm_server import canned_reply
+from score_parser import parse_evaluation
+
+
+def homework(n, lines=3):
+    body = "\n".join(f"x{i} = {n} + {i}\nprint(x{i})" for i in range(lines))
+    return f"##Begin\n题目1 作业{n}\n{body}\n##End"
+
+
+class PackingClient:
+    """用模拟服务的固定回复作答，可让合并回复漏掉部分作业"""
+
+    def __init__(self, drop=()):
+        self.drop = set(drop)
+        self.calls = []
+
+    def chat(self, messages, **kwargs):
+        self.calls.append(messages)
+        reply = canned_reply({'messages': messages, 'model': 'test'})
+        for submission_id in self.drop:
+            reply = re.sub(rf'===评分 {submission_id}===.*?===评分 {submission_id} 结束===', '', reply, flags=re.S)
+        return reply
+
+    def answered_model(self):
+        return None
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return EvaluationCache(db_path=str(tmp_path / 'cache.db'))
+
+
+def packed_calls(client):
+    return [messages for messages in client.calls if '===作业' in messages[-1]['content']]
+
+
+def test_short_submissions_share_one_request(cache):
+    client = PackingClient()
+    grader = PythonCodeGrader(client=client, cache=cache)
+    submissions = [{'id': n, 'content': homework(n)} for n in range(1, 4)]
+    results = grader.evaluate_packed(submissions)
+
+    assert list(results) == ['1', '2', '3']
+    assert len(client.calls) == 1
+    assert all(parse_evaluation(result) for result in results.values())
+
+
+def test_missing_block_is_graded_alone(cache):
+    client = PackingClient(drop={'2'})
+    grader = PythonCodeGrader(client=client, cache=cache)
+    submissions = [{'id': n, 'content': homework(n)} for n in range(1, 4)]
+    results = grader.evaluate_packed(submissions)
+
+    assert len(client.calls) == 2
+    assert '===作业' not in client.calls[1][-1]['content']
+    assert all(parse_evaluation(result) for result in results.values())
+
+
+def test_pack_limits(cache, monkeypatch):
+    monkeypatch.setattr(Config, 'PACK_MAX_SUBMISSIONS', 2)
+    client = PackingClient()
+    grader = PythonCodeGrader(client=client, cache=cache)
+    submissions = [{'id': n, 'content': homework(n)} for n in range(1, 6)]
+    grader.evaluate_packed(submissions, max_in_flight=1)
+    assert [len(re.findall(r'===作业 \S+?===', messages[-1]['content'])) for messages in packed_calls(client)] \
+        == [2, 2]
+    assert len(client.calls) == 3
+
+
+def test_long_submissions_are_not_packed(cache, monkeypatch):
+    monkeypatch.setattr(Config, 'PACK_MAX_SUBMISSION_TOKENS', 40)
+    client = PackingClient()
+    grader = PythonCodeGrader(client=client, cache=cache)
+    submissions = [{'id': 1, 'content': homework(1, lines=1)}, {'id': 2, 'content': homework(2, lines=1)},
+                   {'id': 3, 'content': homework(3, lines=40)}]
+    grader.evaluate_packed(submissions)
+    assert len(packed_calls(client)) == 1
+    assert len(client.calls) == 2
+
+
+def test_packed_results_fill_the_single_cache(cache):
+    client = PackingClient()
+    grader = PythonCodeGrader(client=client, cache=cache)
+    results = grader.evaluate_packed([{'id': n, 'content': homework(n)} for n in range(1, 3)])
+
+    # 合并评分的结果与单独评分共用缓存
+    assert grader.evaluate_code_2(homework(1)) == results['1']
+    assert len(client.calls) == 1
@@ -0,0 +1,61 @@
+# tests/test_prompt_budget.py
+from prompt_budget import REPEATED_MARK, compact_homework, count_tokens, fit_to_budget
+
+HOMEWORK = """题目1 打印
+源代码：
+print()
+print()
+print()
+for i in range(3):
+    pass
+    pass
+    pass
+运行结果：
+hello
+hello
+hello
+hello
+小结：重复输出
+"""
+
+
+def test_compact_keeps_repeated_code_lines():
+    compacted = compact_homework(HOMEWORK)
+    code = compacted.split('运行结果')[0]
+    assert code.count('print()') == 3
+    assert code.count('    pass') == 3
+    assert REPEATED_MARK.format(2) not in code
+
+
+def test_compact_collapses_repeated_output_lines():
+    compacted = compact_homework(HOMEWORK)
+    output = compacted.split('运行结果')[1].split('小结')[0]
+    assert output.count('hello') == 1
+    assert REPEATED_MARK.format(3) in output
+
+
+def test_compact_replaces_duplicate_output_section():
+    content = "题目1\nprint(1)\n运行结果：\n1\n题目2\nprint(1)\n运行结果：\n1\n"
+    assert "（与前面的运行结果相同）" in compact_homework(content)
+
+
+def test_fit_to_budget_truncates_output_before_code():
+    code = "\n".join(f"x{i} = {i}" for i in range(20))
+    output = "\n".join(f"line {i}" for i in range(400))
+    content = f"题目1\n源代码：\n{code}\n运行结果：\n{output}\n"
+    fitted = fit_to_budget(content, count_tokens(code) + 100)
+    assert count_tokens(fitted) <= count_tokens(code) + 100
+    assert code in fitted
+    assert "line 399" not in fitted
+
+
+def test_fit_to_budget_keeps_whole_lines():
+    content = "\n".join(f"value_{i} = compute({i}, {i + 1})" for i in range(200))
+    fitted = fit_to_budget(content, 50)
+    assert count_tokens(fitted) <= 50
+    lines = set(content.split('\n'))
+    assert all(line in lines or line.startswith('……') for line in fitted.split('\n'))
+
+
+def test_fit_to_budget_unlimited():
+    assert fit_to_budget(HOMEWORK, 0) == compact_homework(HOMEWORK)
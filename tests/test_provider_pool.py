@@ -0,0 +1,137 @@
+# tests/test_provider_pool.py
+import threading
+import time
+
+import pytest
+
+from config import Config
+from llm_client import LLMHTTPError
+from mock_llm_server import MockLLMServer
+from provider_pool import Provider, ProviderPool
+
+MESSAGES = [{'role': 'user', 'content': '你好'}]
+
+
+class FakeProvider:
+    """按设定的延迟回复或失败的服务，记录调用次数"""
+
+    def __init__(self, name, delay=0.0, fail=False, hedge_delay=0.05, stream_fail=False):
+        self.name = name
+        self.model = f'{name}-model'
+        self.delay = delay
+        self.fail = fail
+        self.stream_fail = stream_fail
+        self._hedge_delay = hedge_delay
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def available(self):
+        return True
+
+    def hedge_delay(self):
+        return self._hedge_delay
+
+    def chat(self, messages, max_tokens, max_retries, label):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise LLMHTTPError(f"{self.name} 503", 503)
+        return f"{self.name} 的回复"
+
+    def chat_stream(self, messages, max_tokens, max_retries, label):
+        with self.lock:
+            self.calls += 1
+        if self.stream_fail:
+            raise LLMHTTPError(f"{self.name} 503", 503)
+        yield f"{self.name} "
+        yield "的回复"
+
+
+def test_failover_to_backup():
+    primary, backup = FakeProvider('primary', fail=True), FakeProvider('backup')
+    pool = ProviderPool([primary, backup], hedge=False)
+    assert pool.chat(MESSAGES) == "backup 的回复"
+    assert (primary.calls, backup.calls) == (1, 1)
+
+
+def test_all_providers_failing_raises():
+    pool = ProviderPool([FakeProvider('a', fail=True), FakeProvider('b', fail=True)], hedge=False)
+    with pytest.raises(LLMHTTPError):
+        pool.chat(MESSAGES)
+
+
+def test_hedged_call_returns_faster_provider():
+    primary, backup = FakeProvider('primary', delay=0.5), FakeProvider('backup', delay=0.01)
+    pool = ProviderPool([primary, backup], hedge=True)
+    start = time.perf_counter()
+    assert pool.chat(MESSAGES) == "backup 的回复"
+    assert time.perf_counter() - start < 0.4
+    assert pool.answered_model() == 'backup-model'
+
+
+def test_fast_primary_is_not_hedged():
+    primary, backup = FakeProvider('primary'), FakeProvider('backup')
+    pool = ProviderPool([primary, backup], hedge=True)
+    assert pool.chat(MESSAGES) == "primary 的回复"
+    assert backup.calls == 0
+    assert pool.answered_model() == 'primary-model'
+
+
+def test_hedge_needs_a_free_call_slot():
+    primary, backup = FakeProvider('primary', delay=0.2), FakeProvider('backup')
+    pool = ProviderPool([primary, backup], hedge=True)
+    # 并发名额已满时只等待主服务
+    assert pool.chat(MESSAGES, hedge_slot=lambda: None) == "primary 的回复"
+    assert backup.calls == 0
+
+    released = []
+    primary.delay = 0.5
+    assert pool.chat(MESSAGES, hedge_slot=lambda: lambda: released.append(True)) == "backup 的回复"
+    assert released == [True]
+
+
+def test_hedged_primary_failure_falls_through_to_remaining_providers():
+    primary = FakeProvider('primary', fail=True, delay=0.2)
+    backup = FakeProvider('backup', fail=True)
+    third = FakeProvider('third')
+    pool = ProviderPool([primary, backup, third], hedge=True)
+    assert pool.chat(MESSAGES) == "third 的回复"
+
+
+def test_stream_fails_over_before_first_chunk():
+    primary, backup = FakeProvider('primary', stream_fail=True), FakeProvider('backup')
+    pool = ProviderPool([primary, backup])
+    assert ''.join(pool.chat_stream(MESSAGES)) == "backup 的回复"
+    assert pool.answered_model() == 'backup-model'
+
+
+def test_real_providers_fail_over_and_track_health(monkeypatch):
+    monkeypatch.setattr(Config, 'LLM_BACKOFF_MAX', 0)
+    broken = MockLLMServer(error_rate=1.0).start()
+    healthy = MockLLMServer().start()
+    try:
+        primary = Provider('primary', broken.url, 'key-primary', 'm1', 0.1)
+        backup = Provider('backup', healthy.url, 'key-backup', 'm2', 0.1)
+        pool = ProviderPool([primary, backup], hedge=False)
+        assert pool.chat([{'role': 'system', 'content': '评分'}, {'role': 'user', 'content': 'print(1)'}])
+        assert primary.failures == 1
+        assert backup.successes == 1
+        assert pool.answered_model() == 'm2'
+    finally:
+        broken.stop()
+        healthy.stop()
+
+
+def test_hedge_delay_follows_latency_p95(monkeypatch):
+    monkeypatch.setattr(Config, 'HEDGE_MIN_SAMPLES', 3)
+    monkeypatch.setattr(Config, 'HEDGE_MIN_DELAY', 0.5)
+    provider = Provider('p', 'http://127.0.0.1:9/v1/chat/completions', 'key-hedge', 'm', 0.1)
+    assert provider.hedge_delay() == Config.HEDGE_DEFAULT_DELAY
+    for latency in (1.0, 2.0, 3.0):
+        provider._record(True, latency)
+    assert provider.hedge_delay() == 3.0
+    provider.latencies.clear()
+    for latency in (0.1, 0.1, 0.1):
+        provider._record(True, latency)
+    assert provider.hedge_delay() == 0.5
@@ -0,0 +1,142 @@
+# tests/test_question_grading.py
+import json
+import threading
+import time
+
+import pytest
+
+import Promptconfig
+from evaluation_cache import EvaluationCache
+from homework_LLM_grader import PythonCodeGrader
+from homework_parser import split_questions
+
+HOMEWORK = """说明文字
+##Begin
+题目1 求和
+total = 0
+for i in range(10):
+    total += i
+print(total)
+题目2 判断奇偶
+n = int(input())
+if n % 2 == 0:
+    print("even")
+##End
+"""
+
+QUESTIONS = [{'prompt': '求0到9的和', 'knowledge_point': 'for循环'},
+             {'prompt': '判断奇偶', 'knowledge_point': 'if分支'}]
+
+
+class QuestionClient:
+    """按题目要求给出JSON评分，记录每次请求和同时在途的请求数"""
+
+    def __init__(self, scores=None, delay=0.0):
+        self.scores = scores or {'求0到9的和': 80, '判断奇偶': 60}
+        self.delay = delay
+        self.calls = []
+        self.in_flight = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def chat(self, messages, **kwargs):
+        with self.lock:
+            self.calls.append(messages)
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+        for requirement, total in self.scores.items():
+            if requirement in messages[1]['content']:
+                if total is None:
+                    return "❌ 评分失败：请求超时"
+                return json.dumps({
+                    "总分": total,
+                    "详细评分": {"正确性": total - 40, "知识点使用": 30, "可读性": 6, "健壮性": 4},
+                    "优点": f"{requirement}实现正确", "缺点": "无", "建议": "无"
+                }, ensure_ascii=False)
+        return "无法识别的题目"
+
+    def answered_model(self):
+        return None
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return EvaluationCache(db_path=str(tmp_path / 'cache.db'))
+
+
+def test_split_questions():
+    answers = split_questions(HOMEWORK)
+    assert len(answers) == 2
+    assert answers[0].startswith('题目1')
+    assert 'even' in answers[1]
+    assert split_questions("##Begin\nprint(1)\n##End") == ["print(1)"]
+    assert split_questions("") == []
+
+
+def test_questions_graded_with_their_knowledge_points(cache):
+    client = QuestionClient()
+    grader = PythonCodeGrader(client=client, cache=cache)
+    result = grader.evaluate_by_questions(split_questions(HOMEWORK), QUESTIONS)
+
+    assert len(client.calls) == 2
+    prompts = {messages[0]['content'] for messages in client.calls}
+    assert prompts == {Promptconfig.build_question_prompt('for循环'), Promptconfig.build_question_prompt('if分支')}
+
+    assert "完成题目数量：2" in result
+    assert "★★总分★★:70.0" in result
+    assert '正确性:"30.0"' in result
+    assert "题目1（知识点：for循环）：80.0分" in result
+    assert "题目2（知识点：if分支）：60.0分" in result
+    assert "题目1：求0到9的和实现正确" in result
+
+
+def test_questions_graded_concurrently(cache):
+    client = QuestionClient(delay=0.1)
+    grader = PythonCodeGrader(client=client, cache=cache)
+    results = list(grader.iter_evaluate_by_questions(split_questions(HOMEWORK), QUESTIONS))
+    assert sorted(result['index'] for result in results) == [0, 1]
+    assert client.peak == 2
+
+
+def test_missing_answer_scores_zero_without_a_call(cache):
+    client = QuestionClient()
+    grader = PythonCodeGrader(client=client, cache=cache)
+    questions = QUESTIONS + [{'prompt': '第三题', 'knowledge_point': '函数'}]
+    result = grader.evaluate_by_questions(split_questions(HOMEWORK), questions)
+    assert len(client.calls) == 2
+    assert "题目3（知识点：函数）：0.0分" in result
+    assert "★★总分★★:46.7" in result
+
+
+def test_failed_question_fails_the_whole_result(cache):
+    client = QuestionClient(scores={'求0到9的和': 80, '判断奇偶': None})
+    grader = PythonCodeGrader(client=client, cache=cache)
+    result = grader.evaluate_by_questions(split_questions(HOMEWORK), QUESTIONS)
+    assert result == "❌ 评分失败：第2题 - 请求超时"
+
+
+def test_question_results_are_cached(cache):
+    client = QuestionClient()
+    grader = PythonCodeGrader(client=client, cache=cache)
+    first = grader.evaluate_by_questions(split_questions(HOMEWORK), QUESTIONS)
+    assert grader.evaluate_by_questions(split_questions(HOMEWORK), QUESTIONS) == first
+    assert len(client.calls) == 2
+
+
+def test_unchanged_answers_reuse_previous_results(cache):
+    grader = PythonCodeGrader(client=QuestionClient(), cache=cache)
+    first = list(grader.iter_evaluate_by_questions(split_questions(HOMEWORK), QUESTIONS))
+    previous = {result['index']: {'answer_hash': result['answer_hash'], 'result': result} for result in first}
+
+    # 只改第2题：第1题沿用上次评分，不调用大模型
+    client = QuestionClient(scores={'求0到9的和': 10, '判断奇偶': 50})
+    grader = PythonCodeGrader(client=client, cache=cache)
+    changed = HOMEWORK.replace('print("even")', 'print("even")\nelse:\n    print("odd")')
+    results = {result['index']: result for result in
+               grader.iter_evaluate_by_questions(split_questions(changed), QUESTIONS, previous=previous)}
+    assert len(client.calls) == 1
+    assert results[0]['reused'] and results[0]['total'] == 80
+    assert not results[1]['reused'] and results[1]['total'] == 50
@@ -0,0 +1,97 @@
+# tests/test_rate_limiter.py
+import threading
+import time
+
+import pytest
+
+import rate_limiter
+from evaluation_cache import EvaluationCache
+from homework_LLM_grader import PythonCodeGrader
+from rate_limiter import TokenBucketRateLimiter, estimate_tokens
+
+
+class FakeClock:
+    """替换 time.monotonic 和 time.sleep，sleep 只推进时钟"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+        self.slept += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, 'monotonic', clock.monotonic)
+    monkeypatch.setattr(rate_limiter.time, 'sleep', clock.sleep)
+    return clock
+
+
+def test_estimate_tokens():
+    assert estimate_tokens('') == 0
+    assert estimate_tokens('a' * 16) == 5
+    assert estimate_tokens('中文') == 3
+
+
+def test_requests_per_minute_limit(clock):
+    limiter = TokenBucketRateLimiter(requests_per_minute=60, tokens_per_minute=100000)
+    for _ in range(60):
+        assert limiter.acquire() == 0
+    # 桶已空，按每秒1个请求补充
+    assert limiter.acquire() == pytest.approx(1.0)
+    assert clock.slept == pytest.approx(1.0)
+
+
+def test_tokens_per_minute_limit(clock):
+    limiter = TokenBucketRateLimiter(requests_per_minute=1000, tokens_per_minute=600)
+    assert limiter.acquire(500) == 0
+    # 剩余100个token，每秒补充10个
+    assert limiter.acquire(200) == pytest.approx(10.0)
+
+
+def test_oversized_request_waits_for_full_bucket(clock):
+    limiter = TokenBucketRateLimiter(requests_per_minute=1000, tokens_per_minute=600)
+    assert limiter.acquire(5000) == 0
+    assert limiter.acquire(5000) == pytest.approx(60.0)
+
+
+def test_reconcile_returns_unused_tokens(clock):
+    limiter = TokenBucketRateLimiter(requests_per_minute=1000, tokens_per_minute=600)
+    limiter.acquire(600)
+    limiter.reconcile(estimated_tokens=600, actual_tokens=100)
+    assert limiter.acquire(500) == 0
+    # 实际用量超过预估时补扣，之后的请求要等欠下的配额补回
+    limiter.reconcile(estimated_tokens=0, actual_tokens=60)
+    assert limiter.acquire(0) == pytest.approx(6.0)
+
+
+def test_batch_evaluate_runs_concurrently_and_keeps_order(monkeypatch, tmp_path):
+    in_flight = []
+    peak = []
+    lock = threading.Lock()
+
+    def evaluate_code(self, code, requirements):
+        with lock:
+            in_flight.append(code)
+            peak.append(len(in_flight))
+        time.sleep(0.05 if code == 'a' else 0.01)
+        with lock:
+            in_flight.remove(code)
+        return f"评分:{code}"
+
+    monkeypatch.setattr(PythonCodeGrader, 'evaluate_code', evaluate_code)
+    grader = PythonCodeGrader(cache=EvaluationCache(db_path=str(tmp_path / 'cache.db')))
+    submissions = [{'code': code, 'requirements': ''} for code in 'abcd']
+    results = grader.batch_evaluate(submissions, max_in_flight=2)
+
+    assert list(results) == ['submission_1', 'submission_2', 'submission_3', 'submission_4']
+    assert [r['evaluation'] for r in results.values()] == ['评分:a', '评分:b', '评分:c', '评分:d']
+    assert max(peak) == 2
+    assert grader.last_batch_stats['total'] == 4
+    assert grader.last_batch_stats['failed'] == 0
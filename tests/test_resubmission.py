@@ -0,0 +1,93 @@
+# tests/test_resubmission.py
+import json
+
+import pytest
+
+from grading_jobs import JOB_CANCELLED, JOB_DONE, JOB_KIND_EVALUATE, JOB_KIND_EXTRACT, JOB_KIND_STUDY_PLAN
+
+HOMEWORK_LINES = ['##Begin', '题目1 求和', 'total = 0', 'for i in range(10):', '    total += i', 'print(total)',
+                  '题目2 判断奇偶', 'n = int(input())', 'if n % 2 == 0:', '    print("even")', '##End']
+CHANGED_LINES = HOMEWORK_LINES[:-1] + ['else:', '    print("odd")', '##End']
+QUESTION_REPLY = json.dumps({"总分": 80, "详细评分": {"正确性": 40, "知识点使用": 30, "可读性": 6, "健壮性": 4},
+                             "优点": "实现正确", "缺点": "无", "建议": "无"}, ensure_ascii=False)
+
+
+@pytest.fixture
+def question_submission(app_module, make_submission, fake_llm):
+    """两道题的作业，按题评分"""
+    fake_llm.evaluation = QUESTION_REPLY
+    submission = make_submission(HOMEWORK_LINES)
+    for prompt, knowledge_point in (('求0到9的和', 'for循环'), ('判断奇偶', 'if分支')):
+        app_module.db.session.add(app_module.AssignmentQuestion(assignment_id=submission.assignment_id,
+                                                                prompt=prompt, knowledge_point=knowledge_point))
+    app_module.db.session.commit()
+    return submission
+
+
+def question_calls(fake_llm):
+    return [messages for messages in fake_llm.calls if '学习规划师' not in messages[0]['content']]
+
+
+def grade_after_upload(app_module, run_job, submission):
+    """先执行上传后的提取任务，再评分"""
+    run_job(app_module.latest_grading_job(submission.id, JOB_KIND_EXTRACT).id)
+    job = run_job(app_module.enqueue_grading_job(submission).id)
+    assert job.status == JOB_DONE, job.error
+    return job
+
+
+def test_resubmission_regrades_only_changed_answers(app_module, question_submission, run_job, fake_llm, upload):
+    submission = question_submission
+    job = run_job(app_module.enqueue_grading_job(submission).id)
+    assert job.status == JOB_DONE, job.error
+    assert len(question_calls(fake_llm)) == 2
+    grades = {grade.position: (grade.id, grade.answer_hash)
+              for grade in app_module.QuestionGrade.query.filter_by(submission_id=submission.id)}
+
+    submission = upload(submission.assignment, submission.student_id, CHANGED_LINES)
+    assert submission.evaluation_result is None
+    # 只有改动的第2题重新调用大模型，第1题沿用上次的单题评分
+    grade_after_upload(app_module, run_job, submission)
+    assert len(question_calls(fake_llm)) == 3
+    assert '判断奇偶' in question_calls(fake_llm)[-1][1]['content']
+    regraded = {grade.position: (grade.id, grade.answer_hash)
+                for grade in app_module.QuestionGrade.query.filter_by(submission_id=submission.id)}
+    assert regraded[0] == grades[0]
+    assert regraded[1][0] == grades[1][0]
+    assert regraded[1][1] != grades[1][1]
+    assert '★★总分★★:80.0' in submission.evaluation_result
+
+
+def test_unchanged_resubmission_makes_no_calls(app_module, question_submission, run_job, fake_llm, upload):
+    submission = question_submission
+    run_job(app_module.enqueue_grading_job(submission).id)
+    calls = len(question_calls(fake_llm))
+
+    submission = upload(submission.assignment, submission.student_id, HOMEWORK_LINES)
+    grade_after_upload(app_module, run_job, submission)
+    assert len(question_calls(fake_llm)) == calls
+    assert submission.evaluation_result is not None
+
+
+def test_resubmission_cancels_running_jobs(app_module, make_submission, run_job, fake_llm, upload):
+    submission = make_submission(HOMEWORK_LINES)
+    job = run_job(app_module.enqueue_grading_job(submission).id)
+    plan_job = app_module.latest_grading_job(submission.id, JOB_KIND_STUDY_PLAN)
+    run_job(plan_job.id)
+    assert app_module.current_study_plan(submission) is not None
+
+    running = app_module.enqueue_grading_job(submission, JOB_KIND_EVALUATE)
+    assert running.id != job.id
+    assert app_module.claim_grading_job(running.id)
+    queued_plan = app_module.enqueue_grading_job(submission, JOB_KIND_STUDY_PLAN)
+
+    # 重新提交后旧内容的评分结果、学习计划和进行中的任务都作废
+    submission = upload(submission.assignment, submission.student_id, CHANGED_LINES)
+    assert submission.evaluation_result is None
+    assert submission.study_plan is None
+    for cancelled in (running, queued_plan):
+        cancelled = app_module.db.session.get(app_module.GradingJob, cancelled.id)
+        assert cancelled.status == JOB_CANCELLED
+        assert cancelled.error == "作业已重新提交，该任务已作废"
+    with pytest.raises(RuntimeError):
+        app_module._check_not_cancelled(running)
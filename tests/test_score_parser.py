@@ -0,0 +1,72 @@
+# tests/test_score_parser.py
+from score_parser import parse_evaluation, parse_json_evaluation, parse_markdown_evaluation
+
+MARKDOWN = """完成题目数量：2
+★★总分★★:85分
+★★详细评分★★
+正确性:"42",
+知识点使用:"30",
+可读性:"9",
+健壮性:"4",
+优点:"结构清晰",
+缺点:"缺少输入校验",
+建议:"补充异常处理"
+
+★★各题评分★★
+题目1：正确性:10分
+"""
+
+JSON_RESULT = """评分如下：
+{"完成题目数量": "1", "总分": "18", "详细评分": {"正确性": "9", "知识点使用": "6", "可读性": "2", "健壮性": "1"},
+ "优点": "正确", "缺点": "无", "建议": "继续保持"}
+"""
+
+
+def test_markdown_fields():
+    parsed = parse_markdown_evaluation(MARKDOWN)
+    assert parsed['total'] == 85.0
+    assert parsed['sub_scores'] == {"正确性": 42.0, "知识点使用": 30.0, "可读性": 9.0, "健壮性": 4.0}
+    assert parsed['question_count'] == 2
+    assert parsed['优点'] == "结构清晰"
+    assert parsed['建议'] == "补充异常处理"
+
+
+def test_markdown_ignores_per_question_section():
+    # “★★各题评分★★”中的“正确性”不能覆盖前面的维度分
+    assert parse_markdown_evaluation(MARKDOWN)['sub_scores']["正确性"] == 42.0
+
+
+def test_markdown_total_from_sub_scores():
+    text = "正确性:40\n知识点使用:30\n可读性:8\n健壮性:2\n"
+    assert parse_markdown_evaluation(text)['total'] == 80.0
+
+
+def test_markdown_missing_scores():
+    assert parse_markdown_evaluation("本次作业完成得不错，得分90分") is None
+    assert parse_markdown_evaluation("正确性:40\n可读性:8\n") is None
+
+
+def test_out_of_range_scores_rejected():
+    assert parse_markdown_evaluation("★★总分★★:120") is None
+    assert parse_markdown_evaluation("★★总分★★:90\n正确性:60\n") is None
+
+
+def test_json_fields():
+    parsed = parse_json_evaluation(JSON_RESULT)
+    assert parsed['total'] == 18.0
+    assert parsed['sub_scores']["知识点使用"] == 6.0
+    assert parsed['question_count'] == 1
+    assert parsed['建议'] == "继续保持"
+
+
+def test_json_invalid():
+    assert parse_json_evaluation("没有JSON") is None
+    assert parse_json_evaluation("{不是JSON}") is None
+    assert parse_json_evaluation('{"详细评分": {"正确性": "9"}}') is None
+
+
+def test_parse_evaluation_falls_back_to_json():
+    assert parse_evaluation(JSON_RESULT)['total'] == 18.0
+    assert parse_evaluation(MARKDOWN)['total'] == 85.0
+    assert parse_evaluation("") is None
+    assert parse_evaluation("❌ 评分失败：请求超时") is None
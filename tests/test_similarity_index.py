@@ -0,0 +1,63 @@
+# tests/test_similarity_index.py
+from benchmark_grader import sample_homework
+from similarity_index import (decode_signature, encode_signature, estimate_similarity, fingerprint, lsh_buckets,
+                              normalize_code)
+
+CODE = """def average(scores):
+    # 计算平均分
+    total = 0
+    for score in scores:
+        total += score
+    return total / len(scores)
+
+print("平均分：", average([90, 85, 77]))
+"""
+
+RENAMED = """def mean(values):
+    s = 0
+    for v in values:   # 累加
+        s += v
+    return s / len(values)
+
+print('结果', mean([1, 2, 3]))
+"""
+
+
+def test_normalize_ignores_names_literals_and_comments():
+    assert normalize_code(CODE) == normalize_code(RENAMED)
+
+
+def test_normalize_keeps_keywords_and_builtins():
+    tokens = normalize_code(CODE)
+    assert 'for' in tokens and 'return' in tokens and 'print' in tokens and 'len' in tokens
+    assert normalize_code("x = 1") != normalize_code("x = len")
+
+
+def test_normalize_code_with_syntax_error():
+    tokens = normalize_code("for i in range(3)\n    print(i\n")
+    assert 'for' in tokens and 'print' in tokens
+
+
+def test_renamed_copy_is_similar():
+    a = fingerprint(CODE * 3)
+    b = fingerprint(RENAMED * 3)
+    assert estimate_similarity(a['signature'], b['signature']) == 1.0
+    assert set(a['buckets']) & set(b['buckets'])
+
+
+def test_different_homework_is_not_similar():
+    a = fingerprint(sample_homework(0))
+    b = fingerprint(CODE * 3)
+    assert estimate_similarity(a['signature'], b['signature']) < 0.5
+
+
+def test_short_code_has_no_fingerprint():
+    assert fingerprint("print(1)") is None
+    assert fingerprint("") is None
+
+
+def test_signature_round_trip():
+    signature = fingerprint(CODE * 3)['signature']
+    assert decode_signature(encode_signature(signature)) == signature
+    assert decode_signature('') == []
+    assert lsh_buckets(signature) == fingerprint(CODE * 3)['buckets']
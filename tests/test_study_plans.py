@@ -0,0 +1,64 @@
+# tests/test_study_plans.py
+from grading_jobs import JOB_DONE, JOB_KIND_EVALUATE, JOB_KIND_STUDY_PLAN, JOB_QUEUED
+
+HOMEWORK_LINES = ['##Begin', '题目1 求和', 'total = 0', 'for i in range(10):', '    total += i', 'print(total)',
+                  '##End']
+
+
+def grade(app_module, run_job, submission):
+    """执行评分任务和随后排队的学习计划任务"""
+    job = run_job(app_module.enqueue_grading_job(submission).id)
+    assert job.status == JOB_DONE, job.error
+    plan_job = app_module.latest_grading_job(submission.id, JOB_KIND_STUDY_PLAN)
+    if plan_job and plan_job.status == JOB_QUEUED:
+        plan_job = run_job(plan_job.id)
+    return job, plan_job
+
+
+def test_plan_is_stored_after_grading(app_module, make_submission, run_job, fake_llm):
+    submission = make_submission(HOMEWORK_LINES)
+    _, plan_job = grade(app_module, run_job, submission)
+    assert plan_job.status == JOB_DONE, plan_job.error
+
+    plan = app_module.current_study_plan(submission)
+    assert plan.content == fake_llm.study_plan
+    assert plan.evaluation_hash == app_module.content_hash(submission.evaluation_result)
+    plan_calls = [messages for messages in fake_llm.calls if '学习规划师' in messages[0]['content']]
+    assert len(plan_calls) == 1
+    assert fake_llm.evaluation in plan_calls[0][1]['content']
+
+
+def test_plan_reused_while_evaluation_unchanged(app_module, make_submission, run_job, fake_llm):
+    submission = make_submission(HOMEWORK_LINES)
+    grade(app_module, run_job, submission)
+    calls = len(fake_llm.calls)
+    plan_job = app_module.latest_grading_job(submission.id, JOB_KIND_STUDY_PLAN)
+
+    # 重新评分得到相同结果时不再生成学习计划
+    grade(app_module, run_job, submission)
+    assert app_module.latest_grading_job(submission.id, JOB_KIND_STUDY_PLAN).id == plan_job.id
+    assert app_module.current_study_plan(submission) is not None
+    assert len(fake_llm.calls) == calls
+
+
+def test_plan_outdated_when_evaluation_changes(app_module, make_submission, run_job, fake_llm):
+    submission = make_submission(HOMEWORK_LINES)
+    _, plan_job = grade(app_module, run_job, submission)
+
+    submission.evaluation_result = submission.evaluation_result + "\n教师修改"
+    app_module.db.session.commit()
+    assert app_module.current_study_plan(submission) is None
+    assert app_module.ensure_grading_job(submission, JOB_KIND_STUDY_PLAN).id == plan_job.id
+    requeued = app_module.ensure_grading_job(submission, JOB_KIND_STUDY_PLAN, outdated=True)
+    assert requeued.id != plan_job.id
+
+    run_job(requeued.id)
+    assert app_module.current_study_plan(submission).content == fake_llm.study_plan
+    assert len(app_module.StudyPlan.query.filter_by(submission_id=submission.id).all()) == 1
+
+
+def test_plan_needs_an_evaluation(app_module, make_submission, run_job, fake_llm):
+    submission = make_submission(HOMEWORK_LINES)
+    job = run_job(app_module.enqueue_grading_job(submission, JOB_KIND_STUDY_PLAN).id)
+    assert job.error == "尚无评分结果，无法生成学习计划"
+    assert app_module.latest_grading_job(submission.id, JOB_KIND_EVALUATE) is None
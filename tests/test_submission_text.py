@@ -0,0 +1,148 @@
+# tests/test_submission_text.py
+import shutil
+import uuid
+
+import pytest
+
+from extractors import ExtractionError, ExtractionRetryable
+from grading_jobs import JOB_DONE, JOB_KIND_EVALUATE, JOB_KIND_EXTRACT, JOB_QUEUED
+
+HOMEWORK_LINES = ['##Begin', '题目1 求和', 'total = 0', 'for i in range(10):', '    total += i', 'print(total)',
+                  '##End']
+
+
+def homework_lines():
+    """每个用例使用不同的文件内容，按文件哈希保存的文本不会在用例之间共用"""
+    return HOMEWORK_LINES[:-1] + [f'# {uuid.uuid4().hex}', '##End']
+
+
+class CountingPool:
+    """记录提取次数，可设定抛出的异常"""
+
+    def __init__(self, pool, error=None):
+        self.pool = pool
+        self.error = error
+        self.paths = []
+
+    def extract(self, path):
+        self.paths.append(path)
+        if self.error:
+            raise self.error
+        return self.pool.extract(path)
+
+
+@pytest.fixture
+def extractor_pool(app_module, monkeypatch):
+    pool = CountingPool(app_module.get_shared_extractor_pool())
+    monkeypatch.setattr(app_module, 'get_shared_extractor_pool', lambda: pool)
+    return pool
+
+
+def copy_file(app_module, make_submission, submission):
+    """同一作业下另一名学生提交相同的文件"""
+    other = make_submission(file_name='copy.docx', assignment=submission.assignment)
+    shutil.copyfile(submission.file_path, other.file_path)
+    return other
+
+
+def test_same_file_is_extracted_once(app_module, make_submission, extractor_pool):
+    submission = make_submission(homework_lines())
+    record = app_module.extract_submission_text(submission)
+    app_module.db.session.commit()
+    assert 'total += i' in record.text
+    assert record.file_hash == submission.file_hash == app_module.file_sha256(submission.file_path)
+
+    other = copy_file(app_module, make_submission, submission)
+    assert app_module.read_submission_content(other) == record.text
+    assert len(extractor_pool.paths) == 1
+
+
+def test_broken_file_error_is_stored(app_module, make_submission, extractor_pool):
+    submission = make_submission(file_name='broken.docx')
+    with open(submission.file_path, 'wb') as f:
+        f.write(b'not a zip file')
+    with pytest.raises(ExtractionError):
+        app_module.read_submission_content(submission)
+    app_module.db.session.commit()
+
+    # 无法提取的原因随文本保存，再次读取不重复提取
+    assert app_module.stored_submission_text(submission).error
+    with pytest.raises(ExtractionError):
+        app_module.read_submission_content(submission)
+    assert len(extractor_pool.paths) == 1
+
+
+def test_retryable_failure_is_not_stored(app_module, make_submission, extractor_pool):
+    submission = make_submission(homework_lines())
+    extractor_pool.error = ExtractionRetryable("提取超时")
+    with pytest.raises(ExtractionRetryable):
+        app_module.read_submission_content(submission)
+    assert app_module.stored_submission_text(submission) is None
+
+    extractor_pool.error = None
+    assert 'total += i' in app_module.read_submission_content(submission)
+
+
+def test_discard_keeps_text_shared_with_other_submissions(app_module, make_submission, extractor_pool):
+    submission = make_submission(homework_lines())
+    other = copy_file(app_module, make_submission, submission)
+    app_module.read_submission_content(submission)
+    app_module.read_submission_content(other)
+    app_module.db.session.commit()
+    file_hash = submission.file_hash
+
+    submission.file_hash = None
+    app_module.db.session.flush()
+    app_module.discard_submission_text(file_hash)
+    assert app_module.db.session.get(app_module.SubmissionText, file_hash) is not None
+
+    other.file_hash = None
+    app_module.db.session.flush()
+    app_module.discard_submission_text(file_hash)
+    app_module.db.session.commit()
+    assert app_module.db.session.get(app_module.SubmissionText, file_hash) is None
+
+
+def test_upload_stores_text(app_module, make_submission, upload, run_job):
+    submission = make_submission(homework_lines())
+    submission = upload(submission.assignment, submission.student_id, homework_lines())
+    run_job(app_module.latest_grading_job(submission.id, JOB_KIND_EXTRACT).id)
+    record = app_module.db.session.get(app_module.SubmissionText, submission.file_hash)
+    assert 'total += i' in record.text
+
+
+def test_grading_waits_for_background_extraction(app_module, make_submission, run_job, fake_llm, extractor_pool):
+    submission = make_submission(homework_lines())
+    extract_job = app_module.enqueue_grading_job(submission, JOB_KIND_EXTRACT)
+
+    # 提取任务尚未完成时评分任务放回队列，不重复解析文件
+    job = run_job(app_module.enqueue_grading_job(submission).id)
+    assert job.status == JOB_QUEUED
+    assert job.attempts == 0
+    assert extractor_pool.paths == []
+    assert job.not_before is not None
+
+    assert run_job(extract_job.id).status == JOB_DONE
+    job.not_before = None
+    app_module.db.session.commit()
+    job = run_job(job.id)
+    assert job.status == JOB_DONE, job.error
+    assert len(extractor_pool.paths) == 1
+    assert app_module.QuestionSegment.query.filter_by(submission_id=submission.id).count() == 1
+
+
+def test_preview_queues_grading_while_extracting(app_module, make_submission, run_job, fake_llm):
+    submission = make_submission(homework_lines())
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = submission.student_id
+        sess['role'] = 'student'
+    assert client.get(f'/preview/{submission.id}').status_code == 200
+
+    # 第一次打开预览页即同时排队提取和评分，提取完成后评分任务自动执行
+    extract_job = app_module.latest_grading_job(submission.id, JOB_KIND_EXTRACT)
+    job = app_module.latest_grading_job(submission.id, JOB_KIND_EVALUATE)
+    assert (extract_job.status, job.status) == (JOB_QUEUED, JOB_QUEUED)
+    assert run_job(extract_job.id).status == JOB_DONE
+    assert run_job(job.id).status == JOB_DONE
+    assert submission.evaluation_result == fake_llm.evaluation